@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import sys
+import time
+
+import numpy as np
+
+from intercepts.db_recorder import find_duplicate_ids, cell_id_from
+
+DEFAULT_CELLS = 100_000
+# the per-unique-coordinate scan is quadratic, larger sources take hours
+REFERENCE_MAX_CELLS = 20_000
+
+
+def reference_duplicate_ids(np_coords):
+    """ the previous implementation: one scan over all cells per unique coordinate
+    """
+    coords = [(c[0], c[1], c[2]) for c in np_coords]
+    unique_coords = set(coords)
+    all_indices = [[cell_id_from(i) for i, x in enumerate(coords) if x == uc] for uc in unique_coords]
+    return [ixs for ixs in all_indices if len(ixs) > 1]
+
+
+def synthetic_coords(cell_count):
+    """ encodings scaled to 0 - 255 like DbRecorder, a third of the cells saturated in corners
+    """
+    rnd = np.random.RandomState(0)
+    encodings = rnd.uniform(0, 1, (cell_count, 3))
+    saturated = rnd.rand(cell_count) < 1 / 3
+    encodings[saturated] = np.round(encodings[saturated])
+    return np.multiply(encodings, 255)
+
+
+def measure(name, find, coords):
+    start = time.perf_counter()
+    groups = find(coords)
+    duration = time.perf_counter() - start
+    print(f'{name:>24}: {duration:8.3f} s  {len(groups):7} groups')
+    return groups
+
+
+if __name__ == '__main__':
+    cell_counts = [int(arg) for arg in sys.argv[1:]] or [10_000, DEFAULT_CELLS, 1_000_000]
+    for cell_count in cell_counts:
+        print(f'{cell_count:,} cells')
+        coords = synthetic_coords(cell_count)
+        groups = measure('find_duplicate_ids', find_duplicate_ids, coords)
+        measure('resolution 1', lambda c: find_duplicate_ids(c, resolution=1), coords)
+        if cell_count <= REFERENCE_MAX_CELLS:
+            reference = measure('reference', reference_duplicate_ids, coords)
+            assert sorted(groups) == sorted(reference), 'groups differ from the reference'
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import sys
+import time
+
+import bson
+import numpy as np
+
+from encits_format import F32_FORMAT, U8_FORMAT
+from intercepts.db_recorder import compact_iteration_document, encoding_coords, find_duplicate_ids, cell_id_from
+
+DEFAULT_CELLS = 100_000
+
+
+def listed_iteration_document(enc_run_id, it, cell_ids, barcodes, encodings):
+    """ the previous layout: cell ids, names + float64 coordinate lists in every iteration
+    """
+    coords = encoding_coords(encodings, len(barcodes))
+    return {
+        'eid': enc_run_id,
+        'it': it,
+        'cids': cell_ids,
+        'ns': barcodes,
+        'xs': coords[:, 0].tolist(),
+        'ys': coords[:, 1].tolist(),
+        'zs': coords[:, 2].tolist(),
+        'ds': find_duplicate_ids(coords)
+    }
+
+
+def measure(name, build):
+    """ time to build + BSON encode the document, what insert_one does before sending it
+    """
+    start = time.perf_counter()
+    size = len(bson.BSON.encode(build()))
+    duration = time.perf_counter() - start
+    print(f'{name:>10}: {size / 2 ** 20:8.2f} MiB  {duration:7.3f} s')
+    return size
+
+
+if __name__ == '__main__':
+    cell_counts = [int(arg) for arg in sys.argv[1:]] or [DEFAULT_CELLS]
+    for cell_count in cell_counts:
+        print(f'{cell_count:,} cells')
+        encodings = np.random.RandomState(0).uniform(0, 1, (cell_count, 3)).astype(np.float32)
+        cell_ids = [cell_id_from(ix) for ix in range(cell_count)]
+        barcodes = [f'AAACCTGGTG{ix:06}-1' for ix in range(cell_count)]
+        listed = measure('listed', lambda: listed_iteration_document('bench', 0, cell_ids, barcodes, encodings))
+        for coords_format in [F32_FORMAT, U8_FORMAT]:
+            size = measure(coords_format, lambda: compact_iteration_document(
+                'bench', 0, encodings, cell_count, coords_format
+            ))
+            print(f'{"":>10}  {listed / size:8.1f} x smaller')
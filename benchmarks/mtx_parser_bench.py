@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from mtx_parser import parse_mtx
+
+GENES, BARCODES = 27998, 20000
+DEFAULT_ENTRIES = 5_000_000
+
+
+def write_synthetic_mtx(file, entries):
+    rnd = np.random.RandomState(0)
+    barcodes = np.sort(rnd.randint(1, BARCODES + 1, entries))
+    genes = rnd.randint(1, GENES + 1, entries)
+    values = rnd.geometric(0.4, entries)
+    with open(file, 'w') as f:
+        f.write('%%MatrixMarket matrix coordinate integer general\n%\n')
+        f.write(f'{GENES} {BARCODES} {entries}\n')
+        np.savetxt(f, np.stack([genes, barcodes, values], axis=1), fmt='%d')
+
+
+def pandas_parse(file):
+    df = pd.read_csv(file, header=None, skiprows=3, delim_whitespace=True, names=['gene', 'barcode', 'p'])
+    return df['gene'].values, df['barcode'].values, df['p'].values
+
+
+def measure(name, parse, file, entries):
+    start = time.perf_counter()
+    parse(file)
+    duration = time.perf_counter() - start
+    print(f'{name:>22}: {duration:7.2f} s  {entries / duration:12,.0f} entries/sec')
+
+
+if __name__ == '__main__':
+    entry_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrix_file = os.path.join(tmp_dir, 'bench_matrix.mtx')
+        print(f'writing synthetic matrix with {entry_count:,} entries... ', end='', flush=True)
+        write_synthetic_mtx(matrix_file, entry_count)
+        print('done')
+        measure('pandas read_csv', pandas_parse, matrix_file, entry_count)
+        measure('parse_mtx 1 process', lambda f: parse_mtx(f, processes=1), matrix_file, entry_count)
+        measure(f'parse_mtx {os.cpu_count()} processes', parse_mtx, matrix_file, entry_count)
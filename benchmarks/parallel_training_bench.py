@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+from cell_matrix import SparseCells
+from cell_type_training import CellTraining
+from parallel_training import ParallelCellTraining
+
+CELLS, GENES = 5000, 2000
+BATCH_SIZE = 128
+ENCODING_SIZE = 3
+BATCHES_PER_ITERATION = 10
+ITERATIONS = 6
+
+
+def synthetic_cells():
+    matrix = sparse.random(CELLS, GENES, density=0.05, format='csr', random_state=0, dtype=np.float32)
+    matrix.data = np.ceil(matrix.data * 10)
+    return SparseCells(matrix, np.arange(CELLS), np.arange(GENES))
+
+
+def cells_per_second(trainer):
+    """ measured from the end of the first iteration, so process start and graph tracing are excluded
+    """
+    timestamps = []
+    trainer.run(ITERATIONS, lambda _, __: timestamps.append(time.perf_counter()))
+    return (ITERATIONS - 1) * BATCHES_PER_ITERATION * BATCH_SIZE / (timestamps[-1] - timestamps[0])
+
+
+if __name__ == '__main__':
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or [2, os.cpu_count()]
+    cells = synthetic_cells()
+    baseline = cells_per_second(CellTraining(cells, BATCH_SIZE, ENCODING_SIZE, BATCHES_PER_ITERATION))
+    print(f'{"1 process":>12}: {baseline:10,.0f} cells/sec')
+    for workers in worker_counts:
+        throughput = cells_per_second(ParallelCellTraining(
+            cells, BATCH_SIZE, ENCODING_SIZE, workers=workers, batches_per_iteration=BATCHES_PER_ITERATION
+        ))
+        efficiency = throughput / (workers * baseline)
+        print(f'{workers:>2} workers: {throughput:10,.0f} cells/sec  speedup {throughput / baseline:5.2f}  '
+              f'scaling efficiency {efficiency:6.1%}')
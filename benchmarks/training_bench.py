@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+
+CELLS = 5000
+DENSITY = 0.05
+NETWORKS = ['classify', 'continuous']
+
+
+def synthetic_cells(cell_count, gene_count, density=DENSITY):
+    from cell_matrix import SparseCells
+    matrix = sparse.random(cell_count, gene_count, density=density, format='csr', random_state=0, dtype=np.float32)
+    matrix.data = np.ceil(matrix.data * 10)
+    return SparseCells(matrix, np.arange(cell_count), np.arange(gene_count))
+
+
+def run_config(config):
+    """ runs in its own process: thread settings have to be made before TensorFlow initialises,
+        peak memory is the maximum resident set size of this process
+    """
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(config['threads'])
+    tf.config.threading.set_inter_op_parallelism_threads(config['threads'])
+    from bigan_classify import ClassifyCellBiGan
+    from bigan_cont import ContinuousCellBiGan
+    from bigan_fused import FusedTrainingStep
+
+    cells = synthetic_cells(config['cells'], config['genes'])
+    start = time.perf_counter()
+    network_class = ClassifyCellBiGan if config['network'] == 'classify' else ContinuousCellBiGan
+    network = network_class(config['encoding_size'], config['genes'])
+    build_seconds = time.perf_counter() - start
+    trainings_step = FusedTrainingStep(network) if config['fused'] else network.trainings_step
+
+    rnd = np.random.RandomState(0)
+    latencies = []
+    for step in range(config['warmup'] + config['steps']):
+        batch = cells.rows(rnd.choice(len(cells), config['batch_size'], replace=False))
+        step_start = time.perf_counter()
+        losses = trainings_step(batch)
+        float(losses[0])
+        if step >= config['warmup']:
+            latencies.append(time.perf_counter() - step_start)
+
+    total_seconds = sum(latencies)
+    return {
+        **config,
+        'build_seconds': build_seconds,
+        'steps_per_sec': len(latencies) / total_seconds,
+        'cells_per_sec': len(latencies) * config['batch_size'] / total_seconds,
+        'latency_ms': {f'p{p}': float(np.percentile(latencies, p) * 1000) for p in [50, 90, 99]},
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_in_subprocess(config):
+    result = subprocess.run(
+        [sys.executable, __file__, '--run', json.dumps(config)],
+        stdout=subprocess.PIPE, env={**os.environ, 'TF_CPP_MIN_LOG_LEVEL': '3'}, check=True
+    )
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.decode().strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def print_result(r):
+    latency = r['latency_ms']
+    print(f'{r["network"]:>11} {"fused" if r["fused"] else "keras":>6} genes {r["genes"]:6} batch {r["batch_size"]:5} '
+          f'threads {r["threads"]:3}: {r["steps_per_sec"]:7.2f} steps/sec {r["cells_per_sec"]:9,.0f} cells/sec  '
+          f'p50 {latency["p50"]:8.1f} ms  p99 {latency["p99"]:8.1f} ms  peak {r["peak_rss_mb"]:7.0f} MB')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='BiGAN training throughput on synthetic sparse cells')
+    parser.add_argument('--genes', type=int, nargs='+', default=[27998])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[64, 128, 256])
+    parser.add_argument('--threads', type=int, nargs='+', default=sorted({1, os.cpu_count()}))
+    parser.add_argument('--networks', nargs='+', default=NETWORKS, choices=NETWORKS)
+    parser.add_argument('--fused', action='store_true', help='also measure the fused training step')
+    parser.add_argument('--cells', type=int, default=CELLS)
+    parser.add_argument('--encoding-size', type=int, default=3)
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--output', default='training_bench.json')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.run:
+        print(json.dumps(run_config(json.loads(args.run))))
+        sys.exit(0)
+
+    configs = [{
+        'network': network, 'fused': fused, 'genes': genes, 'batch_size': batch_size, 'threads': threads,
+        'cells': args.cells, 'encoding_size': args.encoding_size, 'steps': args.steps, 'warmup': args.warmup
+    } for network, fused, genes, batch_size, threads in itertools.product(
+        args.networks, [False, True] if args.fused else [False], args.genes, args.batch_sizes, args.threads
+    )]
+    results = []
+    for config in configs:
+        results.append(run_in_subprocess(config))
+        print_result(results[-1])
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results
+        }, f, indent=2)
+    print('results written to:', args.output)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import sys
+import time
+
+import bson
+import numpy as np
+
+from encits_format import TrajectoryEncoder, trajectory_coords
+
+DEFAULT_CELLS = 20_000
+# the showits range of a deployed run
+ITERATIONS = 450
+KEYFRAME_INTERVALS = [1, 10, 50]
+
+
+def synthetic_trajectory(cell_count, iterations):
+    """ 0 - 255 coordinates moving less as training converges, a few cells jump
+    """
+    rnd = np.random.RandomState(0)
+    coords = rnd.uniform(0, 255, (cell_count, 3))
+    for it in range(iterations):
+        coords = np.clip(coords + rnd.normal(0, 2 / (1 + it / 50), coords.shape), 0, 255)
+        jumps = rnd.rand(cell_count) < 0.0005
+        coords[jumps] = rnd.uniform(0, 255, (np.count_nonzero(jumps), 3))
+        yield it, coords
+
+
+def measure(keyframe_interval, trajectory):
+    encoder = TrajectoryEncoder(keyframe_interval)
+    start = time.perf_counter()
+    iterations = [{'it': it, **encoder.encode(it, coords)[0]} for it, coords in trajectory]
+    encode_duration = time.perf_counter() - start
+    size = sum(len(bson.BSON.encode(iteration)) for iteration in iterations)
+    keyframes = sum(1 for iteration in iterations if 'step' not in iteration)
+
+    start = time.perf_counter()
+    decoded = list(trajectory_coords(iterations))
+    decode_duration = time.perf_counter() - start
+    error = max(np.max(np.abs(coords - expected)) for (_, coords), (_, expected) in zip(decoded, trajectory))
+    print(f'keyframes every {keyframe_interval:3}: {size / 2 ** 20:8.2f} MiB  {keyframes:4} keyframes  '
+          f'encode {encode_duration:6.2f} s  decode all {decode_duration:6.2f} s  max error {error:.4f}')
+
+
+if __name__ == '__main__':
+    cell_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CELLS
+    print(f'{cell_count:,} cells, {ITERATIONS} iterations')
+    trajectory = [(it, coords.copy()) for it, coords in synthetic_trajectory(cell_count, ITERATIONS)]
+    for interval in KEYFRAME_INTERVALS:
+        measure(interval, trajectory)
@@ -1,13 +1,63 @@
 const express = require('express')
 
 const withoutIdField = { projection: { _id: 0 } }
+const withoutCellFields = { projection: { _id: 0, cids: 0, ns: 0 } }
+const cellFieldsOnly = { projection: { _id: 0, cids: 1, ns: 1 } }
+const coordsFields = { projection: { _id: 0, it: 1, fmt: 1, step: 1, xyz: 1, jumps: 1, jxyz: 1 } }
+
+const coordFormats = {
+  f32: { size: 4, read: (buffer, ix) => buffer.readFloatLE(ix * 4) },
+  u8: { size: 1, read: (buffer, ix) => buffer.readUInt8(ix) }
+}
+
+// cells moving too far for a delta step: int32 cell index + float32 x, y, z
+const applyJumps = (coords, iteration) => {
+  const jumps = iteration.jumps.value(true)
+  const jumpCoords = iteration.jxyz.value(true)
+  for (let jump = 0; jump < jumps.length / 4; jump++) {
+    const ix = jumps.readInt32LE(jump * 4)
+    for (let axis = 0; axis < 3; axis++) {
+      coords[ix * 3 + axis] = jumpCoords.readFloatLE((jump * 3 + axis) * 4)
+    }
+  }
+  return coords
+}
+
+// x, y, z of all cells, delta iterations ('d8': int8 steps) add up on the previous iteration's coordinates,
+// clipped to 0 - 255 like encits_format.apply_delta
+const decodeCoords = (iteration, previous) => {
+  const buffer = iteration.xyz.value(true)
+  if (iteration.fmt === 'd8') {
+    const coords = previous.map((coord, ix) => Math.min(255, Math.max(0, coord + buffer.readInt8(ix) * iteration.step)))
+    return iteration.jumps ? applyJumps(coords, iteration) : coords
+  }
+  const format = coordFormats[iteration.fmt]
+  return Array.from({ length: buffer.length / format.size }, (_, ix) => format.read(buffer, ix))
+}
+
+const decodeTrajectory = iterations => iterations.reduce((previous, iteration) => decodeCoords(iteration, previous), null)
+
+// compact iterations (run cells in encs, coordinates as x, y, z binary) -> cids, ns, xs, ys, zs
+const expandIteration = (iteration, cellMeta, coords) => {
+  const axis = offset => cellMeta.cids.map((cid, ix) => coords[ix * 3 + offset])
+  return {
+    eid: iteration.eid,
+    it: iteration.it,
+    cids: cellMeta.cids,
+    ns: cellMeta.ns,
+    xs: axis(0),
+    ys: axis(1),
+    zs: axis(2),
+    ds: iteration.ds
+  }
+}
 
 const createApiRouter = colls => {
   const router = express.Router()
 
   router.get('/encoding/:encId', (req, res) => {
     const encodingId = req.params.encId
-    return colls.encs.findOne({ _id: encodingId }, withoutIdField)
+    return colls.encs.findOne({ _id: encodingId }, withoutCellFields)
       .then(encData => encData
         ? res.status(200).send(encData)
         : res.status(404).end()
@@ -18,10 +68,21 @@ const createApiRouter = colls => {
     const eid = req.params.encId
     const it = parseInt(req.params.it)
     return colls.encits.findOne({ eid, it }, withoutIdField)
-      .then(cellData => cellData
-        ? res.status(200).send(cellData)
-        : res.status(404).end()
-      )
+      .then(iteration => {
+        if (!iteration) {
+          return res.status(404).end()
+        }
+        if (!iteration.xyz) {
+          return res.status(200).send(iteration)
+        }
+        const trajectory = iteration.fmt === 'd8'
+          ? colls.encits.find({ eid, it: { $gte: iteration.key, $lte: it } }, coordsFields).sort({ it: 1 }).toArray()
+          : Promise.resolve([iteration])
+        return Promise.all([colls.encs.findOne({ _id: eid }, cellFieldsOnly), trajectory])
+          .then(([cellMeta, iterations]) => res.status(200)
+            .send(expandIteration(iteration, cellMeta, decodeTrajectory(iterations)))
+          )
+      })
   })
 
   router.get('/cell/:sid/:cid', (req, res) => {
@@ -2,6 +2,7 @@ const express = require('express')
 const moment = require('moment')
 
 const mainPage = 'main'
+const withoutCellFields = { projection: { cids: 0, ns: 0 } }
 
 const saveEncode = param => param && encodeURIComponent(param)
 
@@ -10,14 +11,14 @@ const createHtmlRouter = (colls, config) => {
 
   const basePath = sub => `${config.serverPath}${sub}`
 
-  router.get('/', (req, res) => colls.encs.find({}).toArray()
+  router.get('/', (req, res) => colls.encs.find({}, withoutCellFields).toArray()
     .then(encodings => res.render(mainPage, { encodings, moment, params: req.query }))
   )
 
   router.get('/:encId?/:it?', (req, res) => {
     const eid = saveEncode(req.params.encId)
     const queryIt = saveEncode(req.params.it)
-    return colls.encs.findOne({ _id: eid })
+    return colls.encs.findOne({ _id: eid }, withoutCellFields)
       .then(encRun => {
         if (!encRun) {
           return res.redirect(303, basePath(`?error=enc&eid=${eid}`))
@@ -26,7 +27,7 @@ const createHtmlRouter = (colls, config) => {
           return res.redirect(303, basePath(`/${eid}/${encRun.defit}`))
         }
         const it = parseInt(queryIt)
-        return colls.encits.findOne({ eid, it })
+        return colls.encits.findOne({ eid, it }, { projection: { _id: 1 } })
           .then(iteration => {
             if (!iteration) {
               return res.redirect(303, `${config.serverPath}?error=it&eid=${eid}&it=${it}`)
@@ -1,4 +1,5 @@
 /* global describe it before after */
+const { Binary } = require('mongodb')
 const TestServer = require('./testServer')
 
 describe('Cellan API', () => {
@@ -14,13 +15,33 @@ describe('Cellan API', () => {
   const testEncodings = [
     { _id: 'VLR5000', date: null, defit: 8009, showits: [20, 30], srcs: { barcodes: 'GSE122930_Sham_1_week_barcodes.tsv' } },
     { _id: 'TESTRUN', date: null, defit: 29, showits: [20, 30], srcs: { barcodes: 'GSE122930_Sham_4_weeks_repA+B_barcodes.tsv' } },
-    { _id: 'LR9990', date: null, defit: 1412, showits: [20, 30], srcs: { barcodes: 'GSE122930_Sham_4_week_barcodes.tsv' } }
+    { _id: 'LR9990', date: null, defit: 1412, showits: [20, 30], srcs: { barcodes: 'GSE122930_Sham_4_week_barcodes.tsv' } },
+    { _id: 'COMPACT', date: null, defit: 9, showits: [9], srcs: { barcodes: 'compact_barcodes.tsv' }, cids: [1, 2], ns: ['AAAC-1', 'AAAG-1'] }
   ]
 
+  const compactCoords = new Float32Array([127.5, 51, 0, 255, 0.5, 12.25])
+  const keyframeCoords = new Float32Array([10, 20, 30, 40, 50, 60])
+
   const testIterations = [
     { eid: 'VLR5000', it: 5009, cids: [1, 2, 3] },
     { eid: 'VLR5000', it: 5019, cids: [1, 2, 3] },
-    { eid: 'VLR5000', it: 5029, cids: [1, 2, 3] }
+    { eid: 'VLR5000', it: 5029, cids: [1, 2, 3] },
+    { eid: 'COMPACT', it: 9, fmt: 'f32', xyz: new Binary(Buffer.from(compactCoords.buffer)), ds: [] },
+    { eid: 'COMPACT', it: 19, fmt: 'u8', xyz: new Binary(Buffer.from([128, 51, 0, 255, 1, 12])), ds: [[1, 2]] },
+    { eid: 'COMPACT', it: 29, fmt: 'f32', xyz: new Binary(Buffer.from(keyframeCoords.buffer)), ds: [] },
+    { eid: 'COMPACT', it: 39, fmt: 'd8', key: 29, step: 0.5, xyz: new Binary(Buffer.from(new Int8Array([2, -2, 0, 1, 0, -1]).buffer)), ds: [] },
+    { eid: 'COMPACT', it: 49, fmt: 'd8', key: 29, step: 0.25, xyz: new Binary(Buffer.from(new Int8Array([-4, 4, 0, 0, 0, 2]).buffer)), ds: [] },
+    {
+      eid: 'COMPACT',
+      it: 59,
+      fmt: 'd8',
+      key: 29,
+      step: 0.5,
+      xyz: new Binary(Buffer.from(new Int8Array([1, 0, 0, 0, 0, 0]).buffer)),
+      jumps: new Binary(Buffer.from(new Int32Array([1]).buffer)),
+      jxyz: new Binary(Buffer.from(new Float32Array([1.5, 2, 3]).buffer)),
+      ds: []
+    }
   ]
 
   const testCells = [
@@ -55,6 +76,10 @@ describe('Cellan API', () => {
     it('valid encoding -> returns encodings', () => requestEncoding('LR9990')
       .expect(200, testEncodings[2])
     )
+
+    it('compact encoding -> returns encoding without cells', () => requestEncoding('COMPACT')
+      .expect(200, { date: null, defit: 9, showits: [9], srcs: { barcodes: 'compact_barcodes.tsv' } })
+    )
   })
 
   describe('iterations', () => {
@@ -64,6 +89,58 @@ describe('Cellan API', () => {
     it('valid iteration -> returns iterations', () => requestIteration('VLR5000', 5009)
       .expect(200, testIterations[0])
     )
+
+    it('compact f32 iteration -> returns expanded iteration', () => requestIteration('COMPACT', 9)
+      .expect(200, {
+        eid: 'COMPACT',
+        it: 9,
+        cids: [1, 2],
+        ns: ['AAAC-1', 'AAAG-1'],
+        xs: [127.5, 255],
+        ys: [51, 0.5],
+        zs: [0, 12.25],
+        ds: []
+      })
+    )
+
+    it('compact u8 iteration -> returns expanded iteration', () => requestIteration('COMPACT', 19)
+      .expect(200, {
+        eid: 'COMPACT',
+        it: 19,
+        cids: [1, 2],
+        ns: ['AAAC-1', 'AAAG-1'],
+        xs: [128, 255],
+        ys: [51, 1],
+        zs: [0, 12],
+        ds: [[1, 2]]
+      })
+    )
+
+    it('delta iteration -> returns iteration reconstructed from keyframe', () => requestIteration('COMPACT', 49)
+      .expect(200, {
+        eid: 'COMPACT',
+        it: 49,
+        cids: [1, 2],
+        ns: ['AAAC-1', 'AAAG-1'],
+        xs: [10, 40.5],
+        ys: [20, 50],
+        zs: [30, 60],
+        ds: []
+      })
+    )
+
+    it('delta iteration with jumps -> returns jumped coordinates', () => requestIteration('COMPACT', 59)
+      .expect(200, {
+        eid: 'COMPACT',
+        it: 59,
+        cids: [1, 2],
+        ns: ['AAAC-1', 'AAAG-1'],
+        xs: [10.5, 1.5],
+        ys: [20, 2],
+        zs: [30, 3],
+        ds: []
+      })
+    )
   })
 
   describe('cells', () => {
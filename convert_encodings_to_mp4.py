@@ -15,10 +15,11 @@ GRAPH_2D_ID = '2D'
 GRAPH_3D_ID = '3D'
 
 if len(sys.argv) < 2:
-    print('\nrequired \'run-id\'')
+    print('\nrequired \'run-id\', optional \'db-encoding-run-id\' (coordinates from the db instead of encoding files)')
     exit(-1)
 
 run_id = sys.argv[1]
+db_run_id = sys.argv[2] if len(sys.argv) > 2 else None
 log_dir = f'logs/{run_id}'
 encodings_dir = f'{log_dir}/encodings'
 plots_dir = f'{log_dir}/plots'
@@ -30,6 +31,20 @@ def load_coords(iteration):
         return np.multiply(encodings, 255)
 
 
+def file_trajectory():
+    for enc_file in os.listdir(encodings_dir):
+        iteration = int(os.path.splitext(enc_file)[0])
+        yield iteration, load_coords(iteration)
+
+
+def db_trajectory():
+    """ stored iterations decoded in order, each delta iteration from its predecessor
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    from intercepts.db_recorder import stored_trajectory
+    return stored_trajectory(db_run_id)
+
+
 def plot_file_template(graph_type, iteration):
     return f'{plots_dir}/{run_id}_{graph_type}_{iteration}.png'
 
@@ -69,8 +84,8 @@ def save_as_graph(iteration, coords):
     plt.close(fig)
 
 
-def convert_encodings(iteration):
-    coords = load_coords(iteration)
+def convert_encodings(iteration_coords):
+    iteration, coords = iteration_coords
     save_as_graph(iteration, coords)
     print(f'[{iteration}] ', end='', flush=True)
 
@@ -83,14 +98,12 @@ def convert_images_to_video(graph_type):
 
 if __name__ == '__main__':
     print('converting encodings to graphs... ', end='')
-    encoding_files = os.listdir(encodings_dir)
-    iterations = [(enc_file.rstrip('.enc'),) for enc_file in encoding_files]
-    print(f'{len(iterations)} found')
+    trajectory = db_trajectory() if db_run_id else file_trajectory()
 
     pool = Pool(processes=6)
     atexit.register(pool.close)
-    pool.starmap(convert_encodings, iterations)
-    print()
+    converted = sum(1 for _ in pool.imap_unordered(convert_encodings, trajectory))
+    print(f'\n{converted} converted')
     pool.close()
     print('converting 2D graphs to mp4...')
     convert_images_to_video(GRAPH_2D_ID)
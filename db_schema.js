@@ -4,6 +4,9 @@
 //    date: <run-date>,
 //    defit: <default-iteration>,
 //    showits: [ <UI-iteration-option>, ...],
+//    gs: [ <selected-gene-ensembl-name>, ... ],  (only when trained on selected genes)
+//    cids: [ <cell-id>, ... ],
+//    ns: [ <cell-name>, ... ],
 //    srcs: {
 //      matrix: <matrix-file>,
 //      barcodes: <barcodes-file>,
@@ -11,14 +14,15 @@
 //    }
 //  }
 //
-//  encits: {
+//  encits: {  (older runs: cids, ns, xs, ys, zs lists instead of fmt + xyz, readers accept both)
 //    eid: <enc-run-id>,
 //    it: <iteration-#>,
-//    cids: [ <cell-id>, ... ],
-//    ns: [ <cell-name>, ... ],
-//    xs: [ <cell-x-coord>, ... ],
-//    ys: [ <cell-y-coord>, ... ],
-//    zs: [ <cell-z-coord>, ... ],
+//    fmt: <coords-format>,  ('f32': little-endian float32, 'u8': rounded to uint8, 'd8': int8 delta)
+//    xyz: <binary: x, y, z of each cell in encs.cids order>,
+//    key: <keyframe-iteration-#>,  (only 'd8': the iterations key ... it are needed to decode it)
+//    step: <delta-step>,  (only 'd8': coords = coords of the previous iteration + xyz * step, clipped to 0 - 255)
+//    jumps: <binary: int32 cell indices>,  (only 'd8' with cells moving too far for the step)
+//    jxyz: <binary: float32 x, y, z of the jumps, replacing their delta coords>,
 //    ds: [
 //          [ <duplicate-coords-cell-id>, ... ],
 //          ...
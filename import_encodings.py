@@ -2,29 +2,35 @@
 import os
 import pickle
 
-import numpy as np
 import sys
+from datetime import datetime
 from pymongo import MongoClient
 from pymongo.collection import Collection
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from encits_format import DEFAULT_COORDS_FORMAT, TrajectoryEncoder  # noqa: E402
+from intercepts.db_recorder import encoding_coords, find_duplicate_ids, \
+    ENCODINGS_COLLECTION, ITERATIONS_COLLECTION  # noqa: E402
+
 if len(sys.argv) < 3:
     name = os.path.basename(__file__)
-    print(f'\nrequired parameters missing: ./{name} <run-id> <barcode-file>')
+    print(f'\nrequired parameters missing: ./{name} <run-id> <barcode-file> [<coords-format> [<keyframe-interval>]]')
     exit(-1)
 
 MONGO_URL = 'mongodb://localhost:27017/'
 MONGO_DB = 'cellcomm'
-MONGO_COLLECTION = 'encs'
 
 run_id = sys.argv[1]
 barcode_file = sys.argv[2]
+coords_format = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_COORDS_FORMAT
+keyframe_interval = int(sys.argv[4]) if len(sys.argv) > 4 else 1
 encodings_dir = f'logs/{run_id}/encodings'
 
 
-def load_coords(iteration_):
+def load_encodings(iteration_):
     with open(f'{encodings_dir}/{iteration_}.enc', 'rb') as f:
-        encodings = pickle.load(f)
-        return np.multiply(encodings, 255)
+        return pickle.load(f)
 
 
 def load_barcodes():
@@ -37,41 +43,56 @@ def load_barcodes():
 
 class DBImporter:
     def __init__(self):
-        client = MongoClient(MONGO_URL)
-        self.encodings_coll: Collection = client[MONGO_DB][MONGO_COLLECTION]
+        db = MongoClient(MONGO_URL)[MONGO_DB]
+        self.encodings_coll: Collection = db[ENCODINGS_COLLECTION]
+        self.iterations_coll: Collection = db[ITERATIONS_COLLECTION]
         self.barcodes = load_barcodes()
+        self.trajectory = TrajectoryEncoder(keyframe_interval, coords_format)
+
+    def insert_run(self):
+        """ run document in the shape DbRecorder creates, the matrix + genes files are unknown here.
+            Cell ids + names once for the run, the iterations only store coordinates
+        """
+        self.encodings_coll.update_one(
+            {'_id': run_id},
+            {
+                '$set': {'cids': list(range(1, len(self.barcodes) + 1)), 'ns': self.barcodes},
+                '$setOnInsert': {
+                    'date': datetime.now(),
+                    'defit': 0,
+                    'showits': [],
+                    'srcs': {'matrix': '', 'barcodes': os.path.basename(barcode_file), 'genes': ''}
+                }
+            },
+            upsert=True
+        )
+
+    def show_iterations(self, iterations_):
+        """ the imported iterations are listed in the UI, the last one is shown by default
+        """
+        self.encodings_coll.update_one(
+            {'_id': run_id},
+            {'$set': {'defit': iterations_[-1] if iterations_ else 0, 'showits': iterations_}}
+        )
 
-    def insert_coords(self, iteration_, coords_):
-        ids, names = self.__create_point_meta(coords_)
-        encoding = {
-            '_id': iteration_,
-            'pids': ids,
-            'ns': names,
-            'xs': coords_[:, 0].tolist(),
-            'ys': coords_[:, 1].tolist(),
-            'zs': coords_[:, 2].tolist()
-        }
-        self.encodings_coll.insert_one(encoding)
-
-    def __create_point_meta(self, coords_):
-        if len(self.barcodes) != len(coords_):
-            raise ValueError(f'Coordinates-/barcode-data different length: {len(self.barcodes)} != {len(coords_)}')
-        point_ids, point_names = [], []
-        for i, barcode in enumerate(self.barcodes):
-            point_ids.append(i + 1)
-            point_names.append(barcode)
-        return point_ids, point_names
+    def insert_iteration(self, iteration_, encodings):
+        """ iterations have to be inserted in iteration order, deltas refer to the previous one
+        """
+        coords = encoding_coords(encodings, len(self.barcodes))
+        fields, _ = self.trajectory.encode(iteration_, coords)
+        self.iterations_coll.insert_one({'eid': run_id, 'it': iteration_, **fields, 'ds': find_duplicate_ids(coords)})
 
 
 if __name__ == '__main__':
     encoding_files = os.listdir(encodings_dir)
-    iterations = [enc_file.rstrip('.enc') for enc_file in encoding_files]
+    iterations = sorted(int(os.path.splitext(enc_file)[0]) for enc_file in encoding_files)
     size = len(iterations)
     importer = DBImporter()
+    importer.insert_run()
 
     for ix, iteration in enumerate(iterations):
         enc_num = ix + 1
         print(f'\rprocessing encoding {enc_num}/{size}... ', end='')
-        coords = load_coords(iteration)
-        importer.insert_coords(iteration, coords)
+        importer.insert_iteration(iteration, load_encodings(iteration))
+    importer.show_iterations(iterations)
     print('\nDONE')
@@ -1,3 +1,4 @@
+import json
 import os
 import pathlib
 import signal
@@ -5,10 +6,25 @@ from datetime import datetime
 
 import sys
 
-from cell_type_training import CellTraining, load_matrix
+from bigan_basic import FLOAT32_PRECISION
+from cell_store import CellStore, write_mtx_cell_store
+from checkpoints import CheckpointWriter, checkpoint_dir, latest_checkpoint, load_checkpoint, restore_snapshot
+from cell_type_training import CellTraining, load_matrix, load_sparse_matrix
+from encoder_export import ExportedEncoder, export_encoder
+from encoding_inference import write_encodings
+from evaluation import Evaluator, holdout_split
+from gene_selection import select_variable_genes
 from intercepts import combined_interceptors, \
     skip_iterations, offset_iterations, print_losses, \
-    SinkIntercepts, DbRecorder
+    SinkIntercepts, DbRecorder, ConvergenceMonitor, ProfilerTrace, AsyncInterceptor
+from intercepts.db_recorder import iteration_document, cell_id_from
+from matrix_cache import MatrixCache
+from mtx_parser import names_of_lines
+from parallel_training import ParallelCellTraining
+from phase_timer import PhaseTimer
+from samplers import EpochSampler
+from sweep import run_sweep
+from weight_monitor import WeightMonitor
 
 
 def data_file(file):
@@ -20,10 +36,16 @@ def log_file(log_file_):
 
 
 def build_source(source_id):
+    return matrix_source(data_file(f'{source_id}_matrix.mtx'))
+
+
+def matrix_source(matrix_file):
+    source_path = matrix_file.replace('_matrix.mtx', '')
     return {
-        'matrix': data_file(f'{source_id}_matrix.mtx'),
-        'barcodes': data_file(f'{source_id}_barcodes.tsv'),
-        'genes': data_file(f'{source_id}_genes.tsv')
+        'matrix': matrix_file,
+        'barcodes': f'{source_path}_barcodes.tsv',
+        'genes': f'{source_path}_genes.tsv',
+        'store': f'{source_path}_store'
     }
 
 
@@ -36,34 +58,220 @@ SOURCE_IDS = [
 
 SOURCES = [build_source(src) for src in SOURCE_IDS]
 
+CACHE_DIR = data_file('cache')
+CACHE_MAX_BYTES = 20 * 2 ** 30
+
+OUT_OF_CORE = False
+SELECTED_GENES = None
+FUSED_STEP = False
+# FLOAT32_PRECISION, FLOAT16_PRECISION (GPU) or BFLOAT16_PRECISION (TPU / recent CPUs)
+PRECISION = FLOAT32_PRECISION
+# > 1: data-parallel training with parameter averaging over local worker processes
+WORKERS = 1
+# every cell once per epoch instead of independent random batches
+EPOCH_SAMPLING = False
+# encoder + discriminator take sparse cell batches (sparse-dense matmul in their first layers)
+SPARSE_INPUT = False
+
+ITERATIONS = 1
+CHECKPOINT_ITERATIONS = 100
+CHECKPOINT_KEEP = 3
+# stop once losses + encodings have plateaued
+EARLY_STOPPING = False
+# per-phase timings in <log-dir>/timings.csv
+TIMINGS = False
+# ( first, last ) iteration of a TensorFlow profiler trace in <log-dir>/profile
+PROFILE_ITERATIONS = None
+# per-layer weight norms + update magnitudes in <log-dir>/weights.csv every n iterations
+WEIGHT_STATS_ITERATIONS = None
+# metrics on a held-out split (excluded from training) in <log-dir>/evaluation.csv every n iterations
+EVALUATION_ITERATIONS = None
+EVALUATION_HOLDOUT = 0.05
+# > 0: cells in the same cube of this edge length (0 - 255 coordinates) are duplicates, 1 groups by UI pixel
+DUPLICATE_RESOLUTION = 0
+# binary coordinates of the db iterations: 'f32' (4 bytes per axis) or 'u8' (1 byte, rounded to whole coordinates)
+ENCITS_COORDS_FORMAT = 'f32'
+# 1: every db iteration exact, > 1: a keyframe every n db iterations, int8 deltas (within 1/32 coordinate) in between
+ENCITS_KEYFRAME_INTERVAL = 1
+# losses + db iterations are recorded on a background thread, policy: 'block', 'drop' or 'coalesce'
+ASYNC_RECORDING = True
+ASYNC_RECORDING_POLICY = 'block'
+# trained encoder + gene index in <log-dir>/encoder, used by the encode command
+ENCODER_EXPORT_DIR = 'encoder'
+ENCODE_CHUNK_ROWS = 4096
+ENCODE_THREADS = 2
+
+SWEEP_SOURCES = [SOURCES[1]]
+SWEEP_ITERATIONS = 1000
+SWEEP_GRID = {
+    'encoding_size': [3],
+    'batch_size': [64, 128],
+    'network': ['continuous'],
+    'learning_rate': [0.0075, 0.002]
+}
+
 RUN_ID = 'test'
 DATA_SOURCES = SOURCES[1]
 LOG_ID_TEMPLATE = '{}_' + RUN_ID + '_e{}'
 
 
-def run_training(batch_size=128):
-    data_source = load_matrix(DATA_SOURCES['matrix'], verbose=True)
-    encoding_size = 3
+def matrix_cache():
+    return MatrixCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES, verbose=True)
+
+
+def load_data_source(sources):
+    if not OUT_OF_CORE:
+        return load_sparse_matrix(sources['matrix'], verbose=True, cache=matrix_cache())
+    if not os.path.exists(sources['store']):
+        store_cell_matrix(sources['matrix'], sources['store'])
+    return CellStore(sources['store'])
 
-    trainer = CellTraining(data_source, batch_size=batch_size, encoding_size=encoding_size)
-    interceptors = create_interceptors(encoding_size, trainer, DATA_SOURCES)
-    trainer.run(1, interceptors)
 
+def create_trainer(data_source, batch_size, encoding_size):
+    holdout_ixs = holdout_split(len(data_source), EVALUATION_HOLDOUT)[1] if EVALUATION_ITERATIONS else None
+    if WORKERS > 1:
+        assert not EPOCH_SAMPLING, 'EPOCH_SAMPLING is not supported with WORKERS > 1'
+        assert not TIMINGS, 'TIMINGS are not supported with WORKERS > 1'
+        return ParallelCellTraining(data_source, batch_size=batch_size, encoding_size=encoding_size,
+                                    workers=WORKERS, fused_step=FUSED_STEP, precision=PRECISION,
+                                    sparse_input=SPARSE_INPUT, holdout_ixs=holdout_ixs)
+    training_count = len(data_source) - (0 if holdout_ixs is None else len(holdout_ixs))
+    sampler = EpochSampler(training_count, batch_size) if EPOCH_SAMPLING else None
+    timer = PhaseTimer() if TIMINGS else None
+    return CellTraining(data_source, batch_size=batch_size, encoding_size=encoding_size,
+                        fused_step=FUSED_STEP, precision=PRECISION, sampler=sampler, sparse_input=SPARSE_INPUT,
+                        timer=timer, holdout_ixs=holdout_ixs)
 
-def create_interceptors(encoding_size, trainer, sources):
+
+def run_training(batch_size=128):
+    data_source = select_variable_genes(load_data_source(DATA_SOURCES), SELECTED_GENES, verbose=True)
+    encoding_size = 3
+
+    trainer = create_trainer(data_source, batch_size, encoding_size)
     now = datetime.now().strftime('%m-%d-%H%M')
     full_run_id = LOG_ID_TEMPLATE.format(now, encoding_size)
     log_dir = log_file(full_run_id)
     check_log_dir(log_dir)
 
-    sink = SinkIntercepts(log_dir)
-    db_rec = DbRecorder(RUN_ID, sources)
+    db_rec = DbRecorder(RUN_ID, DATA_SOURCES, duplicate_resolution=DUPLICATE_RESOLUTION,
+                        coords_format=ENCITS_COORDS_FORMAT, keyframe_interval=ENCITS_KEYFRAME_INTERVAL)
     db_rec.setup()
-    return combined_interceptors([
-        print_losses(full_run_id),
+    if SELECTED_GENES:
+        db_rec.store_gene_index(trainer.data.columns)
+    run_meta = {
+        'run_id': RUN_ID,
+        'sources': DATA_SOURCES,
+        'selected_genes': SELECTED_GENES,
+        'batch_size': batch_size,
+        'encoding_size': encoding_size
+    }
+    train(trainer, full_run_id, SinkIntercepts(log_dir), db_rec, run_meta)
+
+
+def resume_training(full_run_id):
+    log_dir = log_file(full_run_id)
+    checkpoint_file = latest_checkpoint(checkpoint_dir(log_dir))
+    assert checkpoint_file, f'no checkpoint found for run: {full_run_id}'
+    print('resuming from checkpoint:', checkpoint_file)
+    snapshot = load_checkpoint(checkpoint_file)
+    run_meta = snapshot['meta']
+    data_source = select_variable_genes(
+        load_data_source(run_meta['sources']), run_meta['selected_genes'], verbose=True
+    )
+
+    trainer = create_trainer(data_source, run_meta['batch_size'], run_meta['encoding_size'])
+    start_iteration = restore_snapshot(trainer, snapshot)
+    db_rec = DbRecorder(run_meta['run_id'], run_meta['sources'], duplicate_resolution=DUPLICATE_RESOLUTION,
+                        coords_format=ENCITS_COORDS_FORMAT, keyframe_interval=ENCITS_KEYFRAME_INTERVAL)
+    db_rec.resume(snapshot['iteration'])
+    sink = SinkIntercepts(log_dir, resume_iteration=snapshot['iteration'])
+    train(trainer, full_run_id, sink, db_rec, run_meta, start_iteration)
+
+
+def run_sweep_training(sweep_id):
+    sweep_sources = {
+        get_source_id(sources): select_variable_genes(
+            load_sparse_matrix(sources['matrix'], verbose=True, cache=matrix_cache()), SELECTED_GENES, verbose=True
+        )
+        for sources in SWEEP_SOURCES
+    }
+    run_sweep(sweep_id, sweep_sources, SWEEP_GRID, SWEEP_ITERATIONS, log_root=log_file(''))
+
+
+def get_source_id(sources):
+    return os.path.basename(sources['matrix']).replace('_matrix.mtx', '')
+
+
+def train(trainer, full_run_id, sink, db_rec, run_meta, start_iteration=0):
+    checkpoints = CheckpointWriter(checkpoint_dir(log_file(full_run_id)), keep=CHECKPOINT_KEEP)
+    recording = combined_interceptors([
         sink.save_losses(),
         offset_iterations(0, skip_iterations(1, db_rec.create_interceptor(trainer)))
     ])
+    if ASYNC_RECORDING:
+        recording = AsyncInterceptor(recording, trainer, policy=ASYNC_RECORDING_POLICY, name='recording')
+    completed = {'iterations': 0}
+
+    def count_completed(it, losses):
+        completed['iterations'] += 1
+
+    interceptors = [
+        count_completed,
+        print_losses(full_run_id),
+        recording,
+        checkpoints.create_interceptor(trainer, CHECKPOINT_ITERATIONS, run_meta)
+    ]
+    if EARLY_STOPPING:
+        interceptors.append(ConvergenceMonitor(trainer))
+    if EVALUATION_ITERATIONS:
+        evaluation = sink.save_evaluation(Evaluator(trainer.network, trainer.holdout_data))
+        interceptors.append(skip_iterations(EVALUATION_ITERATIONS, evaluation))
+    if WEIGHT_STATS_ITERATIONS:
+        weight_stats = sink.save_weight_changes(WeightMonitor(trainer.network))
+        interceptors.append(skip_iterations(WEIGHT_STATS_ITERATIONS, weight_stats))
+    trace = None
+    if PROFILE_ITERATIONS:
+        trace = ProfilerTrace(os.path.join(log_file(full_run_id), 'profile'), *PROFILE_ITERATIONS)
+        interceptors.append(trace)
+    if trainer.timer.enabled:
+        sink.save_timings(trainer.timer)
+    try:
+        trainer.run(ITERATIONS, combined_interceptors(interceptors, trainer.timer), start_iteration)
+    finally:
+        if trace is not None:
+            trace.stop()
+        if ASYNC_RECORDING:
+            recording.close()
+        checkpoints.close()
+        # interrupted runs are exported too, once they trained at least one iteration
+        if completed['iterations']:
+            export_trained_encoder(trainer, full_run_id, run_meta)
+
+
+def export_trained_encoder(trainer, full_run_id, run_meta):
+    export_dir = os.path.join(log_file(full_run_id), ENCODER_EXPORT_DIR)
+    gene_names = names_of_lines(run_meta['sources']['genes'], trainer.data.columns)
+    export_encoder(trainer.network, export_dir, gene_names, {'full_run_id': full_run_id, **run_meta})
+    print('encoder exported to:', export_dir)
+
+
+def encode_source(export_dir, matrix_file, target_file):
+    """ target_file: .npy for the encodings, .json for an encits document
+    """
+    encoder = ExportedEncoder(export_dir)
+    sources = matrix_source(matrix_file)
+    cells = load_data_source(sources)
+    aligned = encoder.align(cells, names_of_lines(sources['genes'], cells.columns))
+    print(f'============ Encoding {len(aligned)} cells...')
+    if target_file.endswith('.json'):
+        encodings = encoder.encoding_prediction(aligned, ENCODE_CHUNK_ROWS, ENCODE_THREADS)
+        barcodes = names_of_lines(sources['barcodes'], cells.index)
+        cell_ids = [cell_id_from(i) for i in range(len(barcodes))]
+        with open(target_file, 'w') as f:
+            json.dump(iteration_document(encoder.meta.get('run_id'), 0, cell_ids, barcodes, encodings), f)
+    else:
+        write_encodings(encoder, aligned, target_file, ENCODE_CHUNK_ROWS, ENCODE_THREADS)
+    print('encodings written to:', target_file)
 
 
 def check_log_dir(log_dir):
@@ -75,12 +283,18 @@ def check_log_dir(log_dir):
 
 def store_converted_cell_file(matrix_file, cell_file):
     print('converting matrix file:')
-    df = load_matrix(matrix_file, verbose=True)
+    df = load_matrix(matrix_file, verbose=True, cache=matrix_cache())
     print('storing cell file:', cell_file, '... ', end='', flush=True)
     df.to_csv(cell_file)
     print('done')
 
 
+def store_cell_matrix(matrix_file, store_dir):
+    print('storing matrix file:', matrix_file, 'in:', store_dir, '... ', end='', flush=True)
+    store = write_mtx_cell_store(store_dir, matrix_file)
+    print(f'done, barcodes: {store.shape[0]}, genes: {store.shape[1]}, chunks: {store.chunk_count}')
+
+
 def signal_handler(_, __):
     print('\tstopped')
     sys.exit(0)
@@ -93,6 +307,19 @@ if __name__ == '__main__':
         if cmd == 'convert':
             assert len(sys.argv) == 4, 'required parameters missing: convert <source-matrix-file> <convert-target-file>'
             store_converted_cell_file(sys.argv[2], sys.argv[3])
+        elif cmd == 'store':
+            assert len(sys.argv) == 4, 'required parameters missing: store <source-matrix-file> <store-dir>'
+            store_cell_matrix(sys.argv[2], sys.argv[3])
+        elif cmd == 'sweep':
+            assert len(sys.argv) == 3, 'required parameters missing: sweep <sweep-id>'
+            run_sweep_training(sys.argv[2])
+        elif cmd == 'resume':
+            assert len(sys.argv) == 3, 'required parameters missing: resume <run-id>'
+            resume_training(sys.argv[2])
+        elif cmd == 'encode':
+            assert len(sys.argv) == 5, \
+                'required parameters missing: encode <encoder-export-dir> <source-matrix-file> <target-file>'
+            encode_source(sys.argv[2], sys.argv[3], sys.argv[4])
         else:
             print('unrecognised command:', cmd)
     else:
@@ -1,24 +1,62 @@
+import threading
 from abc import abstractmethod
+from contextlib import contextmanager
 from typing import final, Callable
 
 import numpy as np
+import pandas as pd
 import tensorflow as tf
+from tensorflow.keras import mixed_precision
 from tensorflow.python.keras import Model
-from copy import deepcopy
+
+from cell_matrix import CellMatrix, DEFAULT_CHUNK_SIZE
+from encoding_inference import cell_chunks
+from phase_timer import NULL_TIMER
+from weight_monitor import WeightMonitor
+
+FLOAT32_PRECISION = 'float32'
+FLOAT16_PRECISION = 'mixed_float16'
+BFLOAT16_PRECISION = 'mixed_bfloat16'
+INPUT_DTYPES = {
+    FLOAT32_PRECISION: np.float32,
+    FLOAT16_PRECISION: np.float16,
+    BFLOAT16_PRECISION: np.float32
+}
+
+
+@contextmanager
+def precision_policy(precision):
+    """ layers created inside compute in the given precision, variables stay float32
+    """
+    previous_policy = mixed_precision.global_policy()
+    mixed_precision.set_global_policy(precision)
+    try:
+        yield
+    finally:
+        mixed_precision.set_global_policy(previous_policy)
 
 
 class BasicBiGan:
     def __init__(self, encoding_size, gene_size,
                  generator_factory: Callable[[int, int], Model],
                  encoder_factory: Callable[[int, int], Model],
-                 discriminator_factory: Callable[[int, int], Model]
+                 discriminator_factory: Callable[[int, int], Model],
+                 precision=FLOAT32_PRECISION
                  ):
+        assert precision in INPUT_DTYPES, f'unknown precision: {precision}'
         self.encoding_size = encoding_size
-        self._generator = generator_factory(encoding_size, gene_size)
-        self._encoder = encoder_factory(encoding_size, gene_size)
-        self._discriminator = discriminator_factory(encoding_size, gene_size)
+        self.precision = precision
+        self.input_dtype = INPUT_DTYPES[precision]
+        with precision_policy(precision):
+            self._generator = generator_factory(encoding_size, gene_size)
+            self._encoder = encoder_factory(encoding_size, gene_size)
+            self._discriminator = discriminator_factory(encoding_size, gene_size)
         self.all_components = self._generator, self._encoder, self._discriminator
-        self.__prev_params = self.__last_layer_params()
+        self.timer = NULL_TIMER
+        self.weights_version = 0
+        self.__weight_monitor = WeightMonitor(self)
+        self.__cached_encodings = None
+        self.__pinned = threading.local()
 
     @final
     def summary(self):
@@ -26,9 +64,59 @@ class BasicBiGan:
             component.summary()
 
     @final
-    def encoding_prediction(self, cell_data):
+    def encoding_prediction(self, cell_data, chunk_rows=DEFAULT_CHUNK_SIZE, threads=0):
+        """ cell matrices, frames + arrays are encoded chunk by chunk, only the encodings are concatenated
+        """
+        if isinstance(cell_data, (CellMatrix, pd.DataFrame, np.ndarray)):
+            if len(cell_data) == 0:
+                return np.zeros((0, self.encoding_size), dtype=np.float32)
+            return np.concatenate([encodings for _, encodings in self.encoding_chunks(cell_data, chunk_rows, threads)])
         return self._encoder.predict(cell_data)
 
+    @final
+    def encoding_chunks(self, cell_data, chunk_rows=DEFAULT_CHUNK_SIZE, threads=0):
+        """ yields ( first-row, encodings ) per chunk of at most chunk_rows cells, see cell_chunks
+        """
+        for start, chunk in cell_chunks(cell_data, chunk_rows, self.input_dtype, threads):
+            yield start, self._encoder.predict_on_batch(chunk)
+
+    @final
+    def weights_updated(self):
+        """ called after every change of the weights, invalidates the cached encodings
+        """
+        self.weights_version += 1
+        self.__cached_encodings = None
+
+    @final
+    def cached_encoding_prediction(self, cell_data):
+        """ encoding_prediction of the full data set, computed once per weights version + data set.
+            All callers get the same read-only array.
+        """
+        pinned = getattr(self.__pinned, 'encodings', None)
+        if pinned is not None and pinned[0] is cell_data:
+            return pinned[1]
+        cached = self.__cached_encodings
+        if cached is not None and cached[0] == self.weights_version and cached[1] is cell_data:
+            return cached[2]
+        encodings = self.encoding_prediction(cell_data)
+        encodings.setflags(write=False)
+        # keeps a reference to the data set, its identity is part of the key
+        self.__cached_encodings = self.weights_version, cell_data, encodings
+        return encodings
+
+    @final
+    @contextmanager
+    def pinned_encodings(self, cell_data, encodings):
+        """ inside, cached_encoding_prediction(cell_data) of the current thread returns the given encodings,
+            e.g. for interceptors running in the background while training continues
+        """
+        previous = getattr(self.__pinned, 'encodings', None)
+        self.__pinned.encodings = cell_data, encodings
+        try:
+            yield
+        finally:
+            self.__pinned.encodings = previous
+
     @abstractmethod
     def random_encoding_vector(self, batch_size):
         pass
@@ -51,7 +139,7 @@ class BasicBiGan:
         """
             return format: ( true-positives, true-negatives )
         """
-        batch_size = len(sampled_batch)
+        batch_size = batch_length(sampled_batch)
         random_encodings = self.random_encoding_vector(batch_size)
         generated_cells = self.generate_cells(random_encodings)
         result = self._discriminator.predict((random_encodings, generated_cells), use_multiprocessing=True)
@@ -64,26 +152,11 @@ class BasicBiGan:
         return true_positives, batch_size - false_negatives
 
     def print_params_changes(self, msg):
-        curr_params = self.__last_layer_params()
-        changed = [components_changed(p_now, p_orig) for p_now, p_orig in zip(curr_params, self.__prev_params)]
+        """ which components were updated since the previous call, the first call compares with the initial weights
+        """
+        changed = self.__weight_monitor.components_changed(self.__weight_monitor.statistics())
         print(msg, 'G|E|D changed:', f'{changed[0]:1} | {changed[1]:1} | {changed[2]:1},')
-        self.__prev_params = curr_params
-
-    def __last_layer_params(self):
-        def collect_weights(component):
-            collected_weights = []
-            for lay in component.layers:
-                if len(lay.get_weights()) == 2:
-                    for weights in lay.get_weights():
-                        collected_weights.append(deepcopy(weights))
-            return collected_weights
-
-        return list(map(collect_weights, self.all_components))
-
-
-def components_changed(p_now, p_orig):
-    for n, o in zip(p_now, p_orig):
-        equality_matrix = tf.math.equal(n, o)
-        if not np.all(equality_matrix):
-            return True
-    return False
+
+
+def batch_length(batch):
+    return batch.shape[0] if isinstance(batch, tf.SparseTensor) else len(batch)
@@ -1,10 +1,13 @@
+from functools import partial
 from typing import Callable
 
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras import Model, layers, optimizers, losses, utils
+from tensorflow.keras import Model, layers, optimizers, losses, utils, mixed_precision
 
-from bigan_basic import BasicBiGan
+from bigan_basic import BasicBiGan, FLOAT32_PRECISION, FLOAT16_PRECISION, batch_length
+
+DEFAULT_LEARNING_RATE = 0.0075
 
 
 def _build_generator(encoding_size, gene_size):
@@ -21,12 +24,23 @@ def _build_generator(encoding_size, gene_size):
     x = layers.Dense(256, activation=tf.nn.sigmoid)(x)
     x = layers.Dropout(0.1)(x)
     x = layers.Dense(1024, activation=tf.nn.relu)(x)
-    cell_out = layers.Dense(gene_size, activation=tf.nn.relu)(x)
+    cell_out = layers.Dense(gene_size, activation=tf.nn.relu, dtype=tf.float32)(x)
     return Model([encoding_in, random_in], cell_out, name='cell_generator')
 
 
-def _build_encoder(encoding_size, gene_size):
-    cell_in = layers.Input(shape=gene_size, name='enc_cell_in')
+def _dense_with_cells(units, activation, x, cell_in, sparse_input):
+    """ Dense layer over Concatenate([x, cell_in]), for sparse cells as sum of the
+        two input projections, since sparse tensors cannot be concatenated
+    """
+    if not sparse_input:
+        x = layers.Concatenate()([x, cell_in])
+        return layers.Dense(units, activation=activation)(x)
+    x = layers.Add()([layers.Dense(units)(x), layers.Dense(units, use_bias=False)(cell_in)])
+    return layers.Activation(activation)(x)
+
+
+def _build_encoder(encoding_size, gene_size, sparse_input=False):
+    cell_in = layers.Input(shape=gene_size, sparse=sparse_input, name='enc_cell_in')
     # normal_cell_in = layers.BatchNormalization()(cell_in)
     proc_cell_in = layers.Dense(1000, activation=tf.nn.sigmoid)(cell_in)
     # x = layers.Dropout(0.15)(proc_cell_in)
@@ -36,13 +50,13 @@ def _build_encoder(encoding_size, gene_size):
     x = layers.Dropout(0.15)(x)
     x = layers.Concatenate()([x, proc_cell_in])
     x = layers.Dense(150, activation=tf.nn.sigmoid)(x)
-    encoding_out = layers.Dense(encoding_size, activation=tf.nn.softmax)(x)
+    encoding_out = layers.Dense(encoding_size, activation=tf.nn.softmax, dtype=tf.float32)(x)
     return Model(cell_in, encoding_out, name='cell_encoder')
 
 
-def _build_discriminator(encoding_size, gene_size):
+def _build_discriminator(encoding_size, gene_size, sparse_input=False):
     encoding_in = layers.Input(shape=encoding_size, name='encoding_input')
-    cell_in = layers.Input(shape=gene_size, name='cell_input')
+    cell_in = layers.Input(shape=gene_size, sparse=sparse_input, name='cell_input')
 
     x = layers.Dense(50, activation=tf.nn.sigmoid)(encoding_in)
     x2 = layers.Dense(50, activation=tf.nn.sigmoid)(encoding_in)
@@ -56,8 +70,7 @@ def _build_discriminator(encoding_size, gene_size):
     l_widths = [int(gene_size * f) for f in [0.3, 0.1, 0.05]]
     x = layers.Dense(l_widths[0], activation=tf.nn.sigmoid)(cell_in)
     x = layers.Dropout(0.15)(x)
-    x = layers.Concatenate()([x, cell_in])
-    x = layers.Dense(l_widths[1], activation=tf.nn.sigmoid)(x)
+    x = _dense_with_cells(l_widths[1], tf.nn.sigmoid, x, cell_in, sparse_input)
     x = layers.BatchNormalization()(x)
     x = layers.Dropout(0.15)(x)
     x = layers.Dense(l_widths[2], activation=tf.nn.sigmoid)(x)
@@ -71,10 +84,14 @@ def _build_discriminator(encoding_size, gene_size):
     x = layers.Dense(50, activation=tf.nn.sigmoid)(x)
     x = layers.Dense(50, activation=tf.nn.sigmoid)(x)
     x = layers.Dense(10, activation=tf.nn.sigmoid)(x)
-    prob = layers.Dense(1, activation=tf.nn.sigmoid)(x)
+    prob = layers.Dense(1, activation=tf.nn.sigmoid, dtype=tf.float32)(x)
     return Model([encoding_in, cell_in], prob, name='cell_discriminator')
 
 
+def dense_cells(cell_data):
+    return tf.sparse.to_dense(cell_data) if isinstance(cell_data, tf.SparseTensor) else cell_data
+
+
 def print_dot():
     print('.', end='', flush=True)
 
@@ -83,9 +100,18 @@ class ClassifyCellBiGan(BasicBiGan):
     def __init__(self, encoding_size, gene_size,
                  generator_factory: Callable[[int, int], Model] = _build_generator,
                  encoder_factory: Callable[[int, int], Model] = _build_encoder,
-                 discriminator_factory: Callable[[int, int], Model] = _build_discriminator):
-        super().__init__(encoding_size, gene_size, generator_factory, encoder_factory, discriminator_factory)
-        discr_optimizer = optimizers.RMSprop(learning_rate=0.0075, rho=0.85, momentum=0.1)
+                 discriminator_factory: Callable[[int, int], Model] = _build_discriminator,
+                 precision=FLOAT32_PRECISION, sparse_input=False, learning_rate=DEFAULT_LEARNING_RATE):
+        """ sparse_input: encoder + discriminator take cell batches as tf.SparseTensor
+        """
+        if sparse_input:
+            encoder_factory = partial(encoder_factory, sparse_input=True)
+            discriminator_factory = partial(discriminator_factory, sparse_input=True)
+        super().__init__(encoding_size, gene_size, generator_factory, encoder_factory, discriminator_factory, precision)
+        self.sparse_input = sparse_input
+        discr_optimizer = optimizers.RMSprop(learning_rate=learning_rate, rho=0.85, momentum=0.1)
+        if precision == FLOAT16_PRECISION:
+            discr_optimizer = mixed_precision.LossScaleOptimizer(discr_optimizer)
 
         self._generator.trainable = True
         self._encoder.trainable = False
@@ -123,27 +149,41 @@ class ClassifyCellBiGan(BasicBiGan):
         argmax = tf.math.argmax(prediction, -1)
         return utils.to_categorical(argmax, num_classes=self.encoding_size)
 
+    def graph_random_encoding(self, rng: tf.random.Generator, batch_size):
+        rand_ixs = rng.uniform([batch_size], minval=0, maxval=self.encoding_size, dtype=tf.int32)
+        return tf.one_hot(rand_ixs, self.encoding_size)
+
+    def graph_trainings_encoding(self, prediction):
+        return tf.one_hot(tf.math.argmax(prediction, -1), self.encoding_size)
+
     def trainings_step(self, batch):
-        batch_size = len(batch)
+        batch_size = batch_length(batch)
         y_ones = tf.repeat(0.95, batch_size)
         y_zeros = tf.zeros(batch_size)
         encodings = self.random_encoding_vector(batch_size)
         noise = self.random_uniform_vector(batch_size)
 
-        g_loss = self.__train_generator(batch, encodings, noise, y_ones)
-        e_loss = self.__train_encoder(batch, encodings, noise, y_zeros)
-
-        generated_cells = self.generate_cells(encodings, noise)
-        d_loss_1 = self.__train_discriminator(encodings, generated_cells, y_zeros)
-        generated_encodings = self.trainings_encoding_prediction(batch)
-        d_loss_2 = self.__train_discriminator(generated_encodings, batch, y_ones)
+        with self.timer.phase('train-generator'):
+            g_loss = self.__train_generator(batch, encodings, noise, y_ones)
+        with self.timer.phase('train-encoder'):
+            e_loss = self.__train_encoder(batch, encodings, noise, y_zeros)
+
+        with self.timer.phase('generate-cells'):
+            generated_cells = self.generate_cells(encodings, noise)
+        with self.timer.phase('train-discriminator'):
+            d_loss_1 = self.__train_discriminator(encodings, generated_cells, y_zeros)
+        with self.timer.phase('predict-encodings'):
+            generated_encodings = self.trainings_encoding_prediction(batch)
+        with self.timer.phase('train-discriminator'):
+            d_loss_2 = self.__train_discriminator(generated_encodings, batch, y_ones)
         d_loss = np.mean([d_loss_1, d_loss_2])
+        self.weights_updated()
 
         return g_loss, e_loss, d_loss
 
     def __train_generator(self, cell_data, encodings, noise, y_ones):
         loss_from_discr = self._train_gen_w_discr.train_on_batch((encodings, noise), y_ones)
-        loss_from_enc = self._train_gen_w_enc.train_on_batch((cell_data, noise), cell_data)
+        loss_from_enc = self._train_gen_w_enc.train_on_batch((cell_data, noise), dense_cells(cell_data))
         return loss_from_discr + loss_from_enc
 
     def __train_encoder(self, cell_data, encodings, noise, y_zeros):
@@ -1,7 +1,8 @@
 import tensorflow as tf
 from tensorflow.keras import Model, layers
 
-from bigan_classify import ClassifyCellBiGan
+from bigan_basic import FLOAT32_PRECISION
+from bigan_classify import ClassifyCellBiGan, DEFAULT_LEARNING_RATE, _dense_with_cells
 
 
 def _build_generator(encoding_size, gene_size):
@@ -21,32 +22,35 @@ def _build_generator(encoding_size, gene_size):
     x = layers.Dense(layer_widths[1], activation=tf.nn.sigmoid)(x)
     x = layers.Dense(layer_widths[0], activation=tf.nn.relu)(x)
     x = layers.BatchNormalization()(x)
-    cell_out = layers.Dense(gene_size, activation=tf.nn.relu, name='gen_encoding_out')(x)
+    cell_out = layers.Dense(gene_size, activation=tf.nn.relu, name='gen_encoding_out', dtype=tf.float32)(x)
     return Model([encoding_in, random_in], cell_out, name='cell_generator')
 
 
-def _build_encoder(encoding_size, gene_size):
+def _build_encoder(encoding_size, gene_size, sparse_input=False):
     layer_widths = [int(gene_size * f) for f in [0.1, 0.05]]
 
-    cell_in = layers.Input(shape=gene_size, name='enc_cell_in')
+    cell_in = layers.Input(shape=gene_size, sparse=sparse_input, name='enc_cell_in')
     x = layers.Dense(layer_widths[0], activation=tf.nn.sigmoid)(cell_in)
     x = layers.Dropout(0.15)(x)
-    x = layers.Concatenate()([x, cell_in])
-    x = layers.Dense(layer_widths[1], activation=tf.nn.sigmoid)(x)
+    x = _dense_with_cells(layer_widths[1], tf.nn.sigmoid, x, cell_in, sparse_input)
     x = layers.Dropout(0.1)(x)
     x = layers.BatchNormalization()(x)
     x = layers.Dense(150, activation=tf.nn.sigmoid)(x)
     x = layers.Dense(150, activation=tf.nn.sigmoid)(x)
-    encoding_out = layers.Dense(encoding_size, activation=tf.nn.sigmoid, name='enc_encoding_out')(x)
+    encoding_out = layers.Dense(encoding_size, activation=tf.nn.sigmoid, name='enc_encoding_out', dtype=tf.float32)(x)
     return Model(cell_in, encoding_out, name='cell_encoder')
 
 
 class ContinuousCellBiGan(ClassifyCellBiGan):
-    def __init__(self, encoding_size, gene_size):
+    def __init__(self, encoding_size, gene_size, precision=FLOAT32_PRECISION, sparse_input=False,
+                 learning_rate=DEFAULT_LEARNING_RATE):
         super().__init__(
             encoding_size, gene_size,
             generator_factory=_build_generator,
-            encoder_factory=_build_encoder
+            encoder_factory=_build_encoder,
+            precision=precision,
+            sparse_input=sparse_input,
+            learning_rate=learning_rate
         )
 
     def random_encoding_vector(self, batch_size):
@@ -54,3 +58,9 @@ class ContinuousCellBiGan(ClassifyCellBiGan):
 
     def trainings_encoding_prediction(self, cell_data):
         return self.encoding_prediction(cell_data)
+
+    def graph_random_encoding(self, rng: tf.random.Generator, batch_size):
+        return rng.uniform([batch_size, self.encoding_size], minval=0, maxval=1)
+
+    def graph_trainings_encoding(self, prediction):
+        return prediction
@@ -0,0 +1,82 @@
+import tensorflow as tf
+from tensorflow.keras import Model, mixed_precision
+
+from bigan_classify import ClassifyCellBiGan, dense_cells
+
+
+def train_model(model: Model, inputs, target, trained: Model, components):
+    """ same update as Model.train_on_batch of the compiled training model: only the trained
+        component is trainable (its layers run in training mode), the components' trainable
+        flags are restored afterwards
+    """
+    optimizer = model.optimizer
+    scaled_loss = isinstance(optimizer, mixed_precision.LossScaleOptimizer)
+    trainable_flags = [component.trainable for component in components]
+    for component in components:
+        component.trainable = component is trained
+    try:
+        with tf.GradientTape() as tape:
+            prediction = model(inputs, training=True)
+            loss = model.compiled_loss(target, prediction, regularization_losses=model.losses)
+            if scaled_loss:
+                loss_to_minimise = optimizer.get_scaled_loss(loss)
+            else:
+                loss_to_minimise = loss
+        variables = trained.trainable_variables
+        gradients = tape.gradient(loss_to_minimise, variables)
+        if scaled_loss:
+            gradients = optimizer.get_unscaled_gradients(gradients)
+        optimizer.apply_gradients(zip(gradients, variables))
+    finally:
+        for component, trainable in zip(components, trainable_flags):
+            component.trainable = trainable
+    return loss
+
+
+class FusedTrainingStep:
+    """ Runs the complete generator / encoder / discriminator update of a
+        ClassifyCellBiGan (or subclass) as a single tf.function, with random
+        encodings + noise drawn in-graph. Losses are returned as tensors.
+    """
+
+    def __init__(self, network: ClassifyCellBiGan, jit_compile=False, seed=None):
+        self.network = network
+        self.rng = tf.random.Generator.from_non_deterministic_state() if seed is None \
+            else tf.random.Generator.from_seed(seed)
+        self.__step = tf.function(self.__trainings_step, experimental_compile=jit_compile,
+                                  experimental_relax_shapes=True)
+
+    def __call__(self, batch, encodings=None, noise=None):
+        batch = tf.cast(batch, self.network.input_dtype)
+        losses = self.__step(batch, encodings, noise)
+        self.network.weights_updated()
+        return losses
+
+    def __trainings_step(self, batch, encodings, noise):
+        net = self.network
+        if isinstance(batch, tf.SparseTensor):
+            batch_size = tf.cast(batch.dense_shape[0], tf.int32)
+        else:
+            batch_size = tf.shape(batch)[0]
+        y_ones = tf.fill([batch_size], 0.95)
+        y_zeros = tf.zeros([batch_size])
+        if encodings is None:
+            encodings = net.graph_random_encoding(self.rng, batch_size)
+        if noise is None:
+            noise = self.rng.uniform([batch_size, net.encoding_size], minval=0, maxval=1)
+
+        components = net.all_components
+        g_loss = train_model(net._train_gen_w_discr, (encodings, noise), y_ones, net._generator, components) + \
+            train_model(net._train_gen_w_enc, (batch, noise), dense_cells(batch), net._generator, components)
+        e_loss = train_model(net._train_enc_w_discr, batch, y_zeros, net._encoder, components) + \
+            train_model(net._train_enc_w_gen, (encodings, noise), encodings, net._encoder, components)
+
+        generated_cells = tf.math.round(net._generator((encodings, noise), training=False))
+        d_loss_1 = train_model(net._discriminator, (encodings, generated_cells), y_zeros,
+                               net._discriminator, components)
+        generated_encodings = net.graph_trainings_encoding(net._encoder(batch, training=False))
+        d_loss_2 = train_model(net._discriminator, (generated_encodings, batch), y_ones,
+                               net._discriminator, components)
+        d_loss = (d_loss_1 + d_loss_2) / 2
+
+        return g_loss, e_loss, d_loss
@@ -0,0 +1,149 @@
+from abc import abstractmethod
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def compact_value_type(values):
+    return np.min_scalar_type(values.max(initial=0)) if values.min(initial=0) >= 0 else values.dtype
+
+
+class CellMatrix:
+    """ Barcodes x genes matrix with row access, returned as dense arrays.
+    """
+
+    @property
+    @abstractmethod
+    def shape(self):
+        pass
+
+    def __len__(self):
+        return self.shape[0]
+
+    @abstractmethod
+    def rows(self, ixs, dtype=np.float32):
+        pass
+
+    @abstractmethod
+    def sparse_chunks(self, chunk_rows=DEFAULT_CHUNK_SIZE):
+        pass
+
+    @abstractmethod
+    def select_genes(self, gene_positions):
+        pass
+
+    def sparse_rows(self, ixs):
+        """ rows as CSR matrix
+        """
+        return sparse.csr_matrix(self.rows(ixs))
+
+    def sample_ixs(self, n, random_state=None):
+        return np.random.RandomState(random_state).choice(len(self), size=n, replace=False)
+
+    def sample(self, n, random_state=None, dtype=np.float32):
+        return self.rows(self.sample_ixs(n, random_state), dtype)
+
+    def dense_batches(self, batch_size=DEFAULT_CHUNK_SIZE, dtype=np.float32):
+        for start in range(0, len(self), batch_size):
+            yield self.rows(slice(start, start + batch_size), dtype)
+
+    def subset(self, ixs):
+        """ the rows ixs as cell matrix, rows are read through this matrix on access
+        """
+        return RowSubset(self, ixs)
+
+
+class SparseCells(CellMatrix):
+    """ Barcodes x genes expression counts, stored as CSR matrix.
+        index:   barcode line numbers (1-based) of each row
+        columns: gene line numbers (1-based) of each column
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, index, columns):
+        self.matrix = matrix
+        self.index = np.asarray(index)
+        self.columns = np.asarray(columns)
+
+    @staticmethod
+    def from_entries(genes, barcodes, values):
+        index, rows = np.unique(barcodes, return_inverse=True)
+        columns, cols = np.unique(genes, return_inverse=True)
+        matrix = sparse.csr_matrix(
+            (values.astype(compact_value_type(values)), (rows, cols)),
+            shape=(len(index), len(columns))
+        )
+        return SparseCells(matrix, index, columns)
+
+    @staticmethod
+    def from_frame(frame):
+        """ cells of a barcodes x genes DataFrame
+        """
+        return SparseCells(sparse.csr_matrix(frame.values), frame.index, frame.columns)
+
+    @staticmethod
+    def from_arrays(arrays):
+        matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(arrays['shape']), copy=False
+        )
+        return SparseCells(matrix, arrays['index'], arrays['columns'])
+
+    def to_arrays(self):
+        return {
+            'data': self.matrix.data,
+            'indices': self.matrix.indices,
+            'indptr': self.matrix.indptr,
+            'shape': np.array(self.matrix.shape),
+            'index': self.index,
+            'columns': self.columns
+        }
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def rows(self, ixs, dtype=np.float32):
+        return self.matrix[ixs].toarray().astype(dtype, copy=False)
+
+    def sparse_rows(self, ixs):
+        return self.matrix[ixs]
+
+    def sparse_chunks(self, chunk_rows=DEFAULT_CHUNK_SIZE):
+        for start in range(0, len(self), chunk_rows):
+            yield self.matrix[start:start + chunk_rows]
+
+    def select_genes(self, gene_positions):
+        return SparseCells(self.matrix[:, gene_positions], self.index, self.columns[gene_positions])
+
+    def subset(self, ixs):
+        return SparseCells(self.matrix[ixs], self.index[ixs], self.columns)
+
+
+class RowSubset(CellMatrix):
+    """ Selected rows of another cell matrix, e.g. the training rows of a CellStore
+    """
+
+    def __init__(self, cells: CellMatrix, ixs):
+        self.cells = cells
+        self.ixs = np.asarray(ixs)
+        self.index = cells.index[self.ixs]
+        self.columns = cells.columns
+
+    @property
+    def shape(self):
+        return len(self.ixs), self.cells.shape[1]
+
+    def rows(self, ixs, dtype=np.float32):
+        return self.cells.rows(self.ixs[ixs], dtype)
+
+    def sparse_rows(self, ixs):
+        return self.cells.sparse_rows(self.ixs[ixs])
+
+    def sparse_chunks(self, chunk_rows=DEFAULT_CHUNK_SIZE):
+        chunk_rows = chunk_rows or DEFAULT_CHUNK_SIZE
+        for start in range(0, len(self), chunk_rows):
+            yield self.sparse_rows(slice(start, start + chunk_rows))
+
+    def select_genes(self, gene_positions):
+        return RowSubset(self.cells.select_genes(gene_positions), self.ixs)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from scipy import sparse
+
+from cell_matrix import CellMatrix, SparseCells
+
+AUTOTUNE = tf.data.experimental.AUTOTUNE
+
+
+def sparse_tensor(rows: sparse.csr_matrix, dtype=np.float32):
+    """ CSR rows as tf.SparseTensor, in the canonical row-major index order
+    """
+    coo = rows.sorted_indices().tocoo()
+    indices = np.stack([coo.row, coo.col], axis=1).astype(np.int64)
+    return tf.SparseTensor(indices, coo.data.astype(dtype), coo.shape)
+
+
+def ragged_rows(cells: SparseCells):
+    """ CSR rows as ragged tensors: ( column-indices, values )
+    """
+    matrix = cells.matrix if cells.matrix.has_sorted_indices else cells.matrix.sorted_indices()
+    row_lengths = np.diff(matrix.indptr).astype(np.int64)
+    columns = tf.RaggedTensor.from_row_lengths(matrix.indices.astype(np.int64), row_lengths)
+    values = tf.RaggedTensor.from_row_lengths(matrix.data.astype(np.float32), row_lengths)
+    return columns, values
+
+
+def sparse_row_gather(cells: SparseCells, sparse_output=False):
+    columns, values = ragged_rows(cells)
+    gene_size = cells.shape[1]
+
+    def gather(row_ixs):
+        batch_columns = tf.gather(columns, row_ixs)
+        batch_values = tf.gather(values, row_ixs)
+        positions = tf.stack([batch_columns.value_rowids(), batch_columns.flat_values], axis=1)
+        batch_shape = tf.stack([tf.size(row_ixs, tf.int64), gene_size])
+        if sparse_output:
+            return tf.SparseTensor(positions, batch_values.flat_values, batch_shape)
+        return tf.scatter_nd(positions, batch_values.flat_values, batch_shape)
+
+    return gather
+
+
+def dense_row_gather(data):
+    values = tf.constant(np.asarray(data, dtype=np.float32))
+
+    def gather(row_ixs):
+        return tf.gather(values, row_ixs)
+
+    return gather
+
+
+def sampled_batches(data: CellMatrix, batch_size):
+    def generate():
+        while True:
+            yield data.sample(batch_size)
+
+    return tf.data.Dataset.from_generator(
+        generate, output_types=tf.float32, output_shapes=(batch_size, data.shape[1])
+    )
+
+
+def cell_batches(data, batch_size, shuffle_buffer=None, seed=None, parallel_calls=AUTOTUNE, prefetch=AUTOTUNE,
+                 sparse_output=False):
+    """ Endless dataset of dense float32 cell batches, or tf.SparseTensor batches with sparse_output.
+        In-memory data is drawn as per-epoch permutations (without replacement within an epoch),
+        shuffle_buffer limits the permutation window. Other cell matrices are sampled on the host.
+        DataFrames are converted to SparseCells for sparse batches.
+    """
+    if sparse_output and isinstance(data, pd.DataFrame):
+        data = SparseCells.from_frame(data)
+    if isinstance(data, CellMatrix) and not isinstance(data, SparseCells):
+        batches = sampled_batches(data, batch_size)
+        if sparse_output:
+            batches = batches.map(tf.sparse.from_dense, num_parallel_calls=parallel_calls)
+        return batches.prefetch(prefetch)
+
+    gather = sparse_row_gather(data, sparse_output) if isinstance(data, SparseCells) else dense_row_gather(data)
+    cell_count = len(data)
+    return tf.data.Dataset.range(cell_count) \
+        .shuffle(shuffle_buffer or cell_count, seed=seed, reshuffle_each_iteration=True) \
+        .repeat() \
+        .batch(batch_size, drop_remainder=True) \
+        .map(gather, num_parallel_calls=parallel_calls) \
+        .prefetch(prefetch)
@@ -0,0 +1,182 @@
+import json
+import pathlib
+
+import numpy as np
+from scipy import sparse
+
+from cell_matrix import CellMatrix, SparseCells, compact_value_type
+from mtx_parser import parse_mtx_chunks, DEFAULT_CHUNK_BYTES
+
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.npy'
+COLUMNS_FILE = 'columns.npy'
+DEFAULT_CHUNK_ROWS = 8192
+
+
+def chunk_dir(store_dir, chunk_ix):
+    return pathlib.Path(store_dir) / f'chunk-{chunk_ix:05}'
+
+
+class CellStoreWriter:
+    """ Writes row chunks of a cell matrix to disk, either as CSR arrays or dense arrays.
+    """
+
+    def __init__(self, store_dir, column_count, chunk_rows=DEFAULT_CHUNK_ROWS, sparse_chunks=True):
+        self.store_dir = pathlib.Path(store_dir)
+        self.column_count = column_count
+        self.chunk_rows = chunk_rows
+        self.sparse_chunks = sparse_chunks
+        self.chunk_count = 0
+        self.row_count = 0
+        self.store_dir.mkdir(parents=True)
+
+    def write_chunk(self, chunk: sparse.csr_matrix):
+        assert chunk.shape[1] == self.column_count, \
+            f'chunk has {chunk.shape[1]} columns, expected {self.column_count}'
+        target = chunk_dir(self.store_dir, self.chunk_count)
+        target.mkdir()
+        if self.sparse_chunks:
+            np.save(target / 'data.npy', chunk.data)
+            np.save(target / 'indices.npy', chunk.indices)
+            np.save(target / 'indptr.npy', chunk.indptr)
+        else:
+            np.save(target / 'dense.npy', chunk.toarray())
+        self.chunk_count += 1
+        self.row_count += chunk.shape[0]
+
+    def close(self, index, columns):
+        assert len(index) == self.row_count, f'index length {len(index)} != rows {self.row_count}'
+        np.save(self.store_dir / INDEX_FILE, np.asarray(index))
+        np.save(self.store_dir / COLUMNS_FILE, np.asarray(columns))
+        with open(self.store_dir / META_FILE, 'w') as f:
+            json.dump({
+                'shape': [self.row_count, self.column_count],
+                'chunk_rows': self.chunk_rows,
+                'chunks': self.chunk_count,
+                'sparse': self.sparse_chunks
+            }, f)
+
+
+def write_cell_store(store_dir, cells: SparseCells, chunk_rows=DEFAULT_CHUNK_ROWS, sparse_chunks=True):
+    writer = CellStoreWriter(store_dir, cells.shape[1], chunk_rows, sparse_chunks)
+    for start in range(0, len(cells), chunk_rows):
+        writer.write_chunk(cells.matrix[start:start + chunk_rows])
+    writer.close(cells.index, cells.columns)
+    return CellStore(store_dir)
+
+
+def write_mtx_cell_store(store_dir, matrix_file, chunk_rows=DEFAULT_CHUNK_ROWS, sparse_chunks=True,
+                         processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """ Streams a MatrixMarket file into a cell store without loading the whole matrix.
+        Entries have to be ordered by barcode (as written by cellranger).
+        First pass collects barcode + gene index, second pass writes the row chunks.
+    """
+    index, columns, max_value = np.empty(0, np.int32), np.empty(0, np.int32), 0
+    for genes, barcodes, values in parse_mtx_chunks(matrix_file, processes, chunk_bytes):
+        ordered = np.all(np.diff(barcodes) >= 0) and (len(index) == 0 or len(barcodes) == 0 or barcodes[0] >= index[-1])
+        assert ordered, f'matrix entries not ordered by barcode: {matrix_file}'
+        index = np.union1d(index, barcodes)
+        columns = np.union1d(columns, genes)
+        max_value = max(max_value, values.max(initial=0))
+    value_type = compact_value_type(np.array([max_value]))
+
+    writer = CellStoreWriter(store_dir, len(columns), chunk_rows, sparse_chunks)
+    pending = [np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, value_type)]
+
+    def flush_chunks(complete_rows):
+        while writer.row_count < complete_rows and \
+                (writer.row_count + chunk_rows <= complete_rows or complete_rows == len(index)):
+            chunk_end = min(writer.row_count + chunk_rows, complete_rows)
+            split = np.searchsorted(pending[0], chunk_end)
+            rows, cols, vals = (entries[:split] for entries in pending)
+            writer.write_chunk(sparse.csr_matrix(
+                (vals, (rows - writer.row_count, cols)), shape=(chunk_end - writer.row_count, len(columns))
+            ))
+            pending[:] = [entries[split:] for entries in pending]
+
+    for genes, barcodes, values in parse_mtx_chunks(matrix_file, processes, chunk_bytes):
+        chunk_entries = np.searchsorted(index, barcodes), np.searchsorted(columns, genes), values.astype(value_type)
+        pending[:] = [np.concatenate([p, e]) for p, e in zip(pending, chunk_entries)]
+        if len(pending[0]):
+            # last row might continue in the next chunk
+            flush_chunks(pending[0][-1])
+    flush_chunks(len(index))
+    writer.close(index, columns)
+    return CellStore(store_dir)
+
+
+class CellStore(CellMatrix):
+    """ Row-chunked cell matrix on disk, chunks are memory-mapped on access.
+    """
+
+    def __init__(self, store_dir, gene_positions=None):
+        self.store_dir = pathlib.Path(store_dir)
+        with open(self.store_dir / META_FILE) as f:
+            meta = json.load(f)
+        self.__stored_shape = tuple(meta['shape'])
+        self.chunk_rows = meta['chunk_rows']
+        self.chunk_count = meta['chunks']
+        self.sparse_store = meta['sparse']
+        self.index = np.load(self.store_dir / INDEX_FILE, mmap_mode='r')
+        self.columns = np.load(self.store_dir / COLUMNS_FILE, mmap_mode='r')
+        self.gene_positions = gene_positions
+        if gene_positions is not None:
+            self.columns = self.columns[gene_positions]
+        self.__chunks = {}
+
+    @property
+    def shape(self):
+        return self.__stored_shape[0], len(self.columns)
+
+    def select_genes(self, gene_positions):
+        if self.gene_positions is not None:
+            gene_positions = self.gene_positions[gene_positions]
+        return CellStore(self.store_dir, gene_positions)
+
+    def chunk(self, chunk_ix):
+        if chunk_ix not in self.__chunks:
+            source = chunk_dir(self.store_dir, chunk_ix)
+            if self.sparse_store:
+                chunk_rows = min(self.chunk_rows, self.__stored_shape[0] - chunk_ix * self.chunk_rows)
+                self.__chunks[chunk_ix] = sparse.csr_matrix((
+                    np.load(source / 'data.npy', mmap_mode='r'),
+                    np.load(source / 'indices.npy', mmap_mode='r'),
+                    np.load(source / 'indptr.npy', mmap_mode='r')
+                ), shape=(chunk_rows, self.__stored_shape[1]), copy=False)
+            else:
+                self.__chunks[chunk_ix] = np.load(source / 'dense.npy', mmap_mode='r')
+        return self.__chunks[chunk_ix]
+
+    def __select_columns(self, chunk_rows):
+        return chunk_rows if self.gene_positions is None else chunk_rows[:, self.gene_positions]
+
+    def rows(self, ixs, dtype=np.float32):
+        ixs = np.arange(len(self))[ixs] if isinstance(ixs, slice) else np.asarray(ixs)
+        result = np.empty((len(ixs), self.shape[1]), dtype=dtype)
+        chunk_ixs = ixs // self.chunk_rows
+        for chunk_ix in np.unique(chunk_ixs):
+            selected = chunk_ixs == chunk_ix
+            chunk_rows = self.__select_columns(self.chunk(chunk_ix)[ixs[selected] - chunk_ix * self.chunk_rows])
+            result[selected] = chunk_rows.toarray() if self.sparse_store else chunk_rows
+        return result
+
+    def sparse_rows(self, ixs):
+        if not self.sparse_store:
+            return super().sparse_rows(ixs)
+        ixs = np.arange(len(self))[ixs] if isinstance(ixs, slice) else np.asarray(ixs)
+        chunk_ixs = ixs // self.chunk_rows
+        chunk_order = np.argsort(chunk_ixs, kind='stable')
+        chunk_rows = [
+            self.__select_columns(self.chunk(chunk_ix)[ixs[chunk_ixs == chunk_ix] - chunk_ix * self.chunk_rows])
+            for chunk_ix in np.unique(chunk_ixs)
+        ]
+        if not chunk_rows:
+            return sparse.csr_matrix((0, self.shape[1]))
+        # stacked rows are grouped by chunk, restore the requested order
+        return sparse.vstack(chunk_rows, format='csr')[np.argsort(chunk_order)]
+
+    def sparse_chunks(self, chunk_rows=None):
+        """ yields the stored row chunks as CSR matrices, chunk_rows is given by the store
+        """
+        for chunk_ix in range(self.chunk_count):
+            yield sparse.csr_matrix(self.__select_columns(self.chunk(chunk_ix)))
@@ -1,50 +1,167 @@
 from typing import Callable, Any
 
+import numpy as np
 import pandas as pd
+import tensorflow as tf
 
-from bigan_classify import ClassifyCellBiGan
+from bigan_basic import FLOAT32_PRECISION
+from bigan_classify import DEFAULT_LEARNING_RATE
 from bigan_cont import ContinuousCellBiGan
+from bigan_fused import FusedTrainingStep
+from cell_matrix import CellMatrix, SparseCells
+from cell_pipeline import cell_batches, sparse_tensor
+from matrix_cache import MatrixCache
+from mtx_parser import parse_mtx
+from phase_timer import NULL_TIMER
 
 
-def load_matrix(matrix_file, verbose=False):
+def storable(values):
+    return values.astype(str) if values.dtype == object else values
+
+
+def frame_to_arrays(df):
+    return {'values': df.values, 'index': storable(df.index.values), 'columns': storable(df.columns.values)}
+
+
+def frame_from_arrays(arrays):
+    return pd.DataFrame(arrays['values'], index=arrays['index'], columns=arrays['columns'])
+
+
+def cached(cache: MatrixCache, source_file, kind, create, to_arrays, from_arrays):
+    if cache is None:
+        return create()
+    return from_arrays(cache.load(source_file, kind, lambda: to_arrays(create())))
+
+
+def load_matrix(matrix_file, verbose=False, cache: MatrixCache = None):
+    def pivot_matrix():
+        df = pd.read_csv(matrix_file, header=None, skiprows=3,
+                         delim_whitespace=True, names=['gene', 'barcode', 'p'])
+        return df.pivot_table(index='barcode', columns='gene', values='p', fill_value=0)
+
     if verbose:
         print(f'============ Loading {matrix_file}...')
-    df = pd.read_csv(matrix_file, header=None, skiprows=3,
-                     delim_whitespace=True, names=['gene', 'barcode', 'p'])
-    df = df.pivot_table(index='barcode', columns='gene', values='p', fill_value=0)
+    df = cached(cache, matrix_file, 'frame', pivot_matrix, frame_to_arrays, frame_from_arrays)
     if verbose:
         print(f'============ DONE! barcodes: {df.shape[0]}, genes: {df.shape[1]}')
     return df
 
 
-def load_cells(cells_file, verbose=False):
+def load_sparse_matrix(matrix_file, verbose=False, cache: MatrixCache = None):
+    def sparse_matrix():
+        return SparseCells.from_entries(*parse_mtx(matrix_file))
+
+    if verbose:
+        print(f'============ Loading {matrix_file}...')
+    cells = cached(cache, matrix_file, 'csr', sparse_matrix, SparseCells.to_arrays, SparseCells.from_arrays)
+    if verbose:
+        print(f'============ DONE! barcodes: {cells.shape[0]}, genes: {cells.shape[1]}, entries: {cells.matrix.nnz}')
+    return cells
+
+
+def load_cells(cells_file, verbose=False, cache: MatrixCache = None):
+    def read_cells():
+        return pd.read_csv(cells_file, index_col=0)
+
     if verbose:
         print(f'============ Loading {cells_file}...')
-    df = pd.read_csv(cells_file, index_col=0)
+    df = cached(cache, cells_file, 'cells', read_cells, frame_to_arrays, frame_from_arrays)
     if verbose:
         print(f'============ DONE! barcodes: {df.shape[0]}, genes: {df.shape[1]}')
     return df
 
 
+def row_subset(data, ixs):
+    """ rows of a CellMatrix or cell DataFrame
+    """
+    if isinstance(data, CellMatrix):
+        return data.subset(ixs)
+    return data.iloc[ixs]
+
+
 class CellTraining:
-    def __init__(self, data, batch_size, encoding_size, batches_per_iteration=10):
+    def __init__(self, data, batch_size, encoding_size, batches_per_iteration=10, input_pipeline=False,
+                 fused_step=False, jit_compile=False, precision=FLOAT32_PRECISION, sampler=None,
+                 sparse_input=False, network_class=ContinuousCellBiGan, learning_rate=DEFAULT_LEARNING_RATE,
+                 timer=None, holdout_ixs=None):
+        """ sampler: iterable of row index batches (see samplers), replaces random sampling per batch
+            sparse_input: cell batches are passed as tf.SparseTensor
+            network_class: ContinuousCellBiGan or ClassifyCellBiGan
+            timer: PhaseTimer for per-phase timings of the training loop
+            holdout_ixs: rows excluded from training, as holdout_data for evaluation (see evaluation.holdout_split),
+                         a sampler then draws row indices of training_data
+        """
+        assert sampler is None or not input_pipeline, 'sampler cannot be combined with the input pipeline'
+        # samplers (see samplers) know their batch size, plain iterables of row indices are taken as given
+        sampler_batch_size = getattr(sampler, 'batch_size', batch_size)
+        assert sampler_batch_size == batch_size, f'sampler batch size {sampler_batch_size} != batch size {batch_size}'
         self.batch_size = batch_size
         self.data = data
+        self.training_data = data
+        self.holdout_data = None
+        if holdout_ixs is not None:
+            self.training_data = row_subset(data, np.setdiff1d(np.arange(len(data)), holdout_ixs))
+            self.holdout_data = row_subset(data, holdout_ixs)
         self.batches_per_iteration = batches_per_iteration
-        self.network = ContinuousCellBiGan(encoding_size, gene_size=self.data.shape[1])
-        # self.network = ClassifyCellBiGan(encoding_size, gene_size=self.data.shape[1])
+        self.input_pipeline = input_pipeline
+        self.sampler = sampler
+        self.sparse_input = sparse_input
+        self.stop_reason = None
+        self.__frame_values = None
+        self.network = network_class(encoding_size, gene_size=self.data.shape[1], precision=precision,
+                                     sparse_input=sparse_input, learning_rate=learning_rate)
+        self.timer = timer or NULL_TIMER
+        self.network.timer = self.timer
+        self.fused_step = FusedTrainingStep(self.network, jit_compile) if fused_step else None
 
     def sample_cell_data(self, random_seed=None):
-        return self.data.sample(self.batch_size, random_state=random_seed)
+        if isinstance(self.training_data, CellMatrix):
+            return self.cell_rows(self.training_data.sample_ixs(self.batch_size, random_state=random_seed))
+        batch = self.training_data.sample(self.batch_size, random_state=random_seed)
+        if self.sparse_input:
+            return tf.sparse.from_dense(batch.values.astype(self.network.input_dtype))
+        return batch
+
+    def cell_rows(self, ixs):
+        if isinstance(self.training_data, CellMatrix):
+            if self.sparse_input:
+                return sparse_tensor(self.training_data.sparse_rows(ixs), self.network.input_dtype)
+            return self.training_data.rows(ixs, dtype=self.network.input_dtype)
+        if self.__frame_values is None:
+            self.__frame_values = np.asarray(self.training_data.values, dtype=self.network.input_dtype)
+        rows = self.__frame_values[ixs]
+        return tf.sparse.from_dense(rows) if self.sparse_input else rows
+
+    def batch_sampler(self):
+        if self.sampler is not None:
+            batch_ixs = iter(self.sampler)
+            return lambda: self.cell_rows(next(batch_ixs))
+        if not self.input_pipeline:
+            return self.sample_cell_data
+        batches = iter(cell_batches(self.training_data, self.batch_size, sparse_output=self.sparse_input))
+        return lambda: next(batches)
+
+    def stop(self, reason):
+        """ ends run after the current iteration
+        """
+        self.stop_reason = reason
 
-    def run(self, iterations, interceptor: Callable[[int, Any], None] = None):
-        for it in range(iterations):
+    def run(self, iterations, interceptor: Callable[[int, Any], None] = None, start_iteration=0):
+        self.stop_reason = None
+        next_batch = self.batch_sampler()
+        trainings_step = self.fused_step or self.network.trainings_step
+        for it in range(start_iteration, iterations):
             g_losses = e_losses = d_losses = 0
             for batch_it in range(self.batches_per_iteration):
-                batch = self.sample_cell_data()
-                gl, el, dl = self.network.trainings_step(batch)
+                with self.timer.phase('sample'):
+                    batch = next_batch()
+                with self.timer.phase('step'):
+                    gl, el, dl = trainings_step(batch)
                 g_losses += gl
                 e_losses += el
                 d_losses += dl
             if interceptor:
-                interceptor(it, (g_losses, e_losses, d_losses))
+                interceptor(it, (float(g_losses), float(e_losses), float(d_losses)))
+            self.timer.end_iteration(it)
+            if self.stop_reason is not None:
+                break
@@ -0,0 +1,188 @@
+import os
+import pathlib
+import pickle
+import queue
+import random
+import threading
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import mixed_precision
+
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_TEMPLATE = 'checkpoint-{:08}.pkl'
+CHECKPOINT_PATTERN = 'checkpoint-*.pkl'
+DEFAULT_KEEP = 3
+
+
+def checkpoint_dir(log_dir):
+    return pathlib.Path(log_dir) / CHECKPOINT_DIR
+
+
+def trained_variables(network):
+    """ the variables updated by the shared optimizer, in a stable G, E, D order
+    """
+    return [v for component in network.all_components for v in component.weights if v.trainable]
+
+
+def base_optimizer(network):
+    optimizer = network._discriminator.optimizer
+    if isinstance(optimizer, mixed_precision.LossScaleOptimizer):
+        return optimizer.inner_optimizer
+    return optimizer
+
+
+def optimizer_state(network):
+    optimizer = base_optimizer(network)
+    variables = trained_variables(network)
+    slots = {}
+    for slot_name in optimizer.get_slot_names():
+        slots[slot_name] = [optimizer.get_slot(v, slot_name).numpy() for v in variables]
+    return {'iterations': int(optimizer.iterations.numpy()), 'slots': slots}
+
+
+def has_slots(optimizer, variables, slot_names):
+    try:
+        for slot_name in slot_names:
+            optimizer.get_slot(variables[0], slot_name)
+        return True
+    except KeyError:
+        return False
+
+
+def restore_optimizer_state(network, state):
+    optimizer = base_optimizer(network)
+    variables = trained_variables(network)
+    if state['slots'] and not has_slots(optimizer, variables, state['slots']):
+        # creates the slots, with fresh (zero) slots a zero gradient step leaves the variables unchanged
+        optimizer.apply_gradients([(tf.zeros_like(v), v) for v in variables])
+    optimizer.iterations.assign(state['iterations'])
+    for slot_name, values in state['slots'].items():
+        for v, value in zip(variables, values):
+            optimizer.get_slot(v, slot_name).assign(value)
+
+
+def random_state(trainer):
+    state = {'python': random.getstate(), 'numpy': np.random.get_state()}
+    if trainer.fused_step:
+        state['fused'] = trainer.fused_step.rng.state.numpy()
+    return state
+
+
+def restore_random_state(trainer, state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    if trainer.fused_step and 'fused' in state:
+        trainer.fused_step.rng.reset(state['fused'])
+
+
+def training_snapshot(trainer, iteration, meta=None):
+    """ copies all state needed to continue training after iteration, on the calling thread
+    """
+    snapshot = {
+        'iteration': iteration,
+        'meta': meta or {},
+        'weights': [component.get_weights() for component in trainer.network.all_components],
+        'optimizer': optimizer_state(trainer.network),
+        'random': random_state(trainer)
+    }
+    if hasattr(trainer, 'worker_states'):
+        snapshot['workers'] = trainer.worker_states()
+    return snapshot
+
+
+def restore_snapshot(trainer, snapshot):
+    """ returns: the first iteration to run
+    """
+    workers = snapshot.get('workers')
+    if hasattr(trainer, 'restore_worker_states'):
+        assert workers is not None, 'checkpoint has no worker states, it cannot be resumed with WORKERS > 1'
+        trainer.restore_worker_states(workers)
+    else:
+        assert workers is None, f'checkpoint of a {len(workers)}-worker run, resume it with WORKERS = {len(workers)}'
+    for component, weights in zip(trainer.network.all_components, snapshot['weights']):
+        component.set_weights(weights)
+    trainer.network.weights_updated()
+    restore_optimizer_state(trainer.network, snapshot['optimizer'])
+    restore_random_state(trainer, snapshot['random'])
+    return snapshot['iteration'] + 1
+
+
+def checkpoint_files(target_dir):
+    return sorted(pathlib.Path(target_dir).glob(CHECKPOINT_PATTERN))
+
+
+def latest_checkpoint(target_dir):
+    files = checkpoint_files(target_dir)
+    return files[-1] if files else None
+
+
+def load_checkpoint(checkpoint_file):
+    with open(checkpoint_file, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_checkpoint(target_dir, snapshot, keep=DEFAULT_KEEP):
+    target = pathlib.Path(target_dir) / CHECKPOINT_TEMPLATE.format(snapshot['iteration'])
+    tmp_file = target.with_suffix('.tmp')
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, target)
+    for outdated in checkpoint_files(target_dir)[:-keep]:
+        outdated.unlink()
+    return target
+
+
+class CheckpointWriter:
+    """ Writes training snapshots from a background thread, so training only pays for copying the state.
+        While a write is in progress further snapshots wait in a queue of max_pending entries.
+    """
+
+    def __init__(self, target_dir, keep=DEFAULT_KEEP, max_pending=1):
+        assert keep > 0, f'at least one checkpoint has to be kept, keep: {keep}'
+        self.target_dir = pathlib.Path(target_dir)
+        self.target_dir.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.written = []
+        self.__pending = queue.Queue(maxsize=max_pending)
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__write_pending, name='checkpoint-writer', daemon=True)
+        self.__thread.start()
+
+    def __write_pending(self):
+        snapshot = self.__pending.get()
+        while snapshot is not None:
+            try:
+                self.written.append(write_checkpoint(self.target_dir, snapshot, self.keep))
+            except Exception as e:
+                self.__error = e
+            finally:
+                self.__pending.task_done()
+            snapshot = self.__pending.get()
+        self.__pending.task_done()
+
+    def __check_error(self):
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise AssertionError(f'checkpoint write failed: {error}') from error
+
+    def save(self, snapshot):
+        self.__check_error()
+        self.__pending.put(snapshot)
+
+    def wait(self):
+        self.__pending.join()
+        self.__check_error()
+
+    def close(self):
+        if self.__thread.is_alive():
+            self.__pending.put(None)
+            self.__thread.join()
+        self.__check_error()
+
+    def create_interceptor(self, trainer, every, meta=None):
+        def intercept(it, _):
+            if (it + 1) % every == 0:
+                self.save(training_snapshot(trainer, it, meta))
+
+        return intercept
@@ -0,0 +1,163 @@
+import numpy as np
+from bson import Binary
+
+F32_FORMAT = 'f32'
+U8_FORMAT = 'u8'
+# little-endian, the cellan API decodes with readFloatLE / readUInt8
+COORDS_DTYPES = {
+    F32_FORMAT: np.dtype('<f4'),
+    U8_FORMAT: np.dtype('u1')
+}
+DEFAULT_COORDS_FORMAT = F32_FORMAT
+# coordinates are in 0 - COORDS_MAX, decoded deltas are clipped to it
+COORDS_MAX = 255
+# int8 steps of an iteration's 'step' from the previous iteration, see TrajectoryEncoder
+DELTA_FORMAT = 'd8'
+DELTA_RANGE = 127
+# largest delta step (0 - 255 coordinates), coordinates are within half a step
+DEFAULT_MAX_DELTA_STEP = 1 / 16
+# cells moving further than DELTA_RANGE steps are stored as jumps, with more jumping cells the iteration is a keyframe
+DEFAULT_MAX_JUMPS = 0.05
+JUMP_INDEX_DTYPE = np.dtype('<i4')
+JUMP_COORDS_DTYPE = COORDS_DTYPES[F32_FORMAT]
+
+
+def pack_coords(coords, coords_format=DEFAULT_COORDS_FORMAT):
+    """ cells x ( x, y, z ) coordinates in 0 - 255 as row-major binary, u8 rounds to whole coordinates
+    """
+    assert coords_format in COORDS_DTYPES, f'unknown coordinates format: {coords_format}'
+    coords = np.asarray(coords)
+    if coords_format == U8_FORMAT:
+        coords = np.clip(np.round(coords), 0, COORDS_MAX)
+    return Binary(np.ascontiguousarray(coords, dtype=COORDS_DTYPES[coords_format]).tobytes())
+
+
+def unpack_coords(data, coords_format=DEFAULT_COORDS_FORMAT):
+    """ returns: cells x ( x, y, z ) as float64
+    """
+    assert coords_format in COORDS_DTYPES, f'unknown coordinates format: {coords_format}'
+    return np.frombuffer(bytes(data), dtype=COORDS_DTYPES[coords_format]).reshape(-1, 3).astype(np.float64)
+
+
+def pack_delta(previous, coords, max_step=DEFAULT_MAX_DELTA_STEP, max_jumps=DEFAULT_MAX_JUMPS):
+    """ int8 deltas from previous to coords, quantized with the smallest step covering the largest movement,
+        at most max_step. Cells moving further are jumps: their index + float32 coordinates.
+        returns: ( delta fields step, xyz (+ jumps, jxyz), the coordinates as decoded from them ),
+                 None when more than max_jumps of the cells jump
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    deltas = coords - previous
+    movement = np.max(np.abs(deltas), axis=1) if len(deltas) else np.zeros(0)
+    largest = movement.max() if len(movement) else 0.
+    step = largest / DELTA_RANGE if largest > 0 else 1.
+    jumps = np.zeros(0, dtype=JUMP_INDEX_DTYPE)
+    if step > max_step:
+        step = max_step
+        jumps = np.flatnonzero(movement > DELTA_RANGE * step).astype(JUMP_INDEX_DTYPE)
+        if len(jumps) > max_jumps * len(coords):
+            return None
+
+    steps = np.clip(np.round(deltas / step), -DELTA_RANGE, DELTA_RANGE).astype(np.int8)
+    steps[jumps] = 0
+    fields = {'step': step, 'xyz': Binary(steps.tobytes())}
+    if len(jumps):
+        fields['jumps'] = Binary(jumps.tobytes())
+        fields['jxyz'] = Binary(coords[jumps].astype(JUMP_COORDS_DTYPE).tobytes())
+    return fields, apply_delta(previous, fields)
+
+
+def apply_delta(previous, delta):
+    """ previous: coordinates of the previous iteration, delta: the fields of pack_delta
+        the stepped coordinates are clipped to 0 - COORDS_MAX, as in the cellan API
+    """
+    steps = np.frombuffer(bytes(delta['xyz']), dtype=np.int8).reshape(-1, 3)
+    coords = np.clip(previous + steps.astype(np.float64) * delta['step'], 0, COORDS_MAX)
+    if 'jumps' in delta:
+        jumps = np.frombuffer(bytes(delta['jumps']), dtype=JUMP_INDEX_DTYPE)
+        coords[jumps] = np.frombuffer(bytes(delta['jxyz']), dtype=JUMP_COORDS_DTYPE).reshape(-1, 3)
+    return coords
+
+
+def iteration_coords(iteration, previous=None):
+    """ returns: cells x ( x, y, z ) of a stored iteration, delta iterations need the coordinates of the previous one
+    """
+    if 'xyz' not in iteration:
+        return np.column_stack([iteration['xs'], iteration['ys'], iteration['zs']]).astype(np.float64)
+    if iteration['fmt'] != DELTA_FORMAT:
+        return unpack_coords(iteration['xyz'], iteration['fmt'])
+    assert previous is not None, f'delta iteration {iteration["it"]} without previous coordinates'
+    return apply_delta(previous, iteration)
+
+
+def trajectory_coords(iterations):
+    """ iterations: stored iterations in iteration order, starting with a keyframe
+        yields: ( iteration-#, coordinates ), each iteration decoded once from its predecessor
+    """
+    coords = None
+    for iteration in iterations:
+        coords = iteration_coords(iteration, coords)
+        yield iteration['it'], coords
+
+
+class TrajectoryEncoder:
+    """ Coordinates of consecutive iterations as a keyframe every keyframe_interval iterations
+        + int8 deltas in between, see pack_delta. Deltas are taken from the decoded previous iteration,
+        quantization errors don't add up: readers are within max_step / 2 of the encoded coordinates
+        (keyframes + jumps: within the float32 / uint8 precision).
+        keyframe_interval <= 1: every iteration is a keyframe.
+    """
+
+    def __init__(self, keyframe_interval, coords_format=DEFAULT_COORDS_FORMAT, max_step=DEFAULT_MAX_DELTA_STEP,
+                 max_jumps=DEFAULT_MAX_JUMPS):
+        assert coords_format in COORDS_DTYPES, f'unknown coordinates format: {coords_format}'
+        self.keyframe_interval = keyframe_interval
+        self.coords_format = coords_format
+        self.max_step = max_step
+        self.max_jumps = max_jumps
+        self.reset()
+
+    def reset(self):
+        """ the next iteration is a keyframe
+        """
+        self.__key_it = None
+        self.__since_key = 0
+        self.__previous = None
+
+    def encode(self, it, coords):
+        """ returns: ( iteration fields fmt, xyz (deltas: + key, pack_delta fields), coordinates as readers decode them )
+        """
+        if self.__previous is not None and self.__since_key < self.keyframe_interval - 1:
+            delta = pack_delta(self.__previous, coords, self.max_step, self.max_jumps)
+            if delta is not None:
+                fields, self.__previous = delta
+                self.__since_key += 1
+                return {'fmt': DELTA_FORMAT, 'key': self.__key_it, **fields}, self.__previous
+
+        data = pack_coords(coords, self.coords_format)
+        self.__key_it = it
+        self.__since_key = 0
+        self.__previous = unpack_coords(data, self.coords_format)
+        return {'fmt': self.coords_format, 'xyz': data}, self.__previous
+
+
+def expand_iteration(iteration, encoding, coords=None):
+    """ encits document in the layout with cids, ns, xs, ys, zs
+        encoding: encs document with the run's cids + ns, unused for documents already in that layout
+        coords: the decoded coordinates, required for delta iterations, see trajectory_coords
+    """
+    if 'xyz' not in iteration:
+        return iteration
+    if coords is None:
+        coords = iteration_coords(iteration)
+    assert len(coords) == len(encoding['cids']), \
+        f'coordinates + cell ids have different length: {len(coords)} != {len(encoding["cids"])}'
+    return {
+        'eid': iteration['eid'],
+        'it': iteration['it'],
+        'cids': encoding['cids'],
+        'ns': encoding['ns'],
+        'xs': coords[:, 0].tolist(),
+        'ys': coords[:, 1].tolist(),
+        'zs': coords[:, 2].tolist(),
+        'ds': iteration['ds']
+    }
@@ -0,0 +1,108 @@
+import json
+import pathlib
+import shutil
+
+import numpy as np
+import tensorflow as tf
+from scipy import sparse
+
+from bigan_basic import BasicBiGan
+from cell_matrix import CellMatrix, DEFAULT_CHUNK_SIZE
+from encoding_inference import cell_chunks
+
+MODEL_DIR = 'encoder'
+GENES_FILE = 'genes.tsv'
+META_FILE = 'meta.json'
+
+
+def export_encoder(network: BasicBiGan, export_dir, gene_names, meta=None):
+    """ encoder as SavedModel + the gene names of its input columns (in column order),
+        replaces a previous export in export_dir. sparse_input encoders take tf.SparseTensor cells
+    """
+    export_path = pathlib.Path(export_dir)
+    assert len(gene_names) == network._encoder.input_shape[1], \
+        f'{len(gene_names)} gene names for {network._encoder.input_shape[1]} encoder inputs'
+    if export_path.exists():
+        shutil.rmtree(export_path)
+    export_path.mkdir(parents=True)
+    network._encoder.save(str(export_path / MODEL_DIR), include_optimizer=False)
+    with open(export_path / GENES_FILE, 'w') as f:
+        f.writelines(f'{name}\n' for name in gene_names)
+    with open(export_path / META_FILE, 'w') as f:
+        json.dump({
+            'encoding_size': network.encoding_size,
+            'input_dtype': np.dtype(network.input_dtype).name,
+            'sparse_input': getattr(network, 'sparse_input', False),
+            **(meta or {})
+        }, f, indent=2)
+
+
+def gene_selection_matrix(source_genes, target_genes):
+    """ source-genes x target-genes 0/1 matrix, cells @ matrix has the target columns,
+        target genes missing in the source stay 0
+    """
+    source_positions = {name: pos for pos, name in enumerate(source_genes)}
+    matched = [(source_positions[name], pos) for pos, name in enumerate(target_genes) if name in source_positions]
+    rows, cols = zip(*matched) if matched else ((), ())
+    return sparse.csr_matrix(
+        (np.ones(len(matched), dtype=np.float32), (rows, cols)), shape=(len(source_genes), len(target_genes))
+    )
+
+
+class GeneAlignedCells(CellMatrix):
+    """ Cells with their genes mapped onto the columns of a selection matrix, rows are aligned on access
+    """
+
+    def __init__(self, cells: CellMatrix, selection: sparse.csr_matrix):
+        self.cells = cells
+        self.selection = selection
+
+    @property
+    def shape(self):
+        return len(self.cells), self.selection.shape[1]
+
+    def rows(self, ixs, dtype=np.float32):
+        return self.sparse_rows(ixs).toarray().astype(dtype, copy=False)
+
+    def sparse_rows(self, ixs):
+        return sparse.csr_matrix(self.cells.sparse_rows(ixs) @ self.selection)
+
+    def sparse_chunks(self, chunk_rows=DEFAULT_CHUNK_SIZE):
+        for chunk in self.cells.sparse_chunks(chunk_rows):
+            yield sparse.csr_matrix(chunk @ self.selection)
+
+    def select_genes(self, gene_positions):
+        return GeneAlignedCells(self.cells, self.selection[:, gene_positions])
+
+
+class ExportedEncoder:
+    """ Encoder loaded from an export, without the generator, discriminator + training models
+    """
+
+    def __init__(self, export_dir):
+        export_path = pathlib.Path(export_dir)
+        self.model = tf.keras.models.load_model(str(export_path / MODEL_DIR), compile=False)
+        with open(export_path / GENES_FILE) as f:
+            self.gene_names = [line.strip() for line in f]
+        with open(export_path / META_FILE) as f:
+            self.meta = json.load(f)
+        self.encoding_size = self.meta['encoding_size']
+        self.input_dtype = np.dtype(self.meta['input_dtype'])
+        self.sparse_input = self.meta.get('sparse_input', False)
+
+    def align(self, cells: CellMatrix, source_genes):
+        """ source_genes: gene names of the cell columns
+            returns: cells with the columns of the encoder input, unknown genes are dropped
+        """
+        selection = gene_selection_matrix(source_genes, self.gene_names)
+        missing = len(self.gene_names) - selection.nnz
+        if missing:
+            print(f'============ {missing} of {len(self.gene_names)} encoder genes missing in cells, set to 0')
+        return GeneAlignedCells(cells, selection)
+
+    def encoding_chunks(self, cell_data, chunk_rows=DEFAULT_CHUNK_SIZE, threads=0):
+        for start, chunk in cell_chunks(cell_data, chunk_rows, self.input_dtype, threads):
+            yield start, self.model.predict_on_batch(tf.sparse.from_dense(chunk) if self.sparse_input else chunk)
+
+    def encoding_prediction(self, cell_data, chunk_rows=DEFAULT_CHUNK_SIZE, threads=0):
+        return np.concatenate([encodings for _, encodings in self.encoding_chunks(cell_data, chunk_rows, threads)])
@@ -0,0 +1,58 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from cell_matrix import CellMatrix, DEFAULT_CHUNK_SIZE
+
+
+def chunk_rows_of(data, start, stop, dtype=np.float32):
+    """ dense rows [start, stop) of a CellMatrix, cell DataFrame or (memory-mapped) array,
+        only these rows are converted
+    """
+    if isinstance(data, CellMatrix):
+        return data.rows(slice(start, stop), dtype)
+    if isinstance(data, pd.DataFrame):
+        return data.iloc[start:stop].to_numpy(dtype=dtype)
+    return np.asarray(data[start:stop], dtype=dtype)
+
+
+def cell_chunks(data, chunk_rows=DEFAULT_CHUNK_SIZE, dtype=np.float32, threads=0, prefetch=2):
+    """ yields ( first-row, dense chunk ) in row order
+        threads > 0: chunks are prepared in a thread pool, at most `prefetch` chunks ahead of the consumer
+    """
+    assert chunk_rows > 0, f'chunk_rows has to be positive: {chunk_rows}'
+    starts = range(0, len(data), chunk_rows)
+
+    def prepare(start):
+        return chunk_rows_of(data, start, start + chunk_rows, dtype)
+
+    if not threads:
+        for start in starts:
+            yield start, prepare(start)
+        return
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        pending = deque()
+        for start in starts:
+            pending.append((start, pool.submit(prepare, start)))
+            if len(pending) > prefetch:
+                ready_start, chunk = pending.popleft()
+                yield ready_start, chunk.result()
+        while pending:
+            ready_start, chunk = pending.popleft()
+            yield ready_start, chunk.result()
+
+
+def write_encodings(network, data, target_file, chunk_rows=DEFAULT_CHUNK_SIZE, threads=0):
+    """ encodings of all cells written chunk by chunk into a .npy file, the encodings are not held in memory
+        returns: the encodings, memory-mapped read-only
+    """
+    encodings = open_memmap(target_file, mode='w+', dtype=np.float32, shape=(len(data), network.encoding_size))
+    for start, chunk_encodings in network.encoding_chunks(data, chunk_rows, threads):
+        encodings[start:start + len(chunk_encodings)] = chunk_encodings
+    encodings.flush()
+    del encodings
+    return np.load(target_file, mmap_mode='r')
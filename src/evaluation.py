@@ -0,0 +1,79 @@
+import numpy as np
+import tensorflow as tf
+
+from bigan_basic import BasicBiGan
+from encoding_inference import cell_chunks
+
+DEFAULT_BATCH_SIZE = 1024
+EVALUATION_FIELDS = ['iteration', 'd-true-pos', 'd-true-neg', 'recon-mse', 'recon-mae', 'encoding-entropy']
+
+
+def holdout_split(cell_count, fraction, seed=0):
+    """ returns: ( training-ixs, holdout-ixs ), both sorted, the same for the same seed
+    """
+    assert 0 < fraction < 1, f'holdout fraction has to be in (0, 1): {fraction}'
+    holdout_count = max(1, int(round(cell_count * fraction)))
+    holdout_ixs = np.sort(np.random.RandomState(seed).choice(cell_count, size=holdout_count, replace=False))
+    return np.setdiff1d(np.arange(cell_count), holdout_ixs), holdout_ixs
+
+
+class Evaluator:
+    """ Metrics of a BiGAN on a fixed set of cells, one compiled pass per batch:
+            d-true-pos:       fraction of ( encoder(cell), cell ) the discriminator takes as real
+            d-true-neg:       fraction of ( random encoding, generator(encoding) ) it takes as generated
+            recon-mse / -mae: error of generator(encoder(cell)) per gene
+            encoding-entropy: entropy (nats) of the distribution of the strongest encoding dimension over the cells
+        Random encodings + noise come from a seeded generator, reset for every evaluation,
+        so differences between evaluations are caused by the weights only.
+    """
+
+    def __init__(self, network: BasicBiGan, cells, batch_size=DEFAULT_BATCH_SIZE, seed=0):
+        assert len(cells) > 0, 'no cells to evaluate'
+        self.network = network
+        self.cells = cells
+        self.batch_size = batch_size
+        self.seed = seed
+        self.rng = tf.random.Generator.from_seed(seed)
+        self.__evaluate_batch = tf.function(self.__batch_sums, experimental_relax_shapes=True)
+
+    def __batch_sums(self, cells):
+        net = self.network
+        batch_size = tf.shape(cells)[0]
+        encodings = net._encoder(cells, training=False)
+        real_prediction = net._discriminator((encodings, cells), training=False)
+        true_positives = tf.reduce_sum(tf.cast(tf.round(real_prediction) > 0, tf.float32))
+
+        random_encodings = net.graph_random_encoding(self.rng, batch_size)
+        noise = self.rng.uniform([batch_size, net.encoding_size], minval=0, maxval=1)
+        generated_cells = tf.math.round(net._generator((random_encodings, noise), training=False))
+        generated_prediction = net._discriminator((random_encodings, generated_cells), training=False)
+        true_negatives = tf.reduce_sum(tf.cast(tf.round(generated_prediction) < 1, tf.float32))
+
+        reconstructed = net._generator((encodings, noise), training=False)
+        error = tf.cast(reconstructed, tf.float32) - tf.cast(cells, tf.float32)
+        strongest = tf.math.bincount(tf.cast(tf.argmax(encodings, axis=-1), tf.int32),
+                                     minlength=net.encoding_size, maxlength=net.encoding_size, dtype=tf.float32)
+        return tf.stack([true_positives, true_negatives,
+                         tf.reduce_sum(tf.reduce_mean(tf.square(error), axis=-1)),
+                         tf.reduce_sum(tf.reduce_mean(tf.abs(error), axis=-1))]), strongest
+
+    def evaluate(self):
+        """ returns: { metric: value } of EVALUATION_FIELDS without iteration
+        """
+        self.rng.reset_from_seed(self.seed)
+        sums = np.zeros(4)
+        strongest = np.zeros(self.network.encoding_size)
+        for _, chunk in cell_chunks(self.cells, self.batch_size, self.network.input_dtype):
+            batch_sums, batch_strongest = self.__evaluate_batch(tf.constant(chunk))
+            sums += batch_sums.numpy()
+            strongest += batch_strongest.numpy()
+
+        true_positives, true_negatives, squared_error, absolute_error = sums / len(self.cells)
+        shares = strongest[strongest > 0] / len(self.cells)
+        return {
+            'd-true-pos': true_positives,
+            'd-true-neg': true_negatives,
+            'recon-mse': squared_error,
+            'recon-mae': absolute_error,
+            'encoding-entropy': float(-np.sum(shares * np.log(shares)))
+        }
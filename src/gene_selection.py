@@ -0,0 +1,70 @@
+import numpy as np
+
+from cell_matrix import CellMatrix
+
+DISPERSION_BINS = 20
+
+
+def gene_statistics(cells: CellMatrix):
+    """ per-gene statistics, accumulated over sparse row chunks:
+        mean, variance, dispersion (variance / mean) and detection (fraction of cells expressing the gene)
+    """
+    gene_count = cells.shape[1]
+    sums, square_sums, detected = np.zeros(gene_count), np.zeros(gene_count), np.zeros(gene_count)
+    for chunk in cells.sparse_chunks():
+        chunk = chunk.astype(np.float64)
+        sums += np.asarray(chunk.sum(axis=0)).ravel()
+        square_sums += np.asarray(chunk.multiply(chunk).sum(axis=0)).ravel()
+        detected += chunk.getnnz(axis=0)
+
+    cell_count = len(cells)
+    mean = sums / cell_count
+    variance = np.maximum(square_sums / cell_count - mean ** 2, 0) * cell_count / max(cell_count - 1, 1)
+    dispersion = np.divide(variance, mean, out=np.zeros(gene_count), where=mean > 0)
+    return {
+        'mean': mean,
+        'variance': variance,
+        'dispersion': dispersion,
+        'detection': detected / cell_count
+    }
+
+
+def normalised_dispersion(mean, dispersion, bins=DISPERSION_BINS):
+    """ z-score of log-dispersion within bins of log-mean expression
+    """
+    expressed = mean > 0
+    log_mean = np.log1p(mean)
+    log_dispersion = np.log(dispersion, out=np.full(len(mean), -np.inf), where=dispersion > 0)
+    bin_edges = np.linspace(log_mean[expressed].min(initial=0), log_mean[expressed].max(initial=0), bins + 1)
+    gene_bins = np.clip(np.digitize(log_mean, bin_edges[1:-1]), 0, bins - 1)
+
+    result = np.full(len(mean), -np.inf)
+    for b in np.unique(gene_bins[expressed]):
+        in_bin = expressed & (gene_bins == b) & np.isfinite(log_dispersion)
+        if not np.any(in_bin):
+            continue
+        bin_dispersion = log_dispersion[in_bin]
+        std = bin_dispersion.std()
+        result[in_bin] = (bin_dispersion - bin_dispersion.mean()) / std if std > 0 else 0
+    return result
+
+
+def variable_gene_positions(cells: CellMatrix, gene_count, min_detection=0.0):
+    """ column positions of the gene_count most variable genes, in original column order
+    """
+    stats = gene_statistics(cells)
+    score = normalised_dispersion(stats['mean'], stats['dispersion'])
+    score[stats['detection'] < min_detection] = -np.inf
+    ranked = np.argsort(-score, kind='stable')[:gene_count]
+    return np.sort(ranked[np.isfinite(score[ranked])])
+
+
+def select_variable_genes(cells: CellMatrix, gene_count, min_detection=0.0, verbose=False):
+    if gene_count is None or gene_count >= cells.shape[1]:
+        return cells
+    if verbose:
+        print(f'============ Selecting {gene_count} variable genes of {cells.shape[1]}...')
+    selected = cells.select_genes(variable_gene_positions(cells, gene_count, min_detection))
+    if verbose:
+        print(f'============ DONE! genes: {selected.shape[1]}')
+    return selected
@@ -3,14 +3,34 @@ from datetime import datetime
 from .plot_intercepts import PlotIntercepts
 from .sink_intercepts import SinkIntercepts
 from .db_recorder import DbRecorder
+from .convergence import ConvergenceMonitor
+from .profiler_trace import ProfilerTrace
+from .async_intercepts import AsyncInterceptor
 
 
-def combined_interceptors(interceptors):
+def interceptor_name(interceptor):
+    qualified_name = getattr(interceptor, '__qualname__', type(interceptor).__name__)
+    return qualified_name.split('.<locals>')[0]
+
+
+def combined_interceptors(interceptors, timer=None):
+    """ timer: PhaseTimer, times each interceptor as phase 'intercept:<name>'
+    """
     def call_all(it, losses):
         for ic in interceptors:
             ic(it, losses)
 
-    return call_all
+    if timer is None or not timer.enabled:
+        return call_all
+
+    phase_names = [f'intercept:{interceptor_name(ic)}' for ic in interceptors]
+
+    def call_all_timed(it, losses):
+        for ic, phase_name in zip(interceptors, phase_names):
+            with timer.phase(phase_name):
+                ic(it, losses)
+
+    return call_all_timed
 
 
 def skip_iterations(steps, interceptor):
@@ -0,0 +1,138 @@
+import threading
+from collections import deque
+
+import numpy as np
+import tensorflow as tf
+
+from bigan_basic import precision_policy
+from encoding_inference import cell_chunks
+
+BLOCK_POLICY = 'block'
+DROP_POLICY = 'drop'
+COALESCE_POLICY = 'coalesce'
+POLICIES = [BLOCK_POLICY, DROP_POLICY, COALESCE_POLICY]
+
+
+class AsyncInterceptor:
+    """ Runs an interceptor on a background thread, training only waits for the hand-over.
+        With a trainer, the encoder weights of the submitting iteration are copied at the hand-over,
+        the full data set encodings are computed with them on the background thread (by a clone of the encoder)
+        and pinned for the interceptor (see BasicBiGan.pinned_encodings), later training steps don't change
+        what the interceptor records.
+        When max_pending calls are waiting, the policy decides before anything is copied:
+            block:    training waits for a free slot
+            drop:     the new call is skipped
+            coalesce: the new call replaces the newest waiting one
+        iteration_filter: iteration -> bool, the iterations the interceptor records, others are skipped up front
+        Interceptors that use the network for anything but the pinned encodings see the current weights.
+    """
+
+    def __init__(self, interceptor, trainer=None, max_pending=2, policy=BLOCK_POLICY, name='async-interceptor',
+                 iteration_filter=None):
+        assert policy in POLICIES, f'unknown policy: {policy}'
+        assert max_pending > 0, f'max_pending has to be positive: {max_pending}'
+        self.interceptor = interceptor
+        self.trainer = trainer
+        self.max_pending = max_pending
+        self.policy = policy
+        self.iteration_filter = iteration_filter
+        self.submitted = self.completed = self.dropped = self.coalesced = 0
+        self.__pending = deque()
+        self.__running = False
+        self.__closed = False
+        self.__error = None
+        self.__encoder = None
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(target=self.__run_pending, name=name, daemon=True)
+        self.__thread.start()
+
+    def __snapshot(self, it, losses):
+        if self.trainer is None:
+            return it, losses, None
+        network = self.trainer.network
+        return it, losses, (network, self.trainer.data, network._encoder.get_weights())
+
+    def __encodings(self, network, data, weights):
+        """ encodings of the data with the snapshot weights, runs on the background thread
+        """
+        if self.__encoder is None:
+            with precision_policy(network.precision):
+                self.__encoder = tf.keras.models.clone_model(network._encoder)
+        self.__encoder.set_weights(weights)
+        if len(data) == 0:
+            return np.zeros((0, network.encoding_size), dtype=np.float32)
+        encodings = np.concatenate([self.__encoder.predict_on_batch(chunk)
+                                    for _, chunk in cell_chunks(data, dtype=network.input_dtype)])
+        encodings.setflags(write=False)
+        return encodings
+
+    def __call__(self, it, losses):
+        self.__check_error()
+        if self.iteration_filter is not None and not self.iteration_filter(it):
+            return
+        with self.__condition:
+            assert not self.__closed, 'interceptor already closed'
+            self.submitted += 1
+            if len(self.__pending) >= self.max_pending:
+                if self.policy == DROP_POLICY:
+                    self.dropped += 1
+                    return
+                if self.policy == BLOCK_POLICY:
+                    self.__condition.wait_for(lambda: len(self.__pending) < self.max_pending)
+        # training is the only submitter, waiting calls can only have been taken meanwhile
+        snapshot = self.__snapshot(it, losses)
+        with self.__condition:
+            if len(self.__pending) >= self.max_pending:
+                self.__pending[-1] = snapshot
+                self.coalesced += 1
+                return
+            self.__pending.append(snapshot)
+            self.__condition.notify_all()
+
+    def __run_pending(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending or self.__closed)
+                if not self.__pending:
+                    return
+                it, losses, pinned = self.__pending.popleft()
+                self.__running = True
+                self.__condition.notify_all()
+            try:
+                if pinned is None:
+                    self.interceptor(it, losses)
+                else:
+                    network, data, weights = pinned
+                    with network.pinned_encodings(data, self.__encodings(network, data, weights)):
+                        self.interceptor(it, losses)
+            except Exception as e:
+                self.__error = e
+            finally:
+                with self.__condition:
+                    self.__running = False
+                    self.completed += 1
+                    self.__condition.notify_all()
+
+    def __check_error(self):
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise AssertionError(f'async interceptor failed: {error}') from error
+
+    def wait(self):
+        """ returns when all submitted calls are done
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: not self.__pending and not self.__running)
+        self.__check_error()
+
+    def close(self, drain=True):
+        """ drain=False: waiting calls are discarded, a running call still completes
+        """
+        with self.__condition:
+            if not drain:
+                self.dropped += len(self.__pending)
+                self.__pending.clear()
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__thread.join()
+        self.__check_error()
@@ -0,0 +1,95 @@
+from collections import deque
+
+import numpy as np
+
+from cell_matrix import CellMatrix
+
+
+class ConvergenceMonitor:
+    """ Tracks the total loss over two consecutive windows and the movement of the encodings
+        of a fixed cell sample between checks. Converged when for `patience` checks in a row:
+            relative change of the windowed mean loss < loss_tolerance
+            mean euclidean movement of the sample encodings < encoding_tolerance
+        Once converged it stops the trainer, or with stop=False checks less often (backoff).
+        Per iteration only the loss window is updated, encodings are only predicted on checks.
+    """
+
+    def __init__(self, trainer, window=100, check_every=100, loss_tolerance=0.01, encoding_tolerance=0.005,
+                 patience=3, sample_size=1000, stop=True, backoff=2, max_check_every=10000, seed=0, verbose=True):
+        assert check_every >= 1 and window >= 1, 'window + check_every have to be positive'
+        self.trainer = trainer
+        self.window = window
+        self.check_every = check_every
+        self.loss_tolerance = loss_tolerance
+        self.encoding_tolerance = encoding_tolerance
+        self.patience = patience
+        self.sample_size = sample_size
+        self.stop = stop
+        self.backoff = backoff
+        self.max_check_every = max_check_every
+        self.seed = seed
+        self.verbose = verbose
+        self.converged = False
+        self.reason = None
+        self.history = []
+        self.__losses = deque(maxlen=2 * window)
+        self.__met_checks = 0
+        self.__next_check = None
+        self.__sample = None
+        self.__prev_encodings = None
+
+    def cell_sample(self):
+        if self.__sample is None:
+            data = self.trainer.data
+            size = min(self.sample_size, len(data))
+            if isinstance(data, CellMatrix):
+                self.__sample = data.rows(data.sample_ixs(size, random_state=self.seed))
+            else:
+                self.__sample = data.sample(size, random_state=self.seed).values.astype(np.float32)
+        return self.__sample
+
+    def loss_change(self):
+        """ relative change of the mean loss of the last window to the window before, None until both are full
+        """
+        if len(self.__losses) < 2 * self.window:
+            return None
+        losses = np.asarray(self.__losses)
+        previous, current = losses[:self.window].mean(), losses[self.window:].mean()
+        return abs(current - previous) / max(abs(previous), 1e-12)
+
+    def encoding_movement(self):
+        encodings = self.trainer.network.encoding_prediction(self.cell_sample())
+        previous, self.__prev_encodings = self.__prev_encodings, encodings
+        if previous is None:
+            return None
+        return float(np.mean(np.linalg.norm(encodings - previous, axis=1)))
+
+    def __call__(self, it, losses):
+        self.__losses.append(sum(losses))
+        if self.__next_check is None:
+            self.__next_check = it + self.check_every
+        if it < self.__next_check:
+            return
+        self.check(it)
+        # after the check, a backoff applies from this check on
+        self.__next_check = it + self.check_every
+
+    def check(self, it):
+        loss_change, movement = self.loss_change(), self.encoding_movement()
+        self.history.append((it, loss_change, movement))
+        met = loss_change is not None and movement is not None and \
+            loss_change < self.loss_tolerance and movement < self.encoding_tolerance
+        self.__met_checks = self.__met_checks + 1 if met else 0
+        if self.__met_checks < self.patience:
+            return
+
+        reason = f'loss change {loss_change:.4f} < {self.loss_tolerance} and encoding movement ' \
+                 f'{movement:.5f} < {self.encoding_tolerance} for {self.patience} checks at iteration {it}'
+        if not self.converged and self.verbose:
+            print(f'============ Converged: {reason}')
+        self.converged, self.reason = True, reason
+        if self.stop:
+            self.trainer.stop(reason)
+        else:
+            self.check_every = min(self.check_every * self.backoff, self.max_check_every)
+            self.__met_checks = 0
@@ -1,3 +1,5 @@
+import os
+import threading
 from typing import Any, Iterable
 
 DEFAULT_LOG_DIR = 'logs'
@@ -13,10 +15,15 @@ def csv_line(values):
 
 
 class DataSink:
-    def __init__(self, log_dir=DEFAULT_LOG_DIR, batch_size=DEFAULT_BATCH_SIZE):
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, batch_size=DEFAULT_BATCH_SIZE, resume_iteration=None):
+        """ resume_iteration: continue existing graph files, dropping lines of later iterations
+        """
         self.__log_dir = log_dir
         self.__graphs = {}
         self.__batch_size = batch_size
+        self.__resume_iteration = resume_iteration
+        # graphs may be written from the training thread + background interceptors
+        self.__lock = threading.RLock()
 
     def add_graph_header(self, graph_id, fields: Iterable[Any]):
         if graph_id in self.__graphs.keys():
@@ -27,7 +34,18 @@ class DataSink:
             LINES_KEY: [],
             SIZE_KEY: len(fields)
         }
-        self.__write_file_line(graph_id, csv_line(fields))
+        graph_file = self.__graphs[graph_id][FILE_KEY]
+        if self.__resume_iteration is not None and os.path.exists(graph_file):
+            self.__truncate_graph(graph_file)
+        else:
+            self.__write_file_line(graph_id, csv_line(fields))
+
+    def __truncate_graph(self, graph_file):
+        with open(graph_file) as graph_f:
+            header, *data_lines = graph_f.readlines()
+        kept_lines = [line for line in data_lines if int(line.split(',', 1)[0]) <= self.__resume_iteration]
+        with open(graph_file, 'w') as graph_f:
+            graph_f.write(header + ''.join(kept_lines))
 
     def add_data(self, graph_id, values: Iterable[Any]):
         if graph_id not in self.__graphs:
@@ -37,15 +55,17 @@ class DataSink:
         if not len(values) == graph_data[SIZE_KEY]:
             raise AssertionError(f'expected {graph_data[SIZE_KEY]} values, received: {values}')
 
-        file_lines = graph_data[LINES_KEY]
-        file_lines.append(csv_line(values))
+        with self.__lock:
+            file_lines = graph_data[LINES_KEY]
+            file_lines.append(csv_line(values))
 
-        if len(file_lines) >= self.__batch_size:
-            self.__drain_graph_data(graph_id)
+            if len(file_lines) >= self.__batch_size:
+                self.__drain_graph_data(graph_id)
 
     def drain_data(self):
-        for graph_id in self.__graphs.keys():
-            self.__drain_graph_data(graph_id)
+        with self.__lock:
+            for graph_id in self.__graphs.keys():
+                self.__drain_graph_data(graph_id)
 
     def __drain_graph_data(self, graph_id):
         graph_data = self.__graphs[graph_id]
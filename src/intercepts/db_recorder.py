@@ -5,6 +5,9 @@ import numpy as np
 from pymongo import MongoClient
 from pymongo.collection import Collection
 
+from encits_format import DEFAULT_COORDS_FORMAT, DELTA_FORMAT, DEFAULT_MAX_DELTA_STEP, TrajectoryEncoder, \
+    pack_coords, expand_iteration, trajectory_coords
+from mtx_parser import names_of_lines
 from .import_barcodes import import_barcodes
 
 MONGO_URL = 'mongodb://localhost:27017/'
@@ -13,6 +16,7 @@ ENCODINGS_COLLECTION = 'encs'
 ITERATIONS_COLLECTION = 'encits'
 CELLS_COLLECTION = 'cells'
 GENES_COLLECTION = 'genes'
+COORDS_PROJECTION = {'_id': 0, 'it': 1, 'fmt': 1, 'xyz': 1, 'step': 1, 'jumps': 1, 'jxyz': 1, 'xs': 1, 'ys': 1, 'zs': 1}
 
 
 def get_file_name(full_path):
@@ -25,8 +29,16 @@ def check_files(sources):
 
 
 class DbRecorder:
-    def __init__(self, enc_run_id, sources, m_db=MONGO_DB):
+    def __init__(self, enc_run_id, sources, m_db=MONGO_DB, duplicate_resolution=0,
+                 coords_format=DEFAULT_COORDS_FORMAT, keyframe_interval=1, max_delta_step=DEFAULT_MAX_DELTA_STEP):
+        """ duplicate_resolution: coordinate grid for grouping duplicates, see find_duplicate_ids
+            coords_format: binary format of the iteration coordinates, see encits_format
+            keyframe_interval, max_delta_step: > 1 stores deltas between keyframes, see TrajectoryEncoder
+        """
         self.enc_run_id = enc_run_id
+        self.duplicate_resolution = duplicate_resolution
+        self.coords_format = coords_format
+        self.trajectory = TrajectoryEncoder(keyframe_interval, coords_format, max_delta_step)
         self.matrix_file = sources['matrix']
         self.barcodes_file = sources['barcodes']
         self.genes_file = sources['genes']
@@ -37,10 +49,29 @@ class DbRecorder:
         self.cell_ids = None
         self.__db = MongoClient(MONGO_URL)[self.mongo_db]
         self.__processed_its = []
+        self.__show_its = []
 
     def setup(self):
         self.store_encoding_run()
         self.load_barcodes()
+        self.store_cells()
+
+    def resume(self, iteration):
+        """ reconnects to an existing encoding run, iterations after the resumed one are removed
+        """
+        encoding = self.__coll(ENCODINGS_COLLECTION).find_one({'_id': self.enc_run_id})
+        assert encoding is not None, f'Encoding run id not found: {self.enc_run_id}'
+        self.source_id = encoding['srcs']['barcodes']
+        self.__coll(ITERATIONS_COLLECTION).delete_many({'eid': self.enc_run_id, 'it': {'$gt': iteration}})
+        self.trajectory.reset()
+        self.__show_its = [it for it in encoding['showits'] if it <= iteration]
+        self.__processed_its = list(self.__show_its)
+        self.__coll(ENCODINGS_COLLECTION).update_one(
+            {'_id': self.enc_run_id},
+            {'$set': {'defit': self.__show_its[-1] if self.__show_its else 0, 'showits': self.__show_its}}
+        )
+        self.load_barcodes()
+        self.store_cells()
 
     def __coll(self, coll_name) -> Collection:
         return self.__db[coll_name]
@@ -63,6 +94,15 @@ class DbRecorder:
         }
         self.__coll(ENCODINGS_COLLECTION).insert_one(encoding)
 
+    def store_gene_index(self, gene_line_nums):
+        """ stores ensembl names of the genes the encodings were trained on (when genes were selected)
+        """
+        assert self.source_id, 'Cannot store gene index without encoding!'
+        self.__coll(ENCODINGS_COLLECTION).update_one(
+            {'_id': self.enc_run_id},
+            {'$set': {'gs': names_of_lines(self.genes_file, gene_line_nums)}}
+        )
+
     def load_barcodes(self):
         assert self.source_id, 'Cannot load barcodes without encoding!'
         cells = self.__coll(CELLS_COLLECTION)
@@ -75,30 +115,46 @@ class DbRecorder:
         self.barcodes = [cell['n'] for cell in cells.find(query, {'_id': 0, 'n': 1})]
         self.cell_ids = [cell_id_from(i) for i in range(len(self.barcodes))]
 
+    def store_cells(self):
+        """ cell ids + names of the run, stored once instead of with every iteration
+        """
+        assert self.barcodes, 'Cannot store cells without barcodes!'
+        self.__coll(ENCODINGS_COLLECTION).update_one(
+            {'_id': self.enc_run_id},
+            {'$set': {'cids': self.cell_ids, 'ns': self.barcodes}}
+        )
+
+    def load_iteration(self, it):
+        """ returns: the iteration with cids, ns, xs, ys, zs + ds, None if not stored
+        """
+        iterations = self.__coll(ITERATIONS_COLLECTION)
+        iteration = iterations.find_one({'eid': self.enc_run_id, 'it': it}, {'_id': 0})
+        if iteration is None:
+            return None
+        coords = None
+        if iteration.get('fmt') == DELTA_FORMAT:
+            key_range = {'$gte': iteration['key'], '$lte': it}
+            for _, coords in trajectory_coords(iterations.find({'eid': self.enc_run_id, 'it': key_range},
+                                                               COORDS_PROJECTION).sort('it')):
+                pass
+        encoding = self.__coll(ENCODINGS_COLLECTION).find_one({'_id': self.enc_run_id}, {'cids': 1, 'ns': 1})
+        return expand_iteration(iteration, encoding, coords)
+
     def create_interceptor(self, trainer):
         assert self.barcodes, 'Cannot store iterations without barcodes!'
-        show_iterations = []
+        show_iterations = self.__show_its
 
         def intercept(it, _):
             assert it not in self.__processed_its, f'duplicate iteration {it}'
             self.__processed_its.append(it)
-            encodings = trainer.network.encoding_prediction(trainer.data)
-            enc_shape = encodings.shape
-            assert enc_shape[0] == len(self.barcodes), \
-                f'encodings + barcodes have different length: {enc_shape[0]} != {len(self.barcodes)}'
-            assert enc_shape[1] == 3, \
-                f'encodings vector length = {enc_shape[1]}, not in x, y, z format'
-
-            coords = np.multiply(encodings, 255)
+            encodings = trainer.network.cached_encoding_prediction(trainer.data)
+            coords = encoding_coords(encodings, len(self.barcodes))
+            fields, _ = self.trajectory.encode(it, coords)
             self.__coll(ITERATIONS_COLLECTION).insert_one({
                 'eid': self.enc_run_id,
                 'it': it,
-                'cids': self.cell_ids,
-                'ns': self.barcodes,
-                'xs': coords[:, 0].tolist(),
-                'ys': coords[:, 1].tolist(),
-                'zs': coords[:, 2].tolist(),
-                'ds': find_duplicate_ids(coords)
+                **fields,
+                'ds': find_duplicate_ids(coords, self.duplicate_resolution)
             })
 
             show_iterations.append(it)
@@ -110,11 +166,65 @@ class DbRecorder:
         return intercept
 
 
-def find_duplicate_ids(np_coords: np.array):
-    coords = [(c[0], c[1], c[2]) for c in np_coords]
-    unique_coords = set(coords)
-    all_indices = [[cell_id_from(i) for i, x in enumerate(coords) if x == uc] for uc in unique_coords]
-    return [ixs for ixs in all_indices if len(ixs) > 1]
+def stored_trajectory(enc_run_id, m_db=MONGO_DB):
+    """ yields: ( iteration-#, coordinates ) of all stored iterations of a run in iteration order
+    """
+    iterations = MongoClient(MONGO_URL)[m_db][ITERATIONS_COLLECTION]
+    yield from trajectory_coords(iterations.find({'eid': enc_run_id}, COORDS_PROJECTION).sort('it'))
+
+
+def encoding_coords(encodings, cell_count):
+    """ encodings scaled to 0 - 255 coordinates
+    """
+    enc_shape = encodings.shape
+    assert enc_shape[0] == cell_count, \
+        f'encodings + barcodes have different length: {enc_shape[0]} != {cell_count}'
+    assert enc_shape[1] == 3, \
+        f'encodings vector length = {enc_shape[1]}, not in x, y, z format'
+    return np.multiply(encodings, 255)
+
+
+def compact_iteration_document(enc_run_id, it, encodings, cell_count, coords_format=DEFAULT_COORDS_FORMAT,
+                               duplicate_resolution=0):
+    """ encits document of one iteration: coordinates as binary, duplicates found on the exact coordinates
+        duplicate_resolution: see find_duplicate_ids
+    """
+    coords = encoding_coords(encodings, cell_count)
+    return {
+        'eid': enc_run_id,
+        'it': it,
+        'fmt': coords_format,
+        'xyz': pack_coords(coords, coords_format),
+        'ds': find_duplicate_ids(coords, duplicate_resolution)
+    }
+
+
+def iteration_document(enc_run_id, it, cell_ids, barcodes, encodings, coords_format=DEFAULT_COORDS_FORMAT,
+                       duplicate_resolution=0):
+    """ iteration with cids, ns, xs, ys, zs + ds, as returned by load_iteration + the cellan API
+    """
+    iteration = compact_iteration_document(enc_run_id, it, encodings, len(barcodes), coords_format,
+                                           duplicate_resolution)
+    return expand_iteration(iteration, {'cids': cell_ids, 'ns': barcodes})
+
+
+def find_duplicate_ids(np_coords: np.array, resolution=0):
+    """ cell ids of cells with equal coordinates, per group in ascending order, groups ordered by coordinates
+        resolution > 0: coordinates within the same cube of that edge length are equal, e.g. 1 for the UI's pixels
+    """
+    if len(np_coords) == 0:
+        return []
+    coords = np.asarray(np_coords, dtype=np.float64)
+    # + 0.0 turns -0.0 into 0.0, like the == of the coordinates
+    keys = np.floor(coords / resolution).astype(np.int64) if resolution > 0 else coords + 0.0
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    duplicate_ixs = np.flatnonzero(counts[inverse] > 1)
+    if len(duplicate_ixs) == 0:
+        return []
+    # stable: cells of a group stay in ascending order
+    duplicate_ixs = duplicate_ixs[np.argsort(inverse[duplicate_ixs], kind='stable')]
+    group_starts = np.flatnonzero(np.diff(inverse[duplicate_ixs])) + 1
+    return [group.tolist() for group in np.split(cell_id_from(duplicate_ixs), group_starts)]
 
 
 def cell_id_from(ix):
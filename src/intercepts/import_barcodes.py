@@ -1,5 +1,7 @@
 from pymongo import MongoClient
 
+from mtx_parser import parse_mtx_chunks
+
 
 def load_file(file, converter, skip=0):
     result = []
@@ -11,6 +13,17 @@ def load_file(file, converter, skip=0):
     return result
 
 
+def load_matrix_entries(matrix_file):
+    """ yields ( gene-line-num, barcode-line-num, value ), parsed by a process pool,
+        only a few parsed chunks of the file are held at a time
+    """
+    entry_count = 0
+    for genes, barcodes, values in parse_mtx_chunks(matrix_file):
+        entry_count += len(values)
+        yield from zip(genes.tolist(), barcodes.tolist(), values.tolist())
+    print(f'{entry_count} matrix entries read ... ', end='', flush=True)
+
+
 def convert_matrix(source_id, barcodes, genes_src, matrix):
     def default_gene(e, m):
         return {'sid': source_id, 'e': e, 'm': m, 'cids': []}
@@ -73,7 +86,7 @@ def import_cells(cells_genes, mongo_url, mongo_db, cells_collection, genes_colle
 def import_barcodes(source_id, matrix_file, barcodes_file, genes_file,
                     mongo_url, mongo_db, cells_collection, genes_collection):
     print('importing barcodes:', barcodes_file)
-    matrix = load_file(matrix_file, lambda line: line.strip().split(' '), skip=3)
+    matrix = load_matrix_entries(matrix_file)
     barcodes = load_file(barcodes_file, lambda line: line.strip())
     genes = load_file(genes_file, lambda line: line.strip().split('\t'))
 
@@ -9,6 +9,8 @@ from mpl_toolkits.mplot3d import Axes3D
 from tensorflow import convert_to_tensor
 from tensorflow.python.keras import backend
 
+from cell_matrix import SparseCells
+
 POINTS_SIZE = 0.3
 
 
@@ -38,7 +40,7 @@ class PlotIntercepts:
 
         def create_plot(it, losses):
             print(f'--|-- {algo_name}... ', end='', flush=True)
-            all_encodings = trainer.network.encoding_prediction(trainer.data)
+            all_encodings = trainer.network.cached_encoding_prediction(trainer.data)
             points = reduction_algo.fit_transform(all_encodings)
             fig = create_default_figure(full_id, it, losses)
 
@@ -75,7 +77,7 @@ class PlotIntercepts:
 
         def intercept(it, losses):
             print(f'--|-- {algo_name}... ', end='', flush=True)
-            all_encodings = trainer.network.encoding_prediction(trainer.data)
+            all_encodings = trainer.network.cached_encoding_prediction(trainer.data)
             points = reduction_algo.fit_transform(all_encodings)
             for p_ix, p_position in enumerate(rot_ixs):
                 title = f'{full_id}_pos{p_ix}'
@@ -95,7 +97,7 @@ class PlotIntercepts:
         print(f'- Done')
 
         def intercept(it, losses):
-            all_encodings = trainer.network.encoding_prediction(trainer.data)
+            all_encodings = trainer.network.cached_encoding_prediction(trainer.data)
             all_color_points = [run_fit_transform(*a_meta, all_encodings) for a_meta in algo_metas]
 
             for a_meta, xy_points, color_points in zip(algo_metas, all_2d_points, all_color_points):
@@ -110,7 +112,7 @@ class PlotIntercepts:
 
     def plot_encodings_directly(self, trainer):
         def intercept(it, losses):
-            encodings = trainer.network.encoding_prediction(trainer.data)
+            encodings = trainer.network.cached_encoding_prediction(trainer.data)
             enc_dim = np.shape(encodings)[1]
             coords = np.multiply(encodings, 255)
 
@@ -156,7 +158,7 @@ class PlotIntercepts:
             if it in [0, 9, 49, 99, 199]:
                 cell_predictions = trainer.network.generate_cells(encodings_in, noise)
                 data = backend.eval(cell_predictions)
-                df = pd.DataFrame.from_records(data)
+                df = pd.DataFrame.from_records(data, columns=trainer.data.columns)
                 df.to_csv(f'{self.log_dir}/{self.run_id}_cells_{str(it).zfill(4)}.csv')
 
         return intercept
@@ -173,6 +175,8 @@ def permuted_vector(v_width, copies_per_v):
 
 def create_2d_points(algo_class, algo_name, data):
     print(f'calculating 2D "{algo_name}"... ', end='', flush=True)
+    if isinstance(data, SparseCells):
+        data = data.matrix
     points = create_algo(algo_class, n_components=2).fit_transform(data)
     print(f'"{algo_name}" ok ', end='', flush=True)
     return points
@@ -0,0 +1,33 @@
+import tensorflow as tf
+
+
+class ProfilerTrace:
+    """ Captures a TensorFlow profiler trace (viewable in TensorBoard) of iterations first to last.
+        Interceptors run after their iteration: the trace starts after iteration first - 1,
+        or after the first intercepted iteration inside the range (resumed runs).
+        Runs ending before iteration last have to stop() the trace, otherwise nothing is written.
+    """
+
+    def __init__(self, log_dir, first_iteration, last_iteration):
+        assert first_iteration <= last_iteration, f'empty iteration range: {first_iteration} - {last_iteration}'
+        self.log_dir = log_dir
+        self.first_iteration = first_iteration
+        self.last_iteration = last_iteration
+        self.tracing = False
+        if first_iteration == 0:
+            self.start()
+
+    def start(self):
+        tf.profiler.experimental.start(self.log_dir)
+        self.tracing = True
+
+    def stop(self):
+        if self.tracing:
+            tf.profiler.experimental.stop()
+            self.tracing = False
+
+    def __call__(self, it, _):
+        if it >= self.last_iteration:
+            self.stop()
+        elif it + 1 >= self.first_iteration and not self.tracing:
+            self.start()
@@ -1,11 +1,16 @@
 import atexit
 
+from bigan_basic import batch_length
+from evaluation import Evaluator, EVALUATION_FIELDS
+from phase_timer import PhaseTimer, TIMING_FIELDS, HISTOGRAM_FIELDS, timing_lines, histogram_lines
+from weight_monitor import WeightMonitor, WEIGHT_FIELDS
+
 from .data_sink import DataSink
 
 
 class SinkIntercepts:
-    def __init__(self, log_dir):
-        self.sink = DataSink(log_dir=log_dir)
+    def __init__(self, log_dir, resume_iteration=None):
+        self.sink = DataSink(log_dir=log_dir, resume_iteration=resume_iteration)
         atexit.register(self.sink.drain_data)
 
     def save_losses(self):
@@ -18,13 +23,53 @@ class SinkIntercepts:
 
         return store_record
 
+    def save_timings(self, timer: PhaseTimer):
+        """ phase durations of every iteration, written when the timer completes the iteration:
+            'timings' percentiles + 'timing-histograms' log-spaced bucket counts
+        """
+        graph_id, histograms_id = 'timings', 'timing-histograms'
+        self.sink.add_graph_header(graph_id, TIMING_FIELDS)
+        self.sink.add_graph_header(histograms_id, HISTOGRAM_FIELDS)
+
+        def store_timings(it, durations):
+            for line in timing_lines(it, durations):
+                self.sink.add_data(graph_id, line)
+            for line in histogram_lines(it, durations):
+                self.sink.add_data(histograms_id, line)
+
+        timer.add_listener(store_timings)
+
+    def save_weight_changes(self, monitor: WeightMonitor):
+        """ per-weight norms + update magnitudes since the previous recorded iteration
+        """
+        graph_id = 'weights'
+        self.sink.add_graph_header(graph_id, WEIGHT_FIELDS)
+
+        def store_statistics(it, _):
+            for name, statistics in zip(monitor.layer_names, monitor.statistics()):
+                self.sink.add_data(graph_id, [it, name, *statistics])
+
+        return store_statistics
+
+    def save_evaluation(self, evaluator: Evaluator):
+        """ discriminator rates, reconstruction errors + encoding entropy on the evaluator's cells
+        """
+        graph_id = 'evaluation'
+        self.sink.add_graph_header(graph_id, EVALUATION_FIELDS)
+
+        def store_evaluation(it, _):
+            metrics = evaluator.evaluate()
+            self.sink.add_data(graph_id, [it, *[metrics[field] for field in EVALUATION_FIELDS[1:]]])
+
+        return store_evaluation
+
     def save_accuracy(self, trainer):
         graph_id = 'accuracy'
         self.sink.add_graph_header(graph_id, ['iteration', 'pos-pct', 'neg-pct'])
 
         def intercept(it, _):
             batch = trainer.sample_cell_data()
-            batch_size = len(batch)
+            batch_size = batch_length(batch)
             tp_acc, tn_acc = trainer.network.evaluate_discriminator_accuracy(batch)
             self.sink.add_data(graph_id, [it, tp_acc / batch_size, tn_acc / batch_size])
 
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import pathlib
+import shutil
+from typing import Callable, Dict
+
+import numpy as np
+
+HASH_BLOCK_SIZE = 1 << 20
+ARRAY_SUFFIX = '.npy'
+
+
+def source_key(source_file, kind):
+    digest = hashlib.sha1()
+    with open(source_file, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    size = os.path.getsize(source_file)
+    return f'{pathlib.Path(source_file).name}-{kind}-{size}-{digest.hexdigest()[:20]}'
+
+
+def dir_size(path):
+    return sum(f.stat().st_size for f in pathlib.Path(path).iterdir())
+
+
+class MatrixCache:
+    """ Stores parsed matrices as .npy arrays, keyed by source file content + size.
+        Cached arrays are loaded memory-mapped (read-only).
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, verbose=False):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.verbose = verbose
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def load(self, source_file, kind, create: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        key = source_key(source_file, kind)
+        entry_dir = self.cache_dir / key
+        if entry_dir.exists():
+            self.hits += 1
+            self.__log(f'cache hit: {key}')
+            os.utime(entry_dir)
+        else:
+            self.misses += 1
+            self.__log(f'cache miss: {key}')
+            self.__store(entry_dir, create())
+            self.evict(keep=key)
+        return {f.stem: np.load(f, mmap_mode='r') for f in entry_dir.glob('*' + ARRAY_SUFFIX)}
+
+    def __store(self, entry_dir, arrays):
+        tmp_dir = self.cache_dir / f'.{entry_dir.name}.{os.getpid()}'
+        tmp_dir.mkdir()
+        for name, array in arrays.items():
+            np.save(tmp_dir / (name + ARRAY_SUFFIX), array, allow_pickle=False)
+        tmp_dir.rename(entry_dir)
+
+    def entries(self):
+        """ cached entries as (key, bytes), least recently used first
+        """
+        entry_dirs = [d for d in self.cache_dir.iterdir() if d.is_dir() and not d.name.startswith('.')]
+        entry_dirs.sort(key=lambda d: d.stat().st_mtime)
+        return [(d.name, dir_size(d)) for d in entry_dirs]
+
+    def evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = self.entries()
+        total = sum(size for _, size in entries)
+        for key, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                self.__log(f'cache evict: {key}')
+                shutil.rmtree(self.cache_dir / key)
+                total -= size
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries())}
+
+    def __log(self, msg):
+        if self.verbose:
+            print(f'============ {msg}')
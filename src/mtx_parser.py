@@ -0,0 +1,107 @@
+import os
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+DEFAULT_CHUNK_BYTES = 32 * 2 ** 20
+ENTRY_FIELDS = 3
+# pattern matrices list gene + barcode only, every entry has the value 1
+PATTERN_FIELDS = 2
+
+
+def read_header(matrix_file):
+    """ returns: ( (genes, barcodes, entries), value-type, body-offset )
+    """
+    with open(matrix_file, 'rb') as f:
+        banner = f.readline().decode().lower().split()
+        line = f.readline()
+        while line.startswith(b'%'):
+            line = f.readline()
+        size = tuple(int(v) for v in line.split())
+        value_type = np.float64 if 'real' in banner else np.int64
+        return size, value_type, f.tell()
+
+
+def entry_fields(matrix_file):
+    """ returns: fields per entry line, PATTERN_FIELDS for pattern matrices
+    """
+    with open(matrix_file, 'rb') as f:
+        banner = f.readline().decode().lower().split()
+    assert 'coordinate' in banner, f'not a MatrixMarket coordinate matrix: {matrix_file}'
+    return PATTERN_FIELDS if 'pattern' in banner else ENTRY_FIELDS
+
+
+def chunk_ranges(matrix_file, body_offset, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """ splits the file body into byte ranges, each ending on a line break
+    """
+    file_size = os.path.getsize(matrix_file)
+    boundaries = [body_offset]
+    with open(matrix_file, 'rb') as f:
+        while boundaries[-1] + chunk_bytes < file_size:
+            f.seek(boundaries[-1] + chunk_bytes)
+            f.readline()
+            if f.tell() >= file_size:
+                break
+            boundaries.append(f.tell())
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def parse_range(matrix_file, start, end, value_type=np.int64, fields=ENTRY_FIELDS):
+    with open(matrix_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('ascii')
+    entries = np.fromstring(text, dtype=value_type, sep=' ').reshape(-1, fields)
+    if fields == PATTERN_FIELDS:
+        values = np.ones(len(entries), dtype=np.int32)
+    else:
+        values = entries[:, 2] if value_type == np.float64 else entries[:, 2].astype(np.int32)
+    return entries[:, 0].astype(np.int32), entries[:, 1].astype(np.int32), values
+
+
+def parse_range_task(args):
+    return parse_range(*args)
+
+
+def parse_mtx_chunks(matrix_file, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """ yields entry chunks in file order: ( gene-line-nums, barcode-line-nums, values )
+        at most `processes` chunks are parsed ahead of the consumer, slow consumers don't queue up the file
+    """
+    _, value_type, body_offset = read_header(matrix_file)
+    fields = entry_fields(matrix_file)
+    tasks = [(matrix_file, start, end, value_type, fields)
+             for start, end in chunk_ranges(matrix_file, body_offset, chunk_bytes)]
+    if processes == 1 or len(tasks) == 1:
+        yield from map(parse_range_task, tasks)
+        return
+    processes = processes or os.cpu_count() or 1
+    with Pool(processes=processes) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(parse_range_task, (task,)))
+            if len(pending) >= processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def parse_mtx(matrix_file, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """ returns all MatrixMarket coordinate entries: ( gene-line-nums, barcode-line-nums, values )
+    """
+    chunks = list(parse_mtx_chunks(matrix_file, processes, chunk_bytes))
+    return tuple(np.concatenate([chunk[field] for chunk in chunks]) for field in range(ENTRY_FIELDS))
+
+
+def read_names(tsv_file):
+    """ first column of a barcodes / genes file, line number n is at position n - 1
+    """
+    with open(tsv_file) as f:
+        return [line.split('\t')[0].strip() for line in f]
+
+
+def names_of_lines(tsv_file, line_nums):
+    """ names of the 1-based line numbers, e.g. the gene columns of SparseCells
+    """
+    all_names = read_names(tsv_file)
+    return [all_names[int(line_num) - 1] for line_num in line_nums]
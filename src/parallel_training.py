@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+from typing import Callable, Any
+
+import numpy as np
+
+from bigan_basic import BasicBiGan, FLOAT32_PRECISION
+from cell_type_training import CellTraining
+from checkpoints import optimizer_state, restore_optimizer_state, random_state, restore_random_state
+
+# sent instead of weights: the worker replies with its worker_state
+STATE_REQUEST = 'state'
+
+
+def component_weights(network: BasicBiGan):
+    return [component.get_weights() for component in network.all_components]
+
+
+def set_component_weights(network: BasicBiGan, weights):
+    for component, component_weights_ in zip(network.all_components, weights):
+        component.set_weights(component_weights_)
+    network.weights_updated()
+
+
+def average_weights(worker_weights):
+    """ element-wise mean of the G/E/D weights of all workers
+    """
+    return [
+        [np.mean(arrays, axis=0).astype(arrays[0].dtype) for arrays in zip(*components)]
+        for components in zip(*worker_weights)
+    ]
+
+
+def worker_threads(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def worker_state(trainer):
+    """ the state a worker keeps between iterations: its optimizer + random generators
+    """
+    return {'optimizer': optimizer_state(trainer.network), 'random': random_state(trainer)}
+
+
+def restore_worker_state(trainer, state):
+    restore_optimizer_state(trainer.network, state['optimizer'])
+    restore_random_state(trainer, state['random'])
+
+
+def worker_loop(connection, data, batch_size, encoding_size, options, seed, threads, state=None):
+    """ runs in a spawned process: receives G/E/D weights, trains one iteration on its own batches
+        and sends back ( losses, weights ), until None is received. STATE_REQUEST is answered with the worker_state.
+    """
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+    trainer = CellTraining(data, batch_size, encoding_size, **options)
+    if state is not None:
+        restore_worker_state(trainer, state)
+    losses = []
+    message = connection.recv()
+    while message is not None:
+        if isinstance(message, str):
+            connection.send(worker_state(trainer))
+        else:
+            set_component_weights(trainer.network, message)
+            trainer.run(1, lambda _, iteration_losses: losses.append(iteration_losses))
+            connection.send((losses.pop(), component_weights(trainer.network)))
+        message = connection.recv()
+    connection.close()
+
+
+class WorkerPool:
+    """ Local training processes, started with 'spawn' so each one gets its own TensorFlow runtime.
+    """
+
+    def __init__(self, workers, data, batch_size, encoding_size, options, seed=None, states=None):
+        """ states: worker_state of every worker to continue from, e.g. from a checkpoint
+        """
+        assert states is None or len(states) == workers, f'{len(states)} worker states for {workers} workers'
+        self.workers = workers
+        self.states = states
+        self.data = data
+        self.batch_size = batch_size
+        self.encoding_size = encoding_size
+        self.options = options
+        self.seed = np.random.randint(2 ** 31 - workers) if seed is None else seed
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        threads = worker_threads(self.workers)
+        for worker_ix in range(self.workers):
+            coordinator_end, worker_end = context.Pipe()
+            process = context.Process(
+                target=worker_loop, daemon=True,
+                args=(worker_end, self.data, self.batch_size, self.encoding_size, self.options,
+                      self.seed + worker_ix, threads, self.states[worker_ix] if self.states else None)
+            )
+            process.start()
+            worker_end.close()
+            self.connections.append(coordinator_end)
+            self.processes.append(process)
+        return self
+
+    def train(self, weights):
+        """ returns: [ ( losses, weights ) ] of every worker
+        """
+        for connection in self.connections:
+            connection.send(weights)
+        return [connection.recv() for connection in self.connections]
+
+    def worker_states(self):
+        """ returns: the worker_state of every worker
+        """
+        for connection in self.connections:
+            connection.send(STATE_REQUEST)
+        return [connection.recv() for connection in self.connections]
+
+    def __exit__(self, *_):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections, self.processes = [], []
+
+
+class ParallelCellTraining(CellTraining):
+    """ Data-parallel training with parameter averaging over local worker processes.
+        Every iteration each worker trains batches_per_iteration steps on batch_size / workers cells,
+        the coordinator averages the G/E/D weights, broadcasts them for the next iteration
+        and runs the interceptors with the mean worker losses.
+        Optimizer state stays local to each worker, checkpoints hold the optimizer + random state
+        of every worker (see worker_states, restore_worker_states).
+    """
+
+    def __init__(self, data, batch_size, encoding_size, workers=2, batches_per_iteration=10, input_pipeline=False,
+                 fused_step=False, jit_compile=False, precision=FLOAT32_PRECISION, sparse_input=False, seed=None,
+                 holdout_ixs=None):
+        assert batch_size >= workers, f'batch size {batch_size} smaller than worker count {workers}'
+        super().__init__(data, batch_size, encoding_size, batches_per_iteration, input_pipeline,
+                         precision=precision, sparse_input=sparse_input, holdout_ixs=holdout_ixs)
+        self.workers = workers
+        self.seed = seed
+        self.resume_states = None
+        self.__pool = None
+        self.worker_options = {
+            'batches_per_iteration': batches_per_iteration,
+            'input_pipeline': input_pipeline,
+            'fused_step': fused_step,
+            'jit_compile': jit_compile,
+            'precision': precision,
+            'sparse_input': sparse_input,
+            'holdout_ixs': holdout_ixs
+        }
+
+    def worker_states(self):
+        """ returns: the worker_state of every worker, only while training (e.g. from an interceptor)
+        """
+        assert self.__pool is not None, 'worker states are only available during training'
+        return self.__pool.worker_states()
+
+    def restore_worker_states(self, states):
+        """ the workers of the next run continue from these states
+        """
+        assert len(states) == self.workers, \
+            f'checkpoint of a {len(states)}-worker run cannot be resumed with {self.workers} workers'
+        self.resume_states = states
+
+    def run(self, iterations, interceptor: Callable[[int, Any], None] = None, start_iteration=0):
+        self.stop_reason = None
+        pool = WorkerPool(self.workers, self.data, self.batch_size // self.workers, self.network.encoding_size,
+                          self.worker_options, self.seed, self.resume_states)
+        with pool:
+            self.__pool, self.resume_states = pool, None
+            try:
+                weights = component_weights(self.network)
+                for it in range(start_iteration, iterations):
+                    results = pool.train(weights)
+                    weights = average_weights([worker_weights for _, worker_weights in results])
+                    set_component_weights(self.network, weights)
+                    if interceptor:
+                        losses = np.mean([worker_losses for worker_losses, _ in results], axis=0)
+                        interceptor(it, tuple(float(loss) for loss in losses))
+                    if self.stop_reason is not None:
+                        break
+            finally:
+                self.__pool = None
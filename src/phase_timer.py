@@ -0,0 +1,78 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# log-spaced bucket edges from 10 microseconds to 100 seconds
+HISTOGRAM_EDGES = np.logspace(-5, 2, 29)
+TIMING_FIELDS = ['iteration', 'phase', 'count', 'total-ms', 'p50-ms', 'p90-ms', 'max-ms']
+# upper bucket edge, the last bucket is unbounded: inf
+HISTOGRAM_FIELDS = ['iteration', 'phase', 'bucket-ms', 'count']
+
+
+class NullTimer:
+    """ disabled timer, phases cost one method call
+    """
+    enabled = False
+    __null_phase = nullcontext()
+
+    def phase(self, _):
+        return self.__null_phase
+
+    def end_iteration(self, it):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class PhaseTimer:
+    """ Wall-clock durations of named phases, collected per iteration.
+        end_iteration passes { phase: [ seconds, ... ] } of the iteration to all listeners.
+        Phases may be nested, e.g. 'step' contains the update phases of the network.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+        self.listeners = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name].append(time.perf_counter() - start)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def end_iteration(self, it):
+        durations, self.durations = dict(self.durations), defaultdict(list)
+        for listener in self.listeners:
+            listener(it, durations)
+
+
+def timing_lines(it, durations):
+    """ one line per phase, see TIMING_FIELDS
+    """
+    lines = []
+    for name, seconds in sorted(durations.items()):
+        millis = np.asarray(seconds) * 1000
+        lines.append([it, name, len(millis), millis.sum(), np.percentile(millis, 50), np.percentile(millis, 90),
+                      millis.max()])
+    return lines
+
+
+def histogram_lines(it, durations):
+    """ one line per phase + non-empty HISTOGRAM_EDGES bucket, see HISTOGRAM_FIELDS,
+        summing the counts of a phase over iterations gives its run histogram
+    """
+    upper_edges = np.append(HISTOGRAM_EDGES * 1000, np.inf)
+    lines = []
+    for name, seconds in sorted(durations.items()):
+        counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES, seconds), minlength=len(upper_edges))
+        lines.extend([it, name, upper_edges[bucket], counts[bucket]] for bucket in np.flatnonzero(counts))
+    return lines
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class EpochSampler:
+    """ Yields batches of row indices from per-epoch permutations: every cell is drawn once per epoch.
+        The last incomplete batch of an epoch is dropped.
+    """
+
+    def __init__(self, cell_count, batch_size, seed=None):
+        assert batch_size <= cell_count, f'batch size {batch_size} larger than cell count {cell_count}'
+        self.cell_count = cell_count
+        self.batch_size = batch_size
+        self.rnd = np.random.RandomState(seed)
+        self.epoch = 0
+
+    def __iter__(self):
+        while True:
+            permutation = self.rnd.permutation(self.cell_count)
+            for start in range(0, self.cell_count - self.batch_size + 1, self.batch_size):
+                yield permutation[start:start + self.batch_size]
+            self.epoch += 1
+
+
+class StratifiedSampler:
+    """ Yields batches with the same number of cells of every stratum (source id, cluster, ...),
+        each stratum is drawn without replacement from its own per-epoch permutation.
+    """
+
+    def __init__(self, labels, batch_size, seed=None):
+        self.strata = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+        assert batch_size >= len(self.strata), f'batch size {batch_size} smaller than stratum count {len(self.strata)}'
+        self.batch_size = batch_size
+        self.rnd = np.random.RandomState(seed)
+
+    def stratum_counts(self):
+        """ cells per stratum for the next batch, the remainder goes to randomly chosen strata
+        """
+        counts = np.full(len(self.strata), self.batch_size // len(self.strata))
+        counts[self.rnd.choice(len(self.strata), self.batch_size % len(self.strata), replace=False)] += 1
+        return counts
+
+    def __iter__(self):
+        permutations = [self.rnd.permutation(stratum) for stratum in self.strata]
+        positions = np.zeros(len(self.strata), dtype=int)
+        while True:
+            batch = []
+            for stratum_ix, count in enumerate(self.stratum_counts()):
+                while count > 0:
+                    permutation = permutations[stratum_ix]
+                    if positions[stratum_ix] == len(permutation):
+                        permutation = permutations[stratum_ix] = self.rnd.permutation(self.strata[stratum_ix])
+                        positions[stratum_ix] = 0
+                    taken = permutation[positions[stratum_ix]:positions[stratum_ix] + count]
+                    positions[stratum_ix] += len(taken)
+                    count -= len(taken)
+                    batch.append(taken)
+            yield self.rnd.permutation(np.concatenate(batch))
+
+
+class WeightedSampler:
+    """ Yields batches drawn with replacement, cell probabilities proportional to weights.
+    """
+
+    def __init__(self, weights, batch_size, seed=None):
+        weights = np.asarray(weights, dtype=np.float64)
+        assert np.all(weights >= 0) and weights.sum() > 0, 'weights have to be non-negative, not all zero'
+        self.cumulative = np.cumsum(weights / weights.sum())
+        self.batch_size = batch_size
+        self.rnd = np.random.RandomState(seed)
+
+    def __iter__(self):
+        last_ix = len(self.cumulative) - 1
+        while True:
+            draws = self.rnd.random_sample(self.batch_size) * self.cumulative[-1]
+            yield np.minimum(np.searchsorted(self.cumulative, draws, side='right'), last_ix)
+
+
+def inverse_frequency_weights(labels):
+    """ weights giving every label the same total probability
+    """
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    return 1 / counts[inverse]
+
+
+def encoding_clusters(encodings, bins=2):
+    """ provisional cluster labels: encodings quantised into bins per dimension
+    """
+    encodings = np.asarray(encodings)
+    quantised = np.clip((encodings * bins).astype(int), 0, bins - 1)
+    return quantised @ (bins ** np.arange(encodings.shape[1]))
@@ -0,0 +1,191 @@
+import itertools
+import multiprocessing
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bigan_classify import ClassifyCellBiGan, DEFAULT_LEARNING_RATE
+from bigan_cont import ContinuousCellBiGan
+from cell_matrix import SparseCells
+from cell_type_training import CellTraining, frame_to_arrays, frame_from_arrays
+from intercepts import SinkIntercepts, combined_interceptors, print_losses
+from intercepts.data_sink import DataSink
+from parallel_training import worker_threads
+
+NETWORK_CLASSES = {
+    'continuous': ContinuousCellBiGan,
+    'classify': ClassifyCellBiGan
+}
+DEFAULT_SETTINGS = {
+    'encoding_size': 3,
+    'batch_size': 128,
+    'network': 'continuous',
+    'learning_rate': DEFAULT_LEARNING_RATE
+}
+SUMMARY_FIELDS = ['trial', 'source', 'encoding_size', 'batch_size', 'network', 'learning_rate',
+                  'total-loss', 'g-loss', 'e-loss', 'd-loss', 'seconds']
+
+
+class SharedArrays:
+    """ Numpy arrays copied into shared memory blocks once, attached by name in other processes.
+        Only the block names + array layouts are pickled.
+    """
+
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.layouts = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks[name] = block
+            self.layouts[name] = (block.name, array.shape, array.dtype.str)
+
+    def __getstate__(self):
+        return {'layouts': self.layouts}
+
+    def __setstate__(self, state):
+        self.layouts = state['layouts']
+        self.blocks = {}
+
+    def attach(self):
+        """ returns: the arrays as views of the shared blocks, valid while this object is referenced
+        """
+        arrays = {}
+        for name, (block_name, shape, dtype) in self.layouts.items():
+            if name not in self.blocks:
+                # spawned workers share the creating process's resource tracker, their registration of the
+                # block is the creator's one, which unlink removes
+                self.blocks[name] = shared_memory.SharedMemory(name=block_name)
+            arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=self.blocks[name].buf)
+        return arrays
+
+    def unlink(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+class SharedCells:
+    """ SparseCells or cell DataFrame in shared memory
+    """
+
+    def __init__(self, data):
+        self.sparse = isinstance(data, SparseCells)
+        self.arrays = SharedArrays(data.to_arrays() if self.sparse else frame_to_arrays(data))
+
+    def attach(self):
+        arrays = self.arrays.attach()
+        return SparseCells.from_arrays(arrays) if self.sparse else frame_from_arrays(arrays)
+
+    def unlink(self):
+        self.arrays.unlink()
+
+
+def grid_settings(grid):
+    """ all combinations of the grid values, unspecified settings have their default
+    """
+    names = list(grid.keys())
+    return [{**DEFAULT_SETTINGS, **dict(zip(names, values))} for values in itertools.product(*grid.values())]
+
+
+attached_sources = {}
+
+
+def init_worker(threads):
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+
+def run_trial(trial):
+    """ runs in a pool process, the shared source is attached once per process
+    """
+    source_id = trial['source']
+    if source_id not in attached_sources:
+        shared = trial['shared']
+        attached_sources[source_id] = shared, shared.attach()
+    data = attached_sources[source_id][1]
+
+    settings = trial['settings']
+    trainer = CellTraining(
+        data, batch_size=settings['batch_size'], encoding_size=settings['encoding_size'],
+        network_class=NETWORK_CLASSES[settings['network']], learning_rate=settings['learning_rate']
+    )
+    log_dir = pathlib.Path(trial['log_dir'])
+    log_dir.mkdir(parents=True)
+    sink = SinkIntercepts(str(log_dir))
+    final_losses = []
+    interceptors = combined_interceptors([
+        print_losses(trial['id']),
+        sink.save_losses(),
+        lambda _, losses: final_losses.append(losses)
+    ])
+    start = time.perf_counter()
+    trainer.run(trial['iterations'], interceptors)
+    sink.sink.drain_data()
+    return trial['id'], final_losses[-1], time.perf_counter() - start
+
+
+def summary_line(trial, losses, seconds):
+    settings = trial['settings']
+    return [trial['id'], trial['source'], settings['encoding_size'], settings['batch_size'], settings['network'],
+            settings['learning_rate'], sum(losses), *losses, round(seconds, 2)]
+
+
+def print_summary(lines):
+    print(f'{"trial":>24} {"source":>20} {"enc":>4} {"batch":>6} {"network":>11} {"lr":>8} '
+          f'{"total":>8} {"g":>8} {"e":>8} {"d":>8} {"sec":>8}')
+    for line in sorted(lines, key=lambda summary: summary[6]):
+        trial_id, source_id, encoding_size, batch_size, network, learning_rate, *losses, seconds = line
+        print(f'{trial_id:>24} {source_id:>20} {encoding_size:4} {batch_size:6} {network:>11} {learning_rate:8.5f} '
+              + ' '.join(f'{loss:8.3f}' for loss in losses) + f' {seconds:8.1f}')
+
+
+def run_sweep(sweep_id, sources, grid, iterations, log_root='logs', processes=None):
+    """ sources: { source-id: SparseCells or cell DataFrame }, each is put into shared memory once
+        grid: { setting: [ values ] } of encoding_size, batch_size, network (see NETWORK_CLASSES), learning_rate
+        returns: summary lines (see SUMMARY_FIELDS), also written to <log_root>/<sweep_id>/summary.csv
+    """
+    assert sources and grid_settings(grid), f'sweep without trials: {len(sources)} sources, grid: {grid}'
+    sweep_dir = pathlib.Path(log_root) / sweep_id
+    if sweep_dir.exists():
+        raise AssertionError(f'duplicate sweep-id, log-dir: {sweep_dir}')
+    sweep_dir.mkdir(parents=True)
+    for settings in grid_settings(grid):
+        assert settings['network'] in NETWORK_CLASSES, f'unknown network: {settings["network"]}'
+
+    shared_sources = {source_id: SharedCells(data) for source_id, data in sources.items()}
+    try:
+        trials = [{
+            'id': f'{sweep_id}_t{trial_ix}',
+            'source': source_id,
+            'shared': shared_sources[source_id],
+            'settings': settings,
+            'iterations': iterations,
+            'log_dir': str(sweep_dir / f'{sweep_id}_t{trial_ix}')
+        } for trial_ix, (source_id, settings) in enumerate(itertools.product(sources, grid_settings(grid)))]
+
+        processes = processes or min(len(trials), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker, initargs=(worker_threads(processes),)
+        )
+        with pool:
+            results = {trial_id: (losses, seconds) for trial_id, losses, seconds in pool.map(run_trial, trials)}
+    finally:
+        for shared in shared_sources.values():
+            shared.unlink()
+
+    lines = [summary_line(trial, *results[trial['id']]) for trial in trials]
+    sink = DataSink(str(sweep_dir), batch_size=len(lines))
+    sink.add_graph_header('summary', SUMMARY_FIELDS)
+    for line in lines:
+        sink.add_data('summary', line)
+    print_summary(lines)
+    return lines
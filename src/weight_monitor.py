@@ -0,0 +1,59 @@
+import numpy as np
+import tensorflow as tf
+
+WEIGHT_FIELDS = ['iteration', 'layer', 'weight-norm', 'update-norm', 'update-ratio']
+
+
+def weight_name(weight):
+    return weight.name.split('/')[-1].split(':')[0]
+
+
+def trainable_weights(component):
+    """ ( layer-name/weight-name, weight ) of every trainable kernel + bias,
+        by the variables' own flag: the components' trainable flags are switched during training
+    """
+    return [(f'{component.name}/{layer.name}/{weight_name(weight)}', weight)
+            for layer in component.layers for weight in layer.weights if weight.trainable]
+
+
+class WeightMonitor:
+    """ Per-weight statistics of a BiGAN's components, computed in-graph:
+            weight-norm:  L2 norm of the kernel / bias
+            update-norm:  L2 norm of the change since the previous statistics() call, or since construction
+            update-ratio: update-norm / weight-norm
+        The previous weights are kept as non-trainable variables on the weights' device,
+        only the statistics are copied to the host.
+    """
+
+    def __init__(self, network):
+        self.components = [[name for name, _ in trainable_weights(component)] for component in network.all_components]
+        tracked = [weight for component in network.all_components for _, weight in trainable_weights(component)]
+        self.layer_names = [name for names in self.components for name in names]
+        self.__weights = tracked
+        self.__previous = [tf.Variable(weight, trainable=False) for weight in tracked]
+        self.__statistics = tf.function(self.__weight_statistics)
+
+    def __weight_statistics(self):
+        statistics = []
+        for weight, previous in zip(self.__weights, self.__previous):
+            weight_norm = tf.norm(weight)
+            update_norm = tf.norm(weight - previous)
+            previous.assign(weight)
+            statistics.append(tf.stack([weight_norm, update_norm, tf.math.divide_no_nan(update_norm, weight_norm)]))
+        return tf.stack(statistics)
+
+    def statistics(self):
+        """ returns: [ weight-count, ( weight-norm, update-norm, update-ratio ) ]
+        """
+        if not self.__weights:
+            return np.zeros((0, 3), dtype=np.float32)
+        return self.__statistics().numpy()
+
+    def components_changed(self, statistics):
+        """ per component: True if any of its weights was updated
+        """
+        changed, start = [], 0
+        for names in self.components:
+            changed.append(bool(np.any(statistics[start:start + len(names), 1] > 0)))
+            start += len(names)
+        return changed
@@ -0,0 +1,144 @@
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import numpy as np
+import pandas as pd
+
+from bigan_cont import ContinuousCellBiGan
+from intercepts import AsyncInterceptor
+from intercepts.async_intercepts import DROP_POLICY, COALESCE_POLICY
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_LOSSES = (1.0, 2.0, 3.0)
+
+
+class GatedInterceptor:
+    """ records the iterations, the first call waits until the gate is opened
+    """
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.its = []
+
+    def __call__(self, it, _):
+        self.started.set()
+        self.gate.wait(10)
+        self.its.append(it)
+
+
+class AsyncInterceptorTestCase(unittest.TestCase):
+    def submit_while_busy(self, policy, its):
+        interceptor = GatedInterceptor()
+        executor = AsyncInterceptor(interceptor, max_pending=2, policy=policy)
+        executor(0, TEST_LOSSES)
+        interceptor.started.wait(10)
+        for it in its:
+            executor(it, TEST_LOSSES)
+        interceptor.gate.set()
+        executor.close()
+        return interceptor, executor
+
+    def test_runs_in_order(self):
+        its = []
+        executor = AsyncInterceptor(lambda it, losses: its.append((it, losses)), max_pending=1)
+        for it in range(5):
+            executor(it, TEST_LOSSES)
+        executor.wait()
+        self.assertEqual([(it, TEST_LOSSES) for it in range(5)], its)
+        executor.close()
+        self.assertEqual(5, executor.completed)
+
+    def test_drop(self):
+        interceptor, executor = self.submit_while_busy(DROP_POLICY, [1, 2, 3, 4])
+        self.assertEqual([0, 1, 2], interceptor.its)
+        self.assertEqual(2, executor.dropped)
+
+    def test_coalesce(self):
+        interceptor, executor = self.submit_while_busy(COALESCE_POLICY, [1, 2, 3, 4])
+        self.assertEqual([0, 1, 4], interceptor.its)
+        self.assertEqual(2, executor.coalesced)
+
+    def test_iteration_filter(self):
+        its = []
+        executor = AsyncInterceptor(lambda it, _: its.append(it), iteration_filter=lambda it: it % 2 == 1)
+        for it in range(5):
+            executor(it, TEST_LOSSES)
+        executor.close()
+        self.assertEqual([1, 3], its)
+        self.assertEqual(2, executor.submitted)
+
+    def test_close_without_drain(self):
+        interceptor = GatedInterceptor()
+        executor = AsyncInterceptor(interceptor, max_pending=2)
+        executor(0, TEST_LOSSES)
+        interceptor.started.wait(10)
+        executor(1, TEST_LOSSES)
+        interceptor.gate.set()
+        executor.close(drain=False)
+        self.assertEqual([0], interceptor.its)
+        self.assertEqual(1, executor.dropped)
+        with self.assertRaises(AssertionError):
+            executor(2, TEST_LOSSES)
+
+    def test_error(self):
+        def failing(_, __):
+            raise ValueError('failed')
+
+        executor = AsyncInterceptor(failing)
+        executor(0, TEST_LOSSES)
+        with self.assertRaises(AssertionError):
+            executor.wait()
+        executor.close()
+
+
+class PinnedEncodingsTestCase(TFTestCase):
+    def test_encodings_of_submitting_iteration(self):
+        network = ContinuousCellBiGan(3, 20)
+        data = pd.DataFrame(np.random.RandomState(0).poisson(1, (8, 20)).astype(np.float32))
+        trainer = SimpleNamespace(network=network, data=data)
+        recorded = []
+        interceptor = GatedInterceptor()
+
+        def record(it, losses):
+            interceptor(it, losses)
+            recorded.append(network.cached_encoding_prediction(data))
+
+        executor = AsyncInterceptor(record, trainer)
+        executor(0, TEST_LOSSES)
+        submitted = network.cached_encoding_prediction(data)
+        network.trainings_step(data.values)
+        interceptor.gate.set()
+        executor.close()
+        np.testing.assert_allclose(submitted, recorded[0], rtol=1e-6)
+        self.assertFalse(np.allclose(submitted, network.cached_encoding_prediction(data)))
+
+    def test_dropped_call_copies_nothing(self):
+        network = ContinuousCellBiGan(3, 20)
+        data = pd.DataFrame(np.random.RandomState(0).poisson(1, (8, 20)).astype(np.float32))
+        snapshots = []
+        get_weights = network._encoder.get_weights
+
+        def counted_weights():
+            snapshots.append(threading.current_thread())
+            return get_weights()
+
+        network._encoder.get_weights = counted_weights
+        network.cached_encoding_prediction = Mock(side_effect=AssertionError('predicted on the training thread'))
+        trainer = SimpleNamespace(network=network, data=data)
+        interceptor = GatedInterceptor()
+        executor = AsyncInterceptor(interceptor, trainer, max_pending=2, policy=DROP_POLICY)
+        for it in range(5):
+            executor(it, TEST_LOSSES)
+            interceptor.started.wait(10)
+        interceptor.gate.set()
+        executor.close()
+        self.assertEqual([0, 1, 2], interceptor.its)
+        self.assertEqual(2, executor.dropped)
+        self.assertEqual([threading.main_thread()] * 3, snapshots)
+        network.cached_encoding_prediction.assert_not_called()
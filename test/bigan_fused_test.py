@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+
+from bigan_classify import ClassifyCellBiGan
+from bigan_cont import ContinuousCellBiGan
+from bigan_fused import FusedTrainingStep
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_BATCH_SIZE = 12
+TEST_GENE_SIZE = 40
+TEST_ENCODING_SIZE = 3
+
+
+def without_dropout(bigan):
+    for component in bigan.all_components:
+        for layer in component.layers:
+            if isinstance(layer, layers.Dropout):
+                layer.rate = 0.0
+    return bigan
+
+
+def identical_bigans(bigan_class):
+    tf.random.set_seed(3)
+    reference = without_dropout(bigan_class(TEST_ENCODING_SIZE, TEST_GENE_SIZE))
+    fused = without_dropout(bigan_class(TEST_ENCODING_SIZE, TEST_GENE_SIZE))
+    for ref_component, fused_component in zip(reference.all_components, fused.all_components):
+        fused_component.set_weights(ref_component.get_weights())
+    return reference, fused
+
+
+class FusedTrainingStepTestCase(TFTestCase):
+    def setUp(self):
+        self.rnd = np.random.RandomState(7)
+
+    def __assert_equivalent_losses(self, bigan_class):
+        reference, fused = identical_bigans(bigan_class)
+        fused_step = FusedTrainingStep(fused, seed=1)
+        for _ in range(3):
+            batch = self.rnd.poisson(1.5, (TEST_BATCH_SIZE, TEST_GENE_SIZE)).astype(np.float32)
+            encodings = np.asarray(reference.random_encoding_vector(TEST_BATCH_SIZE), dtype=np.float32)
+            noise = self.rnd.uniform(size=(TEST_BATCH_SIZE, TEST_ENCODING_SIZE)).astype(np.float32)
+            reference.random_encoding_vector = lambda _: encodings
+            reference.random_uniform_vector = lambda _: noise
+
+            expected_losses = reference.trainings_step(batch)
+            fused_losses = fused_step(batch, tf.constant(encodings), tf.constant(noise))
+            np.testing.assert_allclose(expected_losses, [loss.numpy() for loss in fused_losses], rtol=1e-4)
+
+    def test_classify_bigan_losses(self):
+        self.__assert_equivalent_losses(ClassifyCellBiGan)
+
+    def test_continuous_bigan_losses(self):
+        self.__assert_equivalent_losses(ContinuousCellBiGan)
+
+    def test_in_graph_random_encodings(self):
+        bigan = ClassifyCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+        fused_step = FusedTrainingStep(bigan, seed=2)
+        batch = self.rnd.poisson(1.5, (TEST_BATCH_SIZE, TEST_GENE_SIZE))
+        losses = fused_step(batch)
+        self.assertEqual(3, len(losses))
+        self.assertTrue(all(np.isfinite(loss.numpy()) for loss in losses))
+
+        encodings = bigan.graph_random_encoding(tf.random.Generator.from_seed(1), 20)
+        self.assertEqual((20, TEST_ENCODING_SIZE), encodings.shape)
+        self.assertDeepEqual(tf.ones(20), tf.reduce_sum(encodings, axis=1))
+
+    def test_restores_trainable_flags(self):
+        bigan = ClassifyCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+        flags = [component.trainable for component in bigan.all_components]
+        FusedTrainingStep(bigan, seed=2)(self.rnd.poisson(1.5, (TEST_BATCH_SIZE, TEST_GENE_SIZE)))
+        self.assertEqual(flags, [component.trainable for component in bigan.all_components])
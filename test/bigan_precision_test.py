@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import mixed_precision
+
+from bigan_basic import FLOAT32_PRECISION, FLOAT16_PRECISION, BFLOAT16_PRECISION
+from bigan_cont import ContinuousCellBiGan
+from bigan_fused import FusedTrainingStep
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_BATCH_SIZE = 16
+TEST_GENE_SIZE = 60
+TEST_ENCODING_SIZE = 3
+
+
+class PrecisionTestCase(TFTestCase):
+    def setUp(self):
+        rnd = np.random.RandomState(11)
+        self.batch = rnd.poisson(1.0, (TEST_BATCH_SIZE, TEST_GENE_SIZE)).astype(np.float32)
+        self.encodings = rnd.uniform(size=(TEST_BATCH_SIZE, TEST_ENCODING_SIZE)).astype(np.float32)
+        self.noise = rnd.uniform(size=(TEST_BATCH_SIZE, TEST_ENCODING_SIZE)).astype(np.float32)
+        self.reference = ContinuousCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+
+    def __reduced_precision_copy(self, precision):
+        bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE, precision=precision)
+        for ref_component, component in zip(self.reference.all_components, bigan.all_components):
+            component.set_weights(ref_component.get_weights())
+        return bigan
+
+    def __losses(self, bigan):
+        y_ones = np.repeat(0.95, TEST_BATCH_SIZE)
+        return [
+            bigan._train_gen_w_discr.test_on_batch((self.encodings, self.noise), y_ones),
+            bigan._train_gen_w_enc.test_on_batch((self.batch, self.noise), self.batch),
+            bigan._train_enc_w_discr.test_on_batch(self.batch, np.zeros(TEST_BATCH_SIZE)),
+            bigan._discriminator.test_on_batch((self.encodings, self.batch), y_ones)
+        ]
+
+    def __assert_within_tolerance(self, precision):
+        bigan = self.__reduced_precision_copy(precision)
+        np.testing.assert_allclose(
+            self.reference.encoding_prediction(self.batch), bigan.encoding_prediction(self.batch), atol=0.02
+        )
+        np.testing.assert_allclose(self.__losses(self.reference), self.__losses(bigan), rtol=0.03)
+
+    def test_default_precision(self):
+        self.assertEqual(FLOAT32_PRECISION, self.reference.precision)
+        self.assertEqual(np.float32, self.reference.input_dtype)
+        self.assertEqual(tf.float32, self.reference._encoder.layers[1].compute_dtype)
+
+    def test_bfloat16_within_tolerance(self):
+        self.__assert_within_tolerance(BFLOAT16_PRECISION)
+
+    def test_float16_within_tolerance(self):
+        self.__assert_within_tolerance(FLOAT16_PRECISION)
+
+    def test_reduced_precision_layers(self):
+        bigan = self.__reduced_precision_copy(FLOAT16_PRECISION)
+        self.assertEqual(FLOAT32_PRECISION, mixed_precision.global_policy().name)
+        self.assertEqual(np.float16, bigan.input_dtype)
+        self.assertEqual(tf.float16, bigan._encoder.layers[1].compute_dtype)
+        self.assertEqual(tf.float32, bigan._encoder.layers[1].kernel.dtype)
+        self.assertEqual(tf.float32, bigan._encoder.output.dtype)
+        self.assertIsInstance(bigan._discriminator.optimizer, mixed_precision.LossScaleOptimizer)
+
+    def test_fused_step_with_loss_scaling(self):
+        bigan = self.__reduced_precision_copy(FLOAT16_PRECISION)
+        losses = FusedTrainingStep(bigan, seed=1)(self.batch.astype(np.float16))
+        self.assertTrue(all(np.isfinite(loss.numpy()) for loss in losses))
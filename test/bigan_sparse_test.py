@@ -0,0 +1,117 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from scipy import sparse
+from tensorflow.keras import layers
+
+import bigan_classify
+import bigan_cont
+from cell_pipeline import sparse_tensor, cell_batches
+from cell_type_training import CellTraining, load_sparse_matrix
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_BATCH_SIZE = 8
+TEST_GENE_SIZE = 40
+TEST_ENCODING_SIZE = 3
+
+
+def creation_order(model, layer_class):
+    def name_number(layer):
+        suffix = re.search(r'_(\d+)$', layer.name)
+        return int(suffix.group(1)) if suffix else 0
+
+    return sorted([lay for lay in model.layers if isinstance(lay, layer_class)], key=name_number)
+
+
+def copy_to_sparse_model(dense_model, sparse_model):
+    """ copies weights, splitting kernels of Dense layers over Concatenate([x, cells])
+        into the two input projections of the sparse model
+    """
+    sparse_denses = creation_order(sparse_model, layers.Dense)
+    for dense_layer in creation_order(dense_model, layers.Dense):
+        kernel, bias = dense_layer.get_weights()
+        target = sparse_denses.pop(0)
+        split = target.kernel.shape[0]
+        target.set_weights([kernel[:split], bias])
+        if split < kernel.shape[0]:
+            sparse_denses.pop(0).set_weights([kernel[split:]])
+    for dense_bn, sparse_bn in zip(creation_order(dense_model, layers.BatchNormalization),
+                                   creation_order(sparse_model, layers.BatchNormalization)):
+        sparse_bn.set_weights(dense_bn.get_weights())
+
+
+class SparseInputTestCase(TFTestCase):
+    def setUp(self):
+        rnd = np.random.RandomState(5)
+        cells = rnd.poisson(3, (TEST_BATCH_SIZE, TEST_GENE_SIZE)) * (rnd.rand(TEST_BATCH_SIZE, TEST_GENE_SIZE) < 0.1)
+        self.cells = cells.astype(np.float32)
+        self.sparse_cells = sparse_tensor(sparse.csr_matrix(self.cells))
+        self.encodings = rnd.uniform(size=(TEST_BATCH_SIZE, TEST_ENCODING_SIZE)).astype(np.float32)
+
+    def test_sparse_tensor(self):
+        self.assertIsInstance(self.sparse_cells, tf.SparseTensor)
+        self.assertDeepEqual(self.cells, tf.sparse.to_dense(self.sparse_cells))
+
+    def test_sparse_encoder_matches_dense(self):
+        for build_encoder in [bigan_classify._build_encoder, bigan_cont._build_encoder]:
+            dense_model = build_encoder(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+            sparse_model = build_encoder(TEST_ENCODING_SIZE, TEST_GENE_SIZE, sparse_input=True)
+            copy_to_sparse_model(dense_model, sparse_model)
+            np.testing.assert_allclose(
+                dense_model(self.cells), sparse_model(self.sparse_cells), rtol=1e-5, atol=1e-6
+            )
+
+    def test_sparse_discriminator_matches_dense(self):
+        dense_model = bigan_classify._build_discriminator(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+        sparse_model = bigan_classify._build_discriminator(TEST_ENCODING_SIZE, TEST_GENE_SIZE, sparse_input=True)
+        copy_to_sparse_model(dense_model, sparse_model)
+        np.testing.assert_allclose(
+            dense_model((self.encodings, self.cells)), sparse_model((self.encodings, self.sparse_cells)),
+            rtol=1e-5, atol=1e-6
+        )
+
+    def test_sparse_network_training(self):
+        for bigan_class in [bigan_classify.ClassifyCellBiGan, bigan_cont.ContinuousCellBiGan]:
+            bigan = bigan_class(TEST_ENCODING_SIZE, TEST_GENE_SIZE, sparse_input=True)
+            losses = bigan.trainings_step(self.sparse_cells)
+            self.assertTrue(all(np.isfinite(loss) for loss in losses))
+            self.assertEqual((TEST_BATCH_SIZE, TEST_ENCODING_SIZE), bigan.encoding_prediction(self.sparse_cells).shape)
+            self.assertEqual((TEST_BATCH_SIZE, TEST_ENCODING_SIZE), bigan.encoding_prediction(self.cells).shape)
+
+    def test_sparse_batches_in_cell_training(self):
+        cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        for options in [{}, {'fused_step': True}, {'input_pipeline': True}]:
+            trainer = CellTraining(cells, 3, TEST_ENCODING_SIZE, batches_per_iteration=2, sparse_input=True, **options)
+            batch = trainer.batch_sampler()()
+            self.assertIsInstance(batch, tf.SparseTensor)
+            self.assertEqual([3, cells.shape[1]], batch.dense_shape.numpy().tolist())
+            iteration_losses = []
+            trainer.run(1, lambda _, losses: iteration_losses.append(losses))
+            self.assertTrue(all(np.isfinite(loss) for loss in iteration_losses[0]))
+            self.assertEqual((len(cells), TEST_ENCODING_SIZE), trainer.network.encoding_prediction(cells).shape)
+
+    def test_sparse_pipeline_batches(self):
+        cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        batch = next(iter(cell_batches(cells, batch_size=5, seed=3, sparse_output=True)))
+        self.assertIsInstance(batch, tf.SparseTensor)
+        self.assertCountEqual(
+            [tuple(row) for row in cells.rows(slice(None))], [tuple(row) for row in tf.sparse.to_dense(batch).numpy()]
+        )
+
+    def test_sparse_pipeline_from_frame(self):
+        cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        frame = pd.DataFrame(cells.rows(slice(None)), index=cells.index, columns=cells.columns)
+        trainer = CellTraining(frame, 3, TEST_ENCODING_SIZE, batches_per_iteration=2, input_pipeline=True,
+                               sparse_input=True)
+        batch = trainer.batch_sampler()()
+        self.assertIsInstance(batch, tf.SparseTensor)
+        self.assertEqual([3, cells.shape[1]], batch.dense_shape.numpy().tolist())
+        iteration_losses = []
+        trainer.run(1, lambda _, losses: iteration_losses.append(losses))
+        self.assertTrue(all(np.isfinite(loss) for loss in iteration_losses[0]))
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from cell_store import CellStore, write_cell_store, write_mtx_cell_store
+from cell_type_training import load_sparse_matrix, CellTraining
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+
+
+class CellStoreTestCase(TFTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __store_dir(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def test_write_sparse_chunks(self):
+        store = write_cell_store(self.__store_dir('sparse'), self.cells, chunk_rows=2)
+        self.assertEqual(3, store.chunk_count)
+        self.assertEqual(self.cells.shape, store.shape)
+        self.assertDeepEqual(self.cells.rows(slice(None)), store.rows(slice(None)))
+        self.assertDeepEqual(self.cells.rows([4, 0, 3]), store.rows([4, 0, 3]))
+
+    def test_sparse_rows_in_requested_order(self):
+        store = write_cell_store(self.__store_dir('sparse'), self.cells, chunk_rows=2)
+        for ixs in [[4, 0, 3, 1], [2], []]:
+            rows = store.sparse_rows(ixs)
+            self.assertEqual((len(ixs), self.cells.shape[1]), rows.shape)
+            self.assertDeepEqual(self.cells.rows(ixs), rows.toarray())
+        selected = store.select_genes(np.array([4, 1]))
+        self.assertDeepEqual(self.cells.rows([3, 0])[:, [4, 1]], selected.sparse_rows([3, 0]).toarray())
+
+    def test_write_dense_chunks(self):
+        write_cell_store(self.__store_dir('dense'), self.cells, chunk_rows=3, sparse_chunks=False)
+        store = CellStore(self.__store_dir('dense'))
+        self.assertEqual(2, store.chunk_count)
+        self.assertDeepEqual(self.cells.rows([1, 4, 2]), store.rows([1, 4, 2]))
+        self.assertDeepEqual(self.cells.index, store.index)
+
+    def test_stream_mtx_into_store(self):
+        store = write_mtx_cell_store(self.__store_dir('mtx'), TEST_MATRIX_FILE,
+                                     chunk_rows=2, processes=1, chunk_bytes=20)
+        self.assertEqual(self.cells.shape, store.shape)
+        self.assertDeepEqual(self.cells.index, store.index)
+        self.assertDeepEqual(self.cells.columns, store.columns)
+        self.assertDeepEqual(self.cells.rows(slice(None)), store.rows(slice(None)))
+
+    def test_sample_and_batches(self):
+        store = write_cell_store(self.__store_dir('sample'), self.cells, chunk_rows=2)
+        self.assertDeepEqual(self.cells.sample(3, random_state=0), store.sample(3, random_state=0))
+        batches = list(store.dense_batches(3))
+        self.assertEqual([(3, 5), (2, 5)], [b.shape for b in batches])
+
+    def test_train_and_encode_from_store(self):
+        store = write_cell_store(self.__store_dir('train'), self.cells, chunk_rows=2)
+        trainer = CellTraining(store, batch_size=3, encoding_size=4, batches_per_iteration=1)
+        self.assertEqual((3, 5), trainer.sample_cell_data().shape)
+        encodings = trainer.network.encoding_prediction(store)
+        self.assertEqual((5, 4), encodings.shape)
+        np.testing.assert_allclose(trainer.network.encoding_prediction(self.cells), encodings, rtol=1e-5)
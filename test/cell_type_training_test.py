@@ -1,7 +1,12 @@
 import os
 from unittest.mock import MagicMock
 
-from cell_type_training import load_matrix, load_cells, CellTraining
+import numpy as np
+import tensorflow as tf
+
+from cell_pipeline import cell_batches
+from cell_type_training import load_matrix, load_cells, load_sparse_matrix, CellTraining
+from samplers import EpochSampler
 from tf_testcase import TFTestCase
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
@@ -64,3 +69,95 @@ class CellTrainingTestCase(TFTestCase):
         self.trainer.run(3, intercept_mock)
 
         intercept_mock.assert_called_with(2, (4, 8, 12))
+
+
+class SparseCellTrainingTestCase(TFTestCase):
+    def setUp(self):
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        self.trainer = CellTraining(
+            self.cells, TEST_BATCH_SIZE, TEST_ENCODING_SIZE,
+            batches_per_iteration=TEST_BATCHES_PER_ITERATION
+        )
+
+    def test_load_sparse_matrix(self):
+        self.assertEqual((5, TEST_GENE_COUNT), self.cells.shape)
+        self.assertEqual(17, self.cells.matrix.nnz)
+        self.assertEqual('uint8', self.cells.matrix.dtype)
+        self.assertDeepEqual([1, 2, 3, 4, 5], self.cells.index)
+        self.assertDeepEqual([1, 2, 3, 4, 5], self.cells.columns)
+        self.assertDeepEqual(TEST_MATRIX_CONTENT, self.cells.matrix.toarray())
+
+    def test_sample_cell_data(self):
+        sampled = self.trainer.sample_cell_data(0)
+        self.assertEqual((TEST_BATCH_SIZE, TEST_GENE_COUNT), sampled.shape)
+        self.assertEqual('float32', sampled.dtype)
+        self.assertDeepEqual([TEST_MATRIX_CONTENT[2],
+                              TEST_MATRIX_CONTENT[0],
+                              TEST_MATRIX_CONTENT[1]], sampled)
+
+    def test_dense_batches(self):
+        batches = list(self.cells.dense_batches(2))
+        self.assertEqual([(2, 5), (2, 5), (1, 5)], [b.shape for b in batches])
+        self.assertDeepEqual(TEST_MATRIX_CONTENT[4:], batches[2])
+
+    def test_encoding_prediction_in_batches(self):
+        encodings = self.trainer.network.encoding_prediction(self.cells)
+        self.assertEqual((5, TEST_ENCODING_SIZE), encodings.shape)
+
+
+class InputPipelineTestCase(TFTestCase):
+    def test_epoch_batches_from_sparse_cells(self):
+        cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        epoch = next(iter(cell_batches(cells, batch_size=5, seed=3)))
+        self.assertEqual(tf.float32, epoch.dtype)
+        self.assertEqual((5, TEST_GENE_COUNT), epoch.shape)
+        self.assertCountEqual([tuple(row) for row in TEST_MATRIX_CONTENT], [tuple(row) for row in epoch.numpy()])
+
+    def test_epoch_batches_from_frame(self):
+        batches = iter(cell_batches(load_matrix(TEST_MATRIX_FILE), batch_size=2, seed=1))
+        rows = np.concatenate([next(batches).numpy() for _ in range(5)])
+        self.assertEqual((10, TEST_GENE_COUNT), rows.shape)
+        self.assertTrue(all(list(row) in TEST_MATRIX_CONTENT for row in rows.tolist()))
+
+    def test_training_draws_batches_from_pipeline(self):
+        trainer = CellTraining(
+            load_sparse_matrix(TEST_MATRIX_FILE), TEST_BATCH_SIZE, TEST_ENCODING_SIZE,
+            batches_per_iteration=TEST_BATCHES_PER_ITERATION, input_pipeline=True
+        )
+        trainer.sample_cell_data = sample_mock = MagicMock()
+        trainer.network.trainings_step = trainings_step_mock = MagicMock(return_value=(1, 2, 3))
+        trainer.run(2, None)
+
+        sample_mock.assert_not_called()
+        self.assertEqual(2 * TEST_BATCHES_PER_ITERATION, trainings_step_mock.call_count)
+        batch = trainings_step_mock.call_args[0][0]
+        self.assertIsInstance(batch, tf.Tensor)
+        self.assertEqual((TEST_BATCH_SIZE, TEST_GENE_COUNT), batch.shape)
+
+
+class SamplerTrainingTestCase(TFTestCase):
+    def test_training_draws_sampler_rows(self):
+        trainer = CellTraining(
+            load_matrix(TEST_MATRIX_FILE), 2, TEST_ENCODING_SIZE,
+            batches_per_iteration=TEST_BATCHES_PER_ITERATION, sampler=iter([[0, 3], [4, 1]] * 4)
+        )
+        trainer.sample_cell_data = sample_mock = MagicMock()
+        trainer.network.trainings_step = trainings_step_mock = MagicMock(return_value=(1, 2, 3))
+        trainer.run(1, None)
+
+        sample_mock.assert_not_called()
+        batches = [call[0][0] for call in trainings_step_mock.call_args_list]
+        np.testing.assert_array_equal([TEST_MATRIX_CONTENT[0], TEST_MATRIX_CONTENT[3]], batches[0])
+        np.testing.assert_array_equal([TEST_MATRIX_CONTENT[4], TEST_MATRIX_CONTENT[1]], batches[1])
+        self.assertEqual(np.float32, batches[0].dtype)
+
+    def test_sparse_cells_by_sampler(self):
+        trainer = CellTraining(
+            load_sparse_matrix(TEST_MATRIX_FILE), 2, TEST_ENCODING_SIZE, sampler=iter([[2, 0]])
+        )
+        np.testing.assert_array_equal([TEST_MATRIX_CONTENT[2], TEST_MATRIX_CONTENT[0]], trainer.batch_sampler()())
+
+    def test_sampler_batch_size_mismatch(self):
+        with self.assertRaises(AssertionError) as cm:
+            CellTraining(load_sparse_matrix(TEST_MATRIX_FILE), 2, TEST_ENCODING_SIZE, sampler=EpochSampler(5, 3))
+        self.assertEqual('sampler batch size 3 != batch size 2', str(cm.exception))
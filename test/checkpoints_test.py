@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+import numpy as np
+
+from cell_type_training import CellTraining, load_sparse_matrix
+from checkpoints import CheckpointWriter, training_snapshot, restore_snapshot, \
+    checkpoint_files, latest_checkpoint, load_checkpoint, optimizer_state
+from intercepts.data_sink import DataSink
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_BATCH_SIZE = 3
+TEST_ENCODING_SIZE = 2
+TEST_BATCHES_PER_ITERATION = 2
+
+
+def create_trainer(fused_step=False):
+    return CellTraining(
+        load_sparse_matrix(TEST_MATRIX_FILE), TEST_BATCH_SIZE, TEST_ENCODING_SIZE,
+        batches_per_iteration=TEST_BATCHES_PER_ITERATION, fused_step=fused_step
+    )
+
+
+class CheckpointTestCase(TFTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, 'checkpoints')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_restore_snapshot(self):
+        trainer = create_trainer(fused_step=True)
+        trainer.run(2)
+        snapshot = training_snapshot(trainer, 1, {'run_id': 'test'})
+        # shared optimizer: 6 updates per batch (2 generator, 2 encoder, 2 discriminator)
+        self.assertEqual(2 * TEST_BATCHES_PER_ITERATION * 6, snapshot['optimizer']['iterations'])
+
+        resumed = create_trainer(fused_step=True)
+        self.assertEqual(2, restore_snapshot(resumed, snapshot))
+        for weights, resumed_weights in zip(snapshot['weights'], training_snapshot(resumed, 1)['weights']):
+            for expected, actual in zip(weights, resumed_weights):
+                np.testing.assert_array_equal(expected, actual)
+        resumed_optimizer = optimizer_state(resumed.network)
+        self.assertEqual(snapshot['optimizer']['iterations'], resumed_optimizer['iterations'])
+        self.assertEqual(sorted(snapshot['optimizer']['slots']), sorted(resumed_optimizer['slots']))
+        for slot_name, values in snapshot['optimizer']['slots'].items():
+            for expected, actual in zip(values, resumed_optimizer['slots'][slot_name]):
+                np.testing.assert_array_equal(expected, actual)
+        np.testing.assert_array_equal(snapshot['random']['fused'], resumed.fused_step.rng.state.numpy())
+
+        resumed_iterations = []
+        resumed.run(4, lambda it, _: resumed_iterations.append(it), start_iteration=2)
+        self.assertEqual([2, 3], resumed_iterations)
+
+    def test_writer_keeps_latest_checkpoints(self):
+        trainer = create_trainer()
+        writer = CheckpointWriter(self.checkpoint_dir, keep=2)
+        interceptor = writer.create_interceptor(trainer, every=2, meta={'run_id': 'test'})
+        for it in range(7):
+            interceptor(it, None)
+        writer.close()
+
+        files = checkpoint_files(self.checkpoint_dir)
+        self.assertEqual(['checkpoint-00000003.pkl', 'checkpoint-00000005.pkl'], [f.name for f in files])
+        self.assertEqual(files[-1], latest_checkpoint(self.checkpoint_dir))
+        self.assertEqual([], [f for f in os.listdir(self.checkpoint_dir) if f.endswith('.tmp')])
+        checkpoint = load_checkpoint(files[-1])
+        self.assertEqual(5, checkpoint['iteration'])
+        self.assertEqual({'run_id': 'test'}, checkpoint['meta'])
+
+    def test_writer_reports_failed_write(self):
+        writer = CheckpointWriter(self.checkpoint_dir)
+        writer.save({'iteration': 1, 'unpicklable': lambda: None})
+        with self.assertRaises(AssertionError):
+            writer.wait()
+        writer.close()
+
+    def test_no_checkpoint(self):
+        self.assertIsNone(latest_checkpoint(self.tmp_dir.name))
+
+    def test_parallel_checkpoint_needs_workers(self):
+        trainer = create_trainer()
+        trainer.run(1)
+        snapshot = {**training_snapshot(trainer, 0), 'workers': [{}, {}]}
+        with self.assertRaises(AssertionError) as cm:
+            restore_snapshot(create_trainer(), snapshot)
+        self.assertEqual(str(cm.exception), 'checkpoint of a 2-worker run, resume it with WORKERS = 2')
+
+
+class ResumedDataSinkTestCase(TFTestCase):
+    def test_resume_drops_later_iterations(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            sink = DataSink(log_dir)
+            sink.add_graph_header('losses', ['iteration', 'loss'])
+            for it in range(4):
+                sink.add_data('losses', [it, it / 10])
+
+            resumed_sink = DataSink(log_dir, resume_iteration=1)
+            resumed_sink.add_graph_header('losses', ['iteration', 'loss'])
+            resumed_sink.add_data('losses', [2, 0.5])
+            with open(os.path.join(log_dir, 'losses.csv')) as f:
+                self.assertEqual('iteration,loss\n0,0.0\n1,0.1\n2,0.5\n', f.read())
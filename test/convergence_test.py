@@ -0,0 +1,75 @@
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from cell_type_training import CellTraining, load_sparse_matrix
+from intercepts import ConvergenceMonitor
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+
+
+def trainer_mock(encodings):
+    trainer = MagicMock()
+    trainer.data = load_sparse_matrix(TEST_MATRIX_FILE)
+    trainer.network.encoding_prediction = MagicMock(side_effect=encodings)
+    return trainer
+
+
+class ConvergenceMonitorTestCase(TFTestCase):
+    def test_stops_on_plateau(self):
+        trainer = trainer_mock(lambda cells: np.full((len(cells), 3), 0.5))
+        monitor = ConvergenceMonitor(trainer, window=5, check_every=5, patience=2, verbose=False)
+        for it in range(40):
+            monitor(it, (1.0, 0.5, 0.25))
+        self.assertTrue(monitor.converged)
+        self.assertIn('for 2 checks at iteration 15', trainer.stop.call_args_list[0][0][0])
+        self.assertEqual([5, 10, 15], [it for it, _, _ in monitor.history[:3]])
+        self.assertIsNone(monitor.history[0][1])
+        self.assertEqual(0.0, monitor.history[1][1])
+        self.assertEqual(0.0, monitor.history[1][2])
+        self.assertEqual(5, trainer.network.encoding_prediction.call_args[0][0].shape[0])
+
+    def test_no_convergence_while_losses_fall(self):
+        trainer = trainer_mock(lambda cells: np.full((len(cells), 3), 0.5))
+        monitor = ConvergenceMonitor(trainer, window=5, check_every=5, patience=1, verbose=False)
+        for it in range(50):
+            monitor(it, (100.0 / (it + 1), 0, 0))
+        self.assertFalse(monitor.converged)
+        trainer.stop.assert_not_called()
+
+    def test_no_convergence_while_encodings_move(self):
+        rnd = np.random.RandomState(1)
+        trainer = trainer_mock(lambda cells: rnd.uniform(size=(len(cells), 3)))
+        monitor = ConvergenceMonitor(trainer, window=5, check_every=5, patience=1, verbose=False)
+        for it in range(50):
+            monitor(it, (1.0, 1.0, 1.0))
+        self.assertFalse(monitor.converged)
+        self.assertTrue(all(movement > 0.1 for _, _, movement in monitor.history[1:]))
+
+    def test_backoff_without_stop(self):
+        trainer = trainer_mock(lambda cells: np.zeros((len(cells), 3)))
+        monitor = ConvergenceMonitor(trainer, window=2, check_every=2, patience=1, stop=False, backoff=2,
+                                     max_check_every=8, verbose=False)
+        for it in range(60):
+            monitor(it, (1.0, 1.0, 1.0))
+        trainer.stop.assert_not_called()
+        self.assertTrue(monitor.converged)
+        self.assertEqual(8, monitor.check_every)
+        self.assertEqual([2, 4, 8, 16, 24, 32], [it for it, _, _ in monitor.history[:6]])
+
+    def test_trainer_stops_run(self):
+        trainer = CellTraining(load_sparse_matrix(TEST_MATRIX_FILE), 2, 3, batches_per_iteration=1)
+        iterations = []
+
+        def stop_at_third(it, _):
+            iterations.append(it)
+            if it == 2:
+                trainer.stop('enough')
+
+        trainer.run(10, stop_at_third)
+        self.assertEqual([0, 1, 2], iterations)
+        self.assertEqual('enough', trainer.stop_reason)
@@ -1,12 +1,14 @@
 import os
+import unittest
 from datetime import datetime
 from unittest.mock import MagicMock
 
 import numpy as np
 
-from intercepts.db_recorder import DbRecorder, \
+from intercepts.db_recorder import DbRecorder, find_duplicate_ids, stored_trajectory, \
     ENCODINGS_COLLECTION, ITERATIONS_COLLECTION, CELLS_COLLECTION, GENES_COLLECTION
 from db_test import DbTestCase, TEST_DB
+from encits_format import DEFAULT_COORDS_FORMAT, DELTA_FORMAT
 
 
 def relative_file(f_name):
@@ -106,6 +108,23 @@ class DbRecorderCase(DbTestCase):
             'cids': [2, 3, 4]
         })
 
+    def test_stores_cells_once(self):
+        self.recorder.setup()
+        enc_run = self._coll(ENCODINGS_COLLECTION).find_one({'_id': TEST_ENC_RUN_ID})
+        self.assertEqual([1, 2, 3, 4, 5], enc_run['cids'])
+        self.assertEqual(['AAACCTGGTGTCCTCT-1', 'AAACGGGCAGGTCTCG-1', 'AAACGGGTCCGCTGTT-1',
+                          'AAACGGGTCTGATTCT-1', 'AAAGATGGTGATAAAC-1'], enc_run['ns'])
+
+    def test_load_missing_iteration(self):
+        self.recorder.setup()
+        self.assertIsNone(self.recorder.load_iteration(2009))
+
+    def test_stores_gene_index(self):
+        self.recorder.store_encoding_run()
+        self.recorder.store_gene_index([5, 2])
+        enc_run = self._coll(ENCODINGS_COLLECTION).find_one({'_id': TEST_ENC_RUN_ID})
+        self.assertEqual(['ENSMUSG00000025902', 'ENSMUSG00000089699'], enc_run['gs'])
+
     def test_load_barcodes_without_store_encodings(self):
         with self.assertRaises(AssertionError) as cm:
             self.recorder.load_barcodes()
@@ -124,7 +143,7 @@ class DbRecorderCase(DbTestCase):
             [0.5, 0.5, 0.5], [1.0, 0.2, 1.0]
         ])
         trainer_mock = MagicMock()
-        trainer_mock.network.encoding_prediction = MagicMock(return_value=test_encs)
+        trainer_mock.network.cached_encoding_prediction = MagicMock(return_value=test_encs)
         self.recorder.setup()
         interceptor = self.recorder.create_interceptor(trainer_mock)
         interceptor(test_it_1, UNUSED_DATA)
@@ -134,7 +153,9 @@ class DbRecorderCase(DbTestCase):
             {'eid': TEST_ENC_RUN_ID}, {'_id': 0}
         ))
         self.assertEqual(2, len(iteration))
-        self.assertDictEqual(iteration[0], {
+        self.assertEqual(['ds', 'eid', 'fmt', 'it', 'xyz'], sorted(iteration[0]))
+        self.assertEqual(DEFAULT_COORDS_FORMAT, iteration[0]['fmt'])
+        self.assertDictEqual(self.recorder.load_iteration(test_it_1), {
             'eid': TEST_ENC_RUN_ID, 'it': test_it_1,
             'cids': [1, 2, 3, 4, 5],
             'ns': ['AAACCTGGTGTCCTCT-1', 'AAACGGGCAGGTCTCG-1', 'AAACGGGTCCGCTGTT-1', 'AAACGGGTCTGATTCT-1', 'AAAGATGGTGATAAAC-1'],
@@ -151,7 +172,7 @@ class DbRecorderCase(DbTestCase):
     def test_invalid_data_length_intercept(self):
         trainer_mock = MagicMock()
         test_data = np.array([[], [], [], []])
-        trainer_mock.network.encoding_prediction = MagicMock(return_value=test_data)
+        trainer_mock.network.cached_encoding_prediction = MagicMock(return_value=test_data)
 
         self.recorder.setup()
         with self.assertRaises(AssertionError) as cm:
@@ -161,7 +182,7 @@ class DbRecorderCase(DbTestCase):
     def test_invalid_coord_length_intercept(self):
         trainer_mock = MagicMock()
         test_data = np.array([[1, 2], [1, 2], [1, 2], [1, 2], [1, 2]])
-        trainer_mock.network.encoding_prediction = MagicMock(return_value=test_data)
+        trainer_mock.network.cached_encoding_prediction = MagicMock(return_value=test_data)
 
         self.recorder.setup()
         with self.assertRaises(AssertionError) as cm:
@@ -175,10 +196,104 @@ class DbRecorderCase(DbTestCase):
             [0.5, 0.5, 0.5], [1.0, 0.2, 1.0]
         ])
         trainer_mock = MagicMock()
-        trainer_mock.network.encoding_prediction = MagicMock(return_value=test_encs)
+        trainer_mock.network.cached_encoding_prediction = MagicMock(return_value=test_encs)
         self.recorder.setup()
         intercept = self.recorder.create_interceptor(trainer_mock)
         intercept(test_it, UNUSED_DATA)
         with self.assertRaises(AssertionError) as cm:
             intercept(test_it, UNUSED_DATA)
         self.assertEqual(str(cm.exception), f'duplicate iteration {test_it}')
+
+    def test_resume_drops_later_iterations(self):
+        test_encs = np.array([
+            [0.5, 0.5, 0.0], [1.0, 0.2, 1.0], [0.5, 0.5, 0.5],
+            [0.5, 0.5, 0.5], [1.0, 0.2, 1.0]
+        ])
+        trainer_mock = MagicMock()
+        trainer_mock.network.cached_encoding_prediction = MagicMock(return_value=test_encs)
+        self.recorder.setup()
+        intercept = self.recorder.create_interceptor(trainer_mock)
+        for it in [10, 20, 30]:
+            intercept(it, UNUSED_DATA)
+
+        resumed = DbRecorder(TEST_ENC_RUN_ID, TEST_SOURCES, TEST_DB)
+        resumed.resume(20)
+        its = [doc['it'] for doc in self._coll(ITERATIONS_COLLECTION).find({'eid': TEST_ENC_RUN_ID})]
+        self.assertListEqual([10, 20], its)
+        self.assertEqual(5, len(resumed.barcodes))
+
+        resumed_intercept = resumed.create_interceptor(trainer_mock)
+        with self.assertRaises(AssertionError) as cm:
+            resumed_intercept(20, UNUSED_DATA)
+        self.assertEqual(str(cm.exception), 'duplicate iteration 20')
+        resumed_intercept(30, UNUSED_DATA)
+        encoding = self._coll(ENCODINGS_COLLECTION).find_one({'_id': TEST_ENC_RUN_ID})
+        self.assertEqual(30, encoding['defit'])
+        self.assertListEqual([10, 20, 30], encoding['showits'])
+
+    def test_keyframe_interval_stores_deltas(self):
+        test_encs = np.array([
+            [0.5, 0.5, 0.0], [1.0, 0.2, 1.0], [0.5, 0.5, 0.5],
+            [0.5, 0.5, 0.5], [1.0, 0.2, 1.0]
+        ])
+        moves = [0.0, 0.001, -0.002, 0.003, 0.5]
+        trainer_mock = MagicMock()
+        trainer_mock.network.cached_encoding_prediction = MagicMock(
+            side_effect=[np.clip(test_encs + move, 0, 1) for move in moves]
+        )
+        recorder = DbRecorder(TEST_ENC_RUN_ID, TEST_SOURCES, TEST_DB, keyframe_interval=3)
+        recorder.setup()
+        intercept = recorder.create_interceptor(trainer_mock)
+        for it in [10, 20, 30, 40, 50]:
+            intercept(it, UNUSED_DATA)
+
+        iterations = list(self._coll(ITERATIONS_COLLECTION).find({'eid': TEST_ENC_RUN_ID}).sort('it'))
+        self.assertEqual([DEFAULT_COORDS_FORMAT, DELTA_FORMAT, DELTA_FORMAT, DEFAULT_COORDS_FORMAT, DEFAULT_COORDS_FORMAT],
+                         [iteration['fmt'] for iteration in iterations])
+        self.assertEqual([10, 10], [iteration['key'] for iteration in iterations[1:3]])
+        for it, move in zip([10, 20, 30, 40, 50], moves):
+            iteration = recorder.load_iteration(it)
+            expected = np.clip(test_encs + move, 0, 1) * 255
+            np.testing.assert_allclose(np.column_stack([iteration['xs'], iteration['ys'], iteration['zs']]),
+                                       expected, atol=recorder.trajectory.max_step / 2 + 1e-4)
+
+        decoded = list(stored_trajectory(TEST_ENC_RUN_ID, TEST_DB))
+        self.assertEqual([10, 20, 30, 40, 50], [it for it, _ in decoded])
+
+    def test_delta_duplicates_of_exact_coordinates(self):
+        start = np.array([[0.99, 0.99, 0.99], [0.985, 0.98, 0.993], [0.1, 0.2, 0.3], [0.4, 0.5, 0.6], [0.7, 0.8, 0.9]])
+        converged = start.copy()
+        converged[:2] = 1.0
+        trainer_mock = MagicMock()
+        trainer_mock.network.cached_encoding_prediction = MagicMock(side_effect=[start, converged])
+        recorder = DbRecorder(TEST_ENC_RUN_ID, TEST_SOURCES, TEST_DB, keyframe_interval=2)
+        recorder.setup()
+        intercept = recorder.create_interceptor(trainer_mock)
+        intercept(10, UNUSED_DATA)
+        intercept(20, UNUSED_DATA)
+
+        stored = self._coll(ITERATIONS_COLLECTION).find_one({'eid': TEST_ENC_RUN_ID, 'it': 20})
+        self.assertEqual(DELTA_FORMAT, stored['fmt'])
+        self.assertEqual([[1, 2]], stored['ds'])
+        iteration = recorder.load_iteration(20)
+        coords = np.column_stack([iteration['xs'], iteration['ys'], iteration['zs']])
+        self.assertTrue(np.all((coords >= 0) & (coords <= 255)))
+
+    def test_resume_unknown_run(self):
+        with self.assertRaises(AssertionError) as cm:
+            self.recorder.resume(10)
+        self.assertEqual(str(cm.exception), f'Encoding run id not found: {TEST_ENC_RUN_ID}')
+
+
+class FindDuplicateIdsTestCase(unittest.TestCase):
+    def test_exact_duplicates(self):
+        coords = np.array([[0, 0, 0], [1, 2, 3], [0, 0, 0], [4, 5, 6], [1, 2, 3], [0, 0, 0]], dtype=float)
+        self.assertEqual([[1, 3, 6], [2, 5]], find_duplicate_ids(coords))
+        self.assertEqual([], find_duplicate_ids(coords[[0, 1, 3]]))
+        self.assertEqual([], find_duplicate_ids(np.zeros((0, 3))))
+
+    def test_resolution(self):
+        coords = np.array([[10.2, 3, 4], [10.9, 3.5, 4.1], [11.0, 3, 4], [250, 250, 250]])
+        self.assertEqual([], find_duplicate_ids(coords))
+        self.assertEqual([[1, 2]], find_duplicate_ids(coords, resolution=1))
+        self.assertEqual([[1, 2, 3]], find_duplicate_ids(coords, resolution=5))
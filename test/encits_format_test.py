@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+from bson import Binary
+
+from encits_format import pack_coords, unpack_coords, expand_iteration, trajectory_coords, apply_delta, \
+    TrajectoryEncoder, F32_FORMAT, U8_FORMAT, DELTA_FORMAT
+
+TEST_COORDS = np.array([[127.5, 51.0, 0.0], [255.0, 0.4, 12.6]])
+
+
+class EncitsFormatTestCase(unittest.TestCase):
+    def test_f32_round_trip(self):
+        packed = pack_coords(TEST_COORDS, F32_FORMAT)
+        self.assertEqual(TEST_COORDS.size * 4, len(packed))
+        np.testing.assert_allclose(unpack_coords(packed, F32_FORMAT), TEST_COORDS, rtol=1e-6)
+
+    def test_u8_rounds_and_clips(self):
+        packed = pack_coords(np.array([[127.5, 51.2, -3.0], [256.0, 0.4, 12.6]]), U8_FORMAT)
+        self.assertEqual(6, len(packed))
+        np.testing.assert_array_equal(unpack_coords(packed, U8_FORMAT), [[128, 51, 0], [255, 0, 13]])
+
+    def test_unknown_format(self):
+        with self.assertRaises(AssertionError) as cm:
+            pack_coords(TEST_COORDS, 'f16')
+        self.assertEqual(str(cm.exception), 'unknown coordinates format: f16')
+
+    def test_expand_compact_iteration(self):
+        iteration = {'eid': 'run', 'it': 9, 'fmt': F32_FORMAT, 'xyz': pack_coords(TEST_COORDS), 'ds': []}
+        expanded = expand_iteration(iteration, {'cids': [1, 2], 'ns': ['a', 'b']})
+        self.assertEqual(['cids', 'ds', 'eid', 'it', 'ns', 'xs', 'ys', 'zs'], sorted(expanded))
+        self.assertEqual([1, 2], expanded['cids'])
+        self.assertEqual(['a', 'b'], expanded['ns'])
+        np.testing.assert_allclose(expanded['xs'], [127.5, 255.0])
+        np.testing.assert_allclose(expanded['ys'], [51.0, 0.4], rtol=1e-6)
+        np.testing.assert_allclose(expanded['zs'], [0.0, 12.6], rtol=1e-6)
+
+    def test_expand_keeps_listed_iteration(self):
+        iteration = {'eid': 'run', 'it': 9, 'cids': [1], 'ns': ['a'], 'xs': [1.0], 'ys': [2.0], 'zs': [3.0], 'ds': []}
+        self.assertIs(iteration, expand_iteration(iteration, None))
+
+    def test_expand_checks_cell_count(self):
+        iteration = {'eid': 'run', 'it': 9, 'fmt': F32_FORMAT, 'xyz': pack_coords(TEST_COORDS), 'ds': []}
+        with self.assertRaises(AssertionError) as cm:
+            expand_iteration(iteration, {'cids': [1], 'ns': ['a']})
+        self.assertEqual(str(cm.exception), 'coordinates + cell ids have different length: 2 != 1')
+
+
+
+def stored_iterations(encoder, trajectory):
+    return [{'it': it, **encoder.encode(it, coords)[0]} for it, coords in enumerate(trajectory)]
+
+
+class TrajectoryEncoderTestCase(unittest.TestCase):
+    def setUp(self):
+        rnd = np.random.RandomState(0)
+        self.trajectory = 100 + np.cumsum(rnd.uniform(-1, 1, (7, 50, 3)), axis=0)
+
+    def test_keyframe_interval(self):
+        iterations = stored_iterations(TrajectoryEncoder(3), self.trajectory)
+        self.assertEqual([F32_FORMAT, DELTA_FORMAT, DELTA_FORMAT] * 2 + [F32_FORMAT],
+                         [iteration['fmt'] for iteration in iterations])
+        self.assertEqual([3, 3], [iteration['key'] for iteration in iterations[4:6]])
+        self.assertEqual(50 * 3, len(iterations[1]['xyz']))
+
+    def test_reconstructs_within_half_step(self):
+        encoder = TrajectoryEncoder(10)
+        iterations = stored_iterations(encoder, self.trajectory)
+        decoded = list(trajectory_coords(iterations))
+        self.assertEqual(list(range(7)), [it for it, _ in decoded])
+        for (_, coords), expected in zip(decoded, self.trajectory):
+            np.testing.assert_allclose(coords, expected, atol=encoder.max_step / 2 + 1e-4)
+
+    def test_encoded_coords_match_decoded(self):
+        encoder = TrajectoryEncoder(10)
+        encoded = [encoder.encode(it, coords) for it, coords in enumerate(self.trajectory)]
+        iterations = [{'it': it, **fields} for it, (fields, _) in enumerate(encoded)]
+        for (_, coords), (_, expected) in zip(trajectory_coords(iterations), encoded):
+            np.testing.assert_array_equal(coords, expected)
+
+    def test_few_large_movements_are_jumps(self):
+        trajectory = self.trajectory.copy()
+        trajectory[4:, 7] += 50
+        iterations = stored_iterations(TrajectoryEncoder(10), trajectory)
+        self.assertEqual([F32_FORMAT] + [DELTA_FORMAT] * 6, [iteration['fmt'] for iteration in iterations])
+        self.assertEqual([7], np.frombuffer(iterations[4]['jumps'], dtype='<i4').tolist())
+        self.assertNotIn('jumps', iterations[5])
+        for (_, coords), expected in zip(trajectory_coords(iterations), trajectory):
+            np.testing.assert_allclose(coords, expected, atol=1 / 32 + 1e-4)
+
+    def test_many_large_movements_get_keyframe(self):
+        trajectory = self.trajectory.copy()
+        trajectory[4:, :10] += 50
+        iterations = stored_iterations(TrajectoryEncoder(10), trajectory)
+        self.assertEqual([F32_FORMAT, DELTA_FORMAT, DELTA_FORMAT, DELTA_FORMAT, F32_FORMAT],
+                         [iteration['fmt'] for iteration in iterations[:5]])
+        self.assertEqual(4, iterations[5]['key'])
+
+    def test_reset_starts_keyframe(self):
+        encoder = TrajectoryEncoder(10)
+        encoder.encode(0, self.trajectory[0])
+        encoder.reset()
+        self.assertEqual(F32_FORMAT, encoder.encode(1, self.trajectory[1])[0]['fmt'])
+
+    def test_delta_clips_coordinates(self):
+        previous = np.array([[254.0, 1.0, 100.0]])
+        delta = {'step': 1 / 16, 'xyz': Binary(np.array([127, -127, 1], dtype=np.int8).tobytes())}
+        np.testing.assert_array_equal([[255.0, 0.0, 100.0625]], apply_delta(previous, delta))
+
+    def test_delta_needs_previous(self):
+        iterations = stored_iterations(TrajectoryEncoder(10), self.trajectory)
+        with self.assertRaises(AssertionError) as cm:
+            expand_iteration({'eid': 'run', 'ds': [], **iterations[1]}, {'cids': [], 'ns': []})
+        self.assertEqual(str(cm.exception), 'delta iteration 1 without previous coordinates')
+
+
+if __name__ == '__main__':
+    unittest.main()
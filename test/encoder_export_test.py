@@ -0,0 +1,73 @@
+import os
+import tempfile
+
+import numpy as np
+
+from bigan_cont import ContinuousCellBiGan
+from cell_type_training import load_sparse_matrix
+from encoder_export import export_encoder, ExportedEncoder, gene_selection_matrix
+from encoding_inference import write_encodings
+from mtx_parser import names_of_lines
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_GENES_FILE = os.path.join(os.path.dirname(__file__), 'example_genes.tsv')
+TEST_ENCODING_SIZE = 3
+
+
+class EncoderExportTestCase(TFTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.export_dir = os.path.join(self.tmp_dir.name, 'encoder')
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        self.gene_names = names_of_lines(TEST_GENES_FILE, self.cells.columns)
+        self.bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, self.cells.shape[1])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_gene_selection_matrix(self):
+        selection = gene_selection_matrix(['a', 'b', 'c'], ['c', 'x', 'a'])
+        self.assertDeepEqual([[0, 0, 1], [0, 0, 0], [1, 0, 0]], selection.toarray())
+
+    def test_export_and_encode(self):
+        export_encoder(self.bigan, self.export_dir, self.gene_names, {'run_id': 'test-run'})
+        encoder = ExportedEncoder(self.export_dir)
+        self.assertEqual(self.gene_names, encoder.gene_names)
+        self.assertEqual('test-run', encoder.meta['run_id'])
+        self.assertEqual(TEST_ENCODING_SIZE, encoder.encoding_size)
+
+        expected = self.bigan.encoding_prediction(self.cells)
+        aligned = encoder.align(self.cells, self.gene_names)
+        np.testing.assert_allclose(expected, encoder.encoding_prediction(aligned, chunk_rows=2), rtol=1e-5)
+
+        target_file = os.path.join(self.tmp_dir.name, 'encodings.npy')
+        np.testing.assert_allclose(expected, write_encodings(encoder, aligned, target_file, chunk_rows=2), rtol=1e-5)
+
+    def test_export_sparse_input(self):
+        bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, self.cells.shape[1], sparse_input=True)
+        export_encoder(bigan, self.export_dir, self.gene_names)
+        encoder = ExportedEncoder(self.export_dir)
+        self.assertTrue(encoder.sparse_input)
+        aligned = encoder.align(self.cells, self.gene_names)
+        expected = bigan.encoding_prediction(self.cells)
+        np.testing.assert_allclose(expected, encoder.encoding_prediction(aligned, chunk_rows=2), rtol=1e-5)
+
+    def test_align_reordered_genes(self):
+        export_encoder(self.bigan, self.export_dir, self.gene_names)
+        encoder = ExportedEncoder(self.export_dir)
+        reordered = self.cells.select_genes(np.arange(self.cells.shape[1])[::-1])
+        aligned = encoder.align(reordered, self.gene_names[::-1])
+        self.assertDeepEqual(self.cells.rows(slice(None)), aligned.rows(slice(None)))
+
+        missing_first = encoder.align(self.cells.select_genes(np.arange(1, self.cells.shape[1])), self.gene_names[1:])
+        rows = missing_first.rows(slice(None))
+        self.assertTrue(np.all(rows[:, 0] == 0))
+        self.assertDeepEqual(self.cells.rows(slice(None))[:, 1:], rows[:, 1:])
+
+    def test_replace_export(self):
+        export_encoder(self.bigan, self.export_dir, self.gene_names)
+        export_encoder(self.bigan, self.export_dir, self.gene_names, {'run_id': 'second'})
+        self.assertEqual('second', ExportedEncoder(self.export_dir).meta['run_id'])
@@ -0,0 +1,58 @@
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from bigan_cont import ContinuousCellBiGan
+from bigan_fused import FusedTrainingStep
+from parallel_training import component_weights, set_component_weights
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_CELL_COUNT = 12
+TEST_GENE_SIZE = 30
+TEST_ENCODING_SIZE = 3
+
+
+class EncodingCacheTestCase(TFTestCase):
+    def setUp(self):
+        self.bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+        values = np.random.RandomState(2).poisson(1, (TEST_CELL_COUNT, TEST_GENE_SIZE)).astype(np.float32)
+        self.data = pd.DataFrame(values)
+
+    def test_shared_between_calls(self):
+        with mock.patch.object(self.bigan, 'encoding_prediction', wraps=self.bigan.encoding_prediction) as predict:
+            first = self.bigan.cached_encoding_prediction(self.data)
+            second = self.bigan.cached_encoding_prediction(self.data)
+        self.assertIs(first, second)
+        self.assertEqual(1, predict.call_count)
+        self.assertEqual((TEST_CELL_COUNT, TEST_ENCODING_SIZE), first.shape)
+        self.assertFalse(first.flags.writeable)
+        np.testing.assert_allclose(self.bigan.encoding_prediction(self.data), first)
+
+    def test_other_data_set(self):
+        encodings = self.bigan.cached_encoding_prediction(self.data)
+        other = self.bigan.cached_encoding_prediction(self.data.copy())
+        self.assertIsNot(encodings, other)
+        np.testing.assert_allclose(encodings, other)
+
+    def test_invalidated_by_training(self):
+        encodings = self.bigan.cached_encoding_prediction(self.data)
+        self.bigan.trainings_step(self.data.values[:6])
+        trained = self.bigan.cached_encoding_prediction(self.data)
+        self.assertIsNot(encodings, trained)
+        self.assertFalse(np.allclose(encodings, trained))
+
+        fused = FusedTrainingStep(self.bigan, seed=0)
+        fused(self.data.values[:6])
+        self.assertIsNot(trained, self.bigan.cached_encoding_prediction(self.data))
+
+    def test_invalidated_by_set_weights(self):
+        weights = component_weights(self.bigan)
+        version = self.bigan.weights_version
+        encodings = self.bigan.cached_encoding_prediction(self.data)
+        set_component_weights(self.bigan, weights)
+        self.assertEqual(version + 1, self.bigan.weights_version)
+        self.assertIsNot(encodings, self.bigan.cached_encoding_prediction(self.data))
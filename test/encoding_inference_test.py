@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from bigan_cont import ContinuousCellBiGan
+from cell_store import write_cell_store
+from cell_type_training import load_sparse_matrix
+from encoding_inference import cell_chunks, write_encodings
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_ENCODING_SIZE = 3
+
+
+class EncodingInferenceTestCase(TFTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        self.bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, self.cells.shape[1])
+        self.expected = self.bigan._encoder.predict(self.cells.rows(slice(None)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cell_chunks(self):
+        dense = self.cells.rows(slice(None))
+        for data in [self.cells, pd.DataFrame(dense), dense]:
+            for threads in [0, 2]:
+                chunks = list(cell_chunks(data, chunk_rows=2, threads=threads, prefetch=1))
+                self.assertEqual([0, 2, 4], [start for start, _ in chunks])
+                self.assertEqual([2, 2, 1], [len(chunk) for _, chunk in chunks])
+                self.assertDeepEqual(dense, np.concatenate([chunk for _, chunk in chunks]))
+
+    def test_encoding_prediction_in_chunks(self):
+        store = write_cell_store(os.path.join(self.tmp_dir, 'store'), self.cells, chunk_rows=2)
+        memmap_file = os.path.join(self.tmp_dir, 'cells.npy')
+        np.save(memmap_file, self.cells.rows(slice(None)))
+        frame = pd.DataFrame(self.cells.rows(slice(None)))
+        for data in [self.cells, store, frame, np.load(memmap_file, mmap_mode='r')]:
+            np.testing.assert_allclose(self.expected, self.bigan.encoding_prediction(data, chunk_rows=2), rtol=1e-5)
+        np.testing.assert_allclose(self.expected, self.bigan.encoding_prediction(frame, chunk_rows=3, threads=2),
+                                   rtol=1e-5)
+
+    def test_write_encodings(self):
+        target_file = os.path.join(self.tmp_dir, 'encodings.npy')
+        encodings = write_encodings(self.bigan, self.cells, target_file, chunk_rows=2, threads=1)
+        self.assertEqual((len(self.cells), TEST_ENCODING_SIZE), encodings.shape)
+        np.testing.assert_allclose(self.expected, encodings, rtol=1e-5)
+        np.testing.assert_allclose(self.expected, np.load(target_file), rtol=1e-5)
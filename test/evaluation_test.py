@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+import numpy as np
+
+from cell_store import write_cell_store
+from cell_type_training import CellTraining, load_sparse_matrix
+from evaluation import Evaluator, holdout_split, EVALUATION_FIELDS
+from intercepts import SinkIntercepts
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_BATCH_SIZE = 2
+TEST_ENCODING_SIZE = 3
+
+
+class HoldoutTestCase(TFTestCase):
+    def setUp(self):
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+
+    def test_holdout_split(self):
+        training_ixs, holdout_ixs = holdout_split(100, 0.1, seed=3)
+        self.assertEqual(10, len(holdout_ixs))
+        self.assertDeepEqual(np.arange(100), np.sort(np.concatenate([training_ixs, holdout_ixs])))
+        self.assertDeepEqual(holdout_ixs, holdout_split(100, 0.1, seed=3)[1])
+        self.assertEqual(1, len(holdout_split(5, 0.01)[1]))
+
+    def test_training_without_holdout_rows(self):
+        trainer = CellTraining(self.cells, TEST_BATCH_SIZE, TEST_ENCODING_SIZE, batches_per_iteration=1,
+                               holdout_ixs=np.array([1, 3]))
+        self.assertIs(self.cells, trainer.data)
+        self.assertDeepEqual(self.cells.rows([0, 2, 4]), trainer.training_data.rows(slice(None)))
+        self.assertDeepEqual(self.cells.rows([1, 3]), trainer.holdout_data.rows(slice(None)))
+        self.assertDeepEqual(self.cells.index[[1, 3]], trainer.holdout_data.index)
+        trainer.run(1)
+
+    def test_row_subset(self):
+        with tempfile.TemporaryDirectory() as store_dir:
+            store = write_cell_store(os.path.join(store_dir, 'store'), self.cells, chunk_rows=2)
+            subset = store.subset([4, 0, 3])
+            self.assertEqual((3, self.cells.shape[1]), subset.shape)
+            self.assertDeepEqual(self.cells.rows([4, 0, 3]), subset.rows(slice(None)))
+            self.assertDeepEqual(self.cells.rows([0, 3]), subset.sparse_rows([1, 2]).toarray())
+            self.assertDeepEqual(self.cells.rows([4, 0, 3]),
+                                 np.concatenate([chunk.toarray() for chunk in subset.sparse_chunks(2)]))
+            self.assertDeepEqual(self.cells.rows([4, 0, 3])[:, [1, 2]], subset.select_genes([1, 2]).rows([0, 1, 2]))
+
+
+class EvaluatorTestCase(TFTestCase):
+    def setUp(self):
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+        self.trainer = CellTraining(self.cells, TEST_BATCH_SIZE, TEST_ENCODING_SIZE)
+
+    def test_metrics(self):
+        network = self.trainer.network
+        evaluator = Evaluator(network, self.cells, batch_size=2)
+        metrics = evaluator.evaluate()
+        self.assertEqual(EVALUATION_FIELDS[1:], list(metrics.keys()))
+        self.assertEqual(metrics, evaluator.evaluate())
+
+        dense = self.cells.rows(slice(None))
+        encodings = network._encoder.predict(dense)
+        real = np.round(network._discriminator.predict((encodings, dense)))
+        self.assertAlmostEqual(np.count_nonzero(real) / len(dense), metrics['d-true-pos'])
+        self.assertTrue(0 <= metrics['d-true-neg'] <= 1)
+        self.assertTrue(metrics['recon-mse'] >= metrics['recon-mae'] ** 2 - 1e-6)
+
+        shares = np.bincount(np.argmax(encodings, axis=1), minlength=TEST_ENCODING_SIZE) / len(dense)
+        shares = shares[shares > 0]
+        self.assertAlmostEqual(-np.sum(shares * np.log(shares)), metrics['encoding-entropy'], places=5)
+
+    def test_sink_graph(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            sink = SinkIntercepts(log_dir)
+            intercept = sink.save_evaluation(Evaluator(self.trainer.network, self.cells))
+            intercept(4, None)
+            sink.sink.drain_data()
+            with open(os.path.join(log_dir, 'evaluation.csv')) as f:
+                lines = f.readlines()
+        self.assertEqual(','.join(EVALUATION_FIELDS) + '\n', lines[0])
+        self.assertTrue(lines[1].startswith('4,'))
+        self.assertEqual(len(EVALUATION_FIELDS), len(lines[1].split(',')))
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cell_store import write_cell_store
+from cell_type_training import load_sparse_matrix
+from gene_selection import gene_statistics, variable_gene_positions, select_variable_genes
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_MATRIX_CONTENT = np.array([
+    [0, 1, 6, 1, 11],
+    [4, 1, 0, 1, 6],
+    [1, 1, 1, 1, 6],
+    [1, 0, 14, 0, 1],
+    [0, 0, 0, 2, 0],
+])
+
+
+class GeneSelectionTestCase(TestCase):
+    def setUp(self):
+        self.cells = load_sparse_matrix(TEST_MATRIX_FILE)
+
+    def test_gene_statistics(self):
+        stats = gene_statistics(self.cells)
+        np.testing.assert_allclose(TEST_MATRIX_CONTENT.mean(axis=0), stats['mean'])
+        np.testing.assert_allclose(TEST_MATRIX_CONTENT.var(axis=0, ddof=1), stats['variance'])
+        np.testing.assert_allclose([0.6, 0.6, 0.6, 0.8, 0.8], stats['detection'])
+        np.testing.assert_allclose(stats['variance'] / stats['mean'], stats['dispersion'])
+
+    def test_select_variable_genes(self):
+        selected = select_variable_genes(self.cells, 2)
+        self.assertEqual((5, 2), selected.shape)
+        positions = variable_gene_positions(self.cells, 2)
+        np.testing.assert_array_equal(self.cells.columns[positions], selected.columns)
+        np.testing.assert_array_equal(TEST_MATRIX_CONTENT[:, positions], selected.rows(slice(None)))
+
+    def test_min_detection_excludes_genes(self):
+        positions = variable_gene_positions(self.cells, 5, min_detection=0.7)
+        np.testing.assert_array_equal([3, 4], positions)
+
+    def test_keep_all_genes(self):
+        self.assertIs(self.cells, select_variable_genes(self.cells, None))
+        self.assertIs(self.cells, select_variable_genes(self.cells, 5))
+
+    def test_select_genes_from_store(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            store = write_cell_store(os.path.join(tmp_dir, 'store'), self.cells, chunk_rows=2)
+            stats = gene_statistics(store)
+            np.testing.assert_allclose(TEST_MATRIX_CONTENT.mean(axis=0), stats['mean'])
+            selected = select_variable_genes(store, 3)
+            expected = select_variable_genes(self.cells, 3)
+            np.testing.assert_array_equal(expected.columns, selected.columns)
+            np.testing.assert_array_equal(expected.rows([4, 1]), selected.rows([4, 1]))
+        finally:
+            shutil.rmtree(tmp_dir)
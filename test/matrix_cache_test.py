@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from cell_type_training import load_sparse_matrix, load_matrix
+from matrix_cache import MatrixCache
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+
+
+class MatrixCacheTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = MatrixCache(os.path.join(self.tmp_dir, 'cache'))
+        self.source = os.path.join(self.tmp_dir, 'source.txt')
+        self.__write_source('first version')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def __write_source(self, content):
+        with open(self.source, 'w') as f:
+            f.write(content)
+
+    def test_cache_hits_and_misses(self):
+        create_calls = []
+
+        def create():
+            create_calls.append(1)
+            return {'values': np.arange(4)}
+
+        first = self.cache.load(self.source, 'test', create)
+        second = self.cache.load(self.source, 'test', create)
+        self.assertEqual(1, len(create_calls))
+        self.assertEqual({'hits': 1, 'misses': 1, 'entries': 1}, self.cache.stats())
+        np.testing.assert_array_equal(np.arange(4), first['values'])
+        np.testing.assert_array_equal(np.arange(4), second['values'])
+        self.assertIsInstance(second['values'], np.memmap)
+
+    def test_invalidates_changed_source(self):
+        self.cache.load(self.source, 'test', lambda: {'v': np.array([1])})
+        self.__write_source('second version')
+        reloaded = self.cache.load(self.source, 'test', lambda: {'v': np.array([2])})
+        self.assertEqual(2, self.cache.misses)
+        np.testing.assert_array_equal([2], reloaded['v'])
+
+    def test_evicts_least_recently_used(self):
+        cache = MatrixCache(os.path.join(self.tmp_dir, 'limited'), max_bytes=1500)
+        other_source = os.path.join(self.tmp_dir, 'other.txt')
+        with open(other_source, 'w') as f:
+            f.write('other')
+        cache.load(self.source, 'test', lambda: {'v': np.zeros(100)})
+        time.sleep(0.01)
+        cache.load(other_source, 'test', lambda: {'v': np.zeros(100)})
+        entries = cache.entries()
+        self.assertEqual(1, len(entries))
+        self.assertTrue(entries[0][0].startswith('other.txt'))
+
+    def test_cached_sparse_matrix(self):
+        cells = load_sparse_matrix(TEST_MATRIX_FILE, cache=self.cache)
+        cached_cells = load_sparse_matrix(TEST_MATRIX_FILE, cache=self.cache)
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(cells.shape, cached_cells.shape)
+        np.testing.assert_array_equal(cells.matrix.toarray(), cached_cells.matrix.toarray())
+        np.testing.assert_array_equal(cells.index, cached_cells.index)
+
+    def test_cached_dense_matrix(self):
+        df = load_matrix(TEST_MATRIX_FILE, cache=self.cache)
+        cached_df = load_matrix(TEST_MATRIX_FILE, cache=self.cache)
+        self.assertEqual(1, self.cache.hits)
+        np.testing.assert_array_equal(df.values, cached_df.values)
+        np.testing.assert_array_equal(df.columns.values, cached_df.columns.values)
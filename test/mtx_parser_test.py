@@ -0,0 +1,80 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from mtx_parser import read_header, chunk_ranges, parse_mtx, parse_mtx_chunks
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_FIRST_ENTRIES = [[2, 1, 1], [3, 1, 6], [5, 1, 11]]
+TEST_ENTRY_COUNT = 17
+
+
+class MtxParserTestCase(TestCase):
+    def test_read_header(self):
+        size, value_type, body_offset = read_header(TEST_MATRIX_FILE)
+        self.assertEqual((27998, 2405, 3399591), size)
+        self.assertEqual(np.int64, value_type)
+        with open(TEST_MATRIX_FILE, 'rb') as f:
+            f.seek(body_offset)
+            self.assertEqual(b'2 1 1\n', f.readline())
+
+    def test_chunk_ranges_end_on_line_breaks(self):
+        _, _, body_offset = read_header(TEST_MATRIX_FILE)
+        ranges = chunk_ranges(TEST_MATRIX_FILE, body_offset, chunk_bytes=10)
+        self.assertGreater(len(ranges), 5)
+        self.assertEqual(body_offset, ranges[0][0])
+        self.assertEqual(os.path.getsize(TEST_MATRIX_FILE), ranges[-1][1])
+        with open(TEST_MATRIX_FILE, 'rb') as f:
+            for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+                self.assertEqual(end, start)
+                f.seek(end - 1)
+                self.assertEqual(b'\n', f.read(1))
+
+    def test_parse_single_chunk(self):
+        genes, barcodes, values = parse_mtx(TEST_MATRIX_FILE)
+        self.assertEqual(TEST_ENTRY_COUNT, len(values))
+        self.assertEqual(np.int32, genes.dtype)
+        np.testing.assert_array_equal(TEST_FIRST_ENTRIES, np.stack([genes, barcodes, values], axis=1)[:3])
+
+    def test_parallel_chunks_equal_single_chunk(self):
+        expected = parse_mtx(TEST_MATRIX_FILE)
+        parsed = parse_mtx(TEST_MATRIX_FILE, processes=3, chunk_bytes=16)
+        for expected_field, parsed_field in zip(expected, parsed):
+            np.testing.assert_array_equal(expected_field, parsed_field)
+
+    def test_pattern_entries_are_one(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matrix_file = os.path.join(tmp_dir, 'pattern.mtx')
+            with open(matrix_file, 'w') as f:
+                f.write('%%MatrixMarket matrix coordinate pattern general\n%\n5 2 3\n2 1\n5 1\n3 2\n')
+            genes, barcodes, values = parse_mtx(matrix_file)
+        np.testing.assert_array_equal([[2, 1, 1], [5, 1, 1], [3, 2, 1]], np.stack([genes, barcodes, values], axis=1))
+
+    def test_real_banner_is_case_insensitive(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matrix_file = os.path.join(tmp_dir, 'real.mtx')
+            with open(matrix_file, 'w') as f:
+                f.write('%%MatrixMarket Matrix Coordinate Real General\n5 2 2\n2 1 0.5\n3 2 1.25\n')
+            _, value_type, _ = read_header(matrix_file)
+            _, _, values = parse_mtx(matrix_file)
+        self.assertEqual(np.float64, value_type)
+        np.testing.assert_array_equal([0.5, 1.25], values)
+
+    def test_pooled_chunks_in_file_order(self):
+        chunks = []
+        for chunk in parse_mtx_chunks(TEST_MATRIX_FILE, processes=2, chunk_bytes=16):
+            chunks.append(chunk)
+        expected = parse_mtx(TEST_MATRIX_FILE)
+        for field in range(3):
+            np.testing.assert_array_equal(expected[field], np.concatenate([chunk[field] for chunk in chunks]))
+
+    def test_rejects_array_matrix(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            matrix_file = os.path.join(tmp_dir, 'array.mtx')
+            with open(matrix_file, 'w') as f:
+                f.write('%%MatrixMarket matrix array integer general\n2 1\n1\n2\n')
+            with self.assertRaises(AssertionError) as cm:
+                list(parse_mtx_chunks(matrix_file))
+        self.assertEqual(str(cm.exception), f'not a MatrixMarket coordinate matrix: {matrix_file}')
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from cell_type_training import load_sparse_matrix
+from checkpoints import training_snapshot, restore_snapshot
+from parallel_training import ParallelCellTraining, average_weights, component_weights
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_BATCH_SIZE = 4
+TEST_ENCODING_SIZE = 2
+TEST_BATCHES_PER_ITERATION = 2
+TEST_WORKERS = 2
+
+
+class ParallelTrainingTestCase(TFTestCase):
+    def test_average_weights(self):
+        worker_weights = [
+            [[np.array([1., 2.], dtype=np.float32)], [np.array([[0.]]), np.array([4.])]],
+            [[np.array([3., 4.], dtype=np.float32)], [np.array([[2.]]), np.array([0.])]]
+        ]
+        averaged = average_weights(worker_weights)
+        self.assertEqual(2, len(averaged))
+        np.testing.assert_array_equal([2., 3.], averaged[0][0])
+        self.assertEqual(np.float32, averaged[0][0].dtype)
+        np.testing.assert_array_equal([[1.]], averaged[1][0])
+        np.testing.assert_array_equal([2.], averaged[1][1])
+
+    def test_workers_train_coordinator_network(self):
+        trainer = ParallelCellTraining(
+            load_sparse_matrix(TEST_MATRIX_FILE), TEST_BATCH_SIZE, TEST_ENCODING_SIZE, workers=TEST_WORKERS,
+            batches_per_iteration=TEST_BATCHES_PER_ITERATION, seed=5
+        )
+        initial_weights = component_weights(trainer.network)
+        iteration_losses = []
+        trainer.run(2, lambda it, losses: iteration_losses.append((it, losses)))
+
+        self.assertEqual([0, 1], [it for it, _ in iteration_losses])
+        for _, losses in iteration_losses:
+            self.assertEqual(3, len(losses))
+            self.assertTrue(all(np.isfinite(loss) for loss in losses))
+        changed = [
+            any(not np.array_equal(before, after) for before, after in zip(initial, trained))
+            for initial, trained in zip(initial_weights, component_weights(trainer.network))
+        ]
+        self.assertEqual([True, True, True], changed)
+
+    def test_snapshot_holds_worker_states(self):
+        def create_trainer():
+            return ParallelCellTraining(
+                load_sparse_matrix(TEST_MATRIX_FILE), TEST_BATCH_SIZE, TEST_ENCODING_SIZE, workers=TEST_WORKERS,
+                batches_per_iteration=TEST_BATCHES_PER_ITERATION, seed=5
+            )
+
+        trainer = create_trainer()
+        snapshots = []
+        trainer.run(1, lambda it, _: snapshots.append(training_snapshot(trainer, it)))
+        workers = snapshots[0]['workers']
+        self.assertEqual(TEST_WORKERS, len(workers))
+        for state in workers:
+            # 6 optimizer updates per batch (2 generator, 2 encoder, 2 discriminator)
+            self.assertEqual(TEST_BATCHES_PER_ITERATION * 6, state['optimizer']['iterations'])
+            self.assertTrue(state['optimizer']['slots'])
+
+        resumed = create_trainer()
+        self.assertEqual(1, restore_snapshot(resumed, snapshots[0]))
+        resumed_states = []
+        resumed.run(2, lambda it, _: resumed_states.append(resumed.worker_states()), start_iteration=1)
+        for state in resumed_states[0]:
+            self.assertEqual(2 * TEST_BATCHES_PER_ITERATION * 6, state['optimizer']['iterations'])
+
+    def test_resume_needs_same_worker_count(self):
+        trainer = ParallelCellTraining(load_sparse_matrix(TEST_MATRIX_FILE), TEST_BATCH_SIZE, TEST_ENCODING_SIZE,
+                                       workers=TEST_WORKERS, seed=5)
+        with self.assertRaises(AssertionError) as cm:
+            trainer.restore_worker_states([{}])
+        self.assertEqual(str(cm.exception), f'checkpoint of a 1-worker run cannot be resumed with {TEST_WORKERS} workers')
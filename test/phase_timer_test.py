@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from cell_type_training import CellTraining, load_sparse_matrix
+from intercepts import combined_interceptors, SinkIntercepts, ProfilerTrace
+from phase_timer import PhaseTimer, NULL_TIMER, HISTOGRAM_EDGES, timing_lines, histogram_lines
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+TEST_BATCHES_PER_ITERATION = 2
+NETWORK_PHASES = ['train-generator', 'train-encoder', 'generate-cells', 'train-discriminator', 'predict-encodings']
+
+
+class PhaseTimerTestCase(TFTestCase):
+    def test_phase_durations_per_iteration(self):
+        timer = PhaseTimer()
+        completed = []
+        timer.add_listener(lambda it, durations: completed.append((it, durations)))
+        for _ in range(3):
+            with timer.phase('sleep'):
+                time.sleep(0.002)
+        timer.end_iteration(7)
+        timer.end_iteration(8)
+
+        it, durations = completed[0]
+        self.assertEqual(7, it)
+        self.assertEqual(['sleep'], list(durations))
+        self.assertEqual(3, len(durations['sleep']))
+        self.assertTrue(all(seconds >= 0.002 for seconds in durations['sleep']))
+        self.assertEqual((8, {}), completed[1])
+        histogram = histogram_lines(7, durations)
+        self.assertEqual(3, sum(line[3] for line in histogram))
+        self.assertTrue(all(line[:2] == [7, 'sleep'] for line in histogram))
+        self.assertTrue(all(line[2] in HISTOGRAM_EDGES * 1000 for line in histogram))
+        self.assertEqual([[1, 'fast', 1.0 / 100, 1], [1, 'slow', np.inf, 1]],
+                         histogram_lines(1, {'slow': [1000.0], 'fast': [1e-6]}))
+
+        line = timing_lines(7, durations)[0]
+        self.assertEqual([7, 'sleep', 3], line[:3])
+        self.assertAlmostEqual(sum(durations['sleep']) * 1000, line[3])
+
+    def test_null_timer(self):
+        with NULL_TIMER.phase('anything'):
+            pass
+        NULL_TIMER.end_iteration(1)
+        self.assertFalse(NULL_TIMER.enabled)
+        calls = []
+        combined = combined_interceptors([lambda it, losses: calls.append(it)], NULL_TIMER)
+        self.assertEqual('call_all', combined.__name__)
+        combined(3, None)
+        self.assertEqual([3], calls)
+
+    def test_training_phases_in_sink(self):
+        timer = PhaseTimer()
+        trainer = CellTraining(load_sparse_matrix(TEST_MATRIX_FILE), 2, 3,
+                               batches_per_iteration=TEST_BATCHES_PER_ITERATION, timer=timer)
+        with tempfile.TemporaryDirectory() as log_dir:
+            sink = SinkIntercepts(log_dir)
+            sink.save_timings(timer)
+            trainer.run(2, combined_interceptors([sink.save_losses()], timer))
+            sink.sink.drain_data()
+            with open(os.path.join(log_dir, 'timings.csv')) as f:
+                lines = [line.strip().split(',') for line in f.readlines()]
+            with open(os.path.join(log_dir, 'timing-histograms.csv')) as f:
+                histogram_lines_ = [line.strip().split(',') for line in f.readlines()]
+
+        self.assertEqual(['iteration', 'phase', 'count', 'total-ms', 'p50-ms', 'p90-ms', 'max-ms'], lines[0])
+        first_iteration = {line[1]: line for line in lines[1:] if line[0] == '0'}
+        self.assertCountEqual(
+            NETWORK_PHASES + ['sample', 'step', 'intercept:SinkIntercepts.save_losses'], first_iteration.keys()
+        )
+        self.assertEqual(str(TEST_BATCHES_PER_ITERATION), first_iteration['step'][2])
+        self.assertEqual(str(2 * TEST_BATCHES_PER_ITERATION), first_iteration['train-discriminator'][2])
+        self.assertEqual(1, sum(line[0] == '1' and line[1] == 'step' for line in lines))
+        step_ms, generator_ms = float(first_iteration['step'][3]), float(first_iteration['train-generator'][3])
+        self.assertLess(generator_ms, step_ms)
+        self.assertEqual(['iteration', 'phase', 'bucket-ms', 'count'], histogram_lines_[0])
+        step_counts = [int(line[3]) for line in histogram_lines_[1:] if line[0] == '1' and line[1] == 'step']
+        self.assertEqual(TEST_BATCHES_PER_ITERATION, sum(step_counts))
+
+    def test_profiler_trace(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            trace = ProfilerTrace(log_dir, 1, 2)
+            trainer = CellTraining(load_sparse_matrix(TEST_MATRIX_FILE), 2, 3, batches_per_iteration=1)
+            started = []
+            trainer.run(4, combined_interceptors([trace, lambda it, _: started.append(trace.tracing)]))
+            self.assertEqual([True, True, False, False], started)
+            self.assertTrue(any(files for _, _, files in os.walk(log_dir)))
+
+    def test_profiler_trace_resumed_inside_range(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            trace = ProfilerTrace(log_dir, 1, 5)
+            trainer = CellTraining(load_sparse_matrix(TEST_MATRIX_FILE), 2, 3, batches_per_iteration=1)
+            started = []
+            trainer.run(4, combined_interceptors([trace, lambda it, _: started.append(trace.tracing)]), 2)
+            self.assertEqual([True, True], started)
+            trace.stop()
+            self.assertFalse(trace.tracing)
+            self.assertTrue(any(files for _, _, files in os.walk(log_dir)))
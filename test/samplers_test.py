@@ -0,0 +1,48 @@
+import unittest
+from itertools import islice
+
+import numpy as np
+
+from samplers import EpochSampler, StratifiedSampler, WeightedSampler, inverse_frequency_weights, encoding_clusters
+
+
+class SamplersTestCase(unittest.TestCase):
+    def test_epoch_sampler_without_replacement(self):
+        sampler = EpochSampler(10, 3, seed=1)
+        batches = list(islice(iter(sampler), 6))
+        self.assertTrue(all(len(batch) == 3 for batch in batches))
+        for epoch in [batches[:3], batches[3:]]:
+            drawn = np.concatenate(epoch)
+            self.assertEqual(9, len(np.unique(drawn)))
+        self.assertEqual(1, sampler.epoch)
+
+    def test_stratified_sampler_balances_strata(self):
+        labels = np.array(['tac'] * 90 + ['sham'] * 10)
+        batches = list(islice(iter(StratifiedSampler(labels, 8, seed=2)), 5))
+        for batch in batches:
+            self.assertEqual(8, len(np.unique(batch)))
+            self.assertEqual(4, np.count_nonzero(labels[batch] == 'sham'))
+        sham_cells = np.concatenate([batch[labels[batch] == 'sham'] for batch in batches])
+        self.assertListEqual([2] * 10, np.bincount(sham_cells)[90:].tolist())
+
+    def test_stratified_sampler_remainder(self):
+        labels = np.array([0, 0, 0, 1, 1, 2, 2, 2])
+        for batch in islice(iter(StratifiedSampler(labels, 5, seed=3)), 4):
+            counts = np.bincount(labels[batch], minlength=3)
+            self.assertEqual(5, counts.sum())
+            self.assertTrue(np.all(counts >= 1) and np.all(counts <= 2))
+
+    def test_weighted_sampler(self):
+        weights = np.array([0, 1, 0, 3])
+        drawn = np.concatenate(list(islice(iter(WeightedSampler(weights, 100, seed=4)), 20)))
+        counts = np.bincount(drawn, minlength=4)
+        self.assertEqual(0, counts[0] + counts[2])
+        self.assertAlmostEqual(0.75, counts[3] / len(drawn), delta=0.03)
+
+    def test_inverse_frequency_weights(self):
+        weights = inverse_frequency_weights(np.array([1, 1, 1, 2]))
+        np.testing.assert_allclose([1 / 3, 1 / 3, 1 / 3, 1], weights)
+
+    def test_encoding_clusters(self):
+        encodings = np.array([[0.1, 0.2, 0.3], [0.9, 0.2, 0.3], [0.1, 0.7, 0.9], [1.0, 1.0, 1.0]])
+        np.testing.assert_array_equal([0, 1, 6, 7], encoding_clusters(encodings))
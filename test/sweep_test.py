@@ -0,0 +1,63 @@
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from cell_type_training import load_matrix, load_sparse_matrix
+from sweep import SharedCells, grid_settings, run_sweep, DEFAULT_SETTINGS, SUMMARY_FIELDS
+from tf_testcase import TFTestCase
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_MATRIX_FILE = os.path.join(os.path.dirname(__file__), 'example_matrix.mtx')
+
+
+class SweepTestCase(TFTestCase):
+    def test_shared_cells(self):
+        for cells in [load_sparse_matrix(TEST_MATRIX_FILE), load_matrix(TEST_MATRIX_FILE)]:
+            shared = SharedCells(cells)
+            try:
+                transferred = pickle.loads(pickle.dumps(shared))
+                attached = transferred.attach()
+                self.assertEqual(cells.shape, attached.shape)
+                self.assertDeepEqual(np.asarray(cells.index), np.asarray(attached.index))
+                if shared.sparse:
+                    self.assertDeepEqual(cells.rows(slice(None)), attached.rows(slice(None)))
+                else:
+                    self.assertDeepEqual(cells.values, attached.values)
+            finally:
+                shared.unlink()
+
+    def test_grid_settings(self):
+        settings = grid_settings({'encoding_size': [2, 3], 'learning_rate': [0.01, 0.001]})
+        self.assertEqual(4, len(settings))
+        self.assertEqual({**DEFAULT_SETTINGS, 'encoding_size': 2, 'learning_rate': 0.001}, settings[1])
+        self.assertEqual([DEFAULT_SETTINGS], grid_settings({}))
+
+    def test_run_sweep(self):
+        with tempfile.TemporaryDirectory() as log_root:
+            lines = run_sweep(
+                'sweep', {'example': load_sparse_matrix(TEST_MATRIX_FILE)},
+                {'batch_size': [2], 'network': ['continuous', 'classify']}, iterations=2,
+                log_root=log_root, processes=2
+            )
+            self.assertEqual(['sweep_t0', 'sweep_t1'], [line[0] for line in lines])
+            self.assertEqual(['continuous', 'classify'], [line[4] for line in lines])
+            self.assertTrue(all(np.isfinite(line[6]) for line in lines))
+            for trial_id in ['sweep_t0', 'sweep_t1']:
+                with open(os.path.join(log_root, 'sweep', trial_id, 'losses.csv')) as f:
+                    self.assertEqual(3, len(f.readlines()))
+            with open(os.path.join(log_root, 'sweep', 'summary.csv')) as f:
+                self.assertEqual(','.join(SUMMARY_FIELDS), f.readline().strip())
+                self.assertEqual(2, len(f.readlines()))
+            with self.assertRaises(AssertionError):
+                run_sweep('sweep', {'example': load_sparse_matrix(TEST_MATRIX_FILE)}, {}, iterations=1,
+                          log_root=log_root)
+
+    def test_sweep_without_trials(self):
+        with tempfile.TemporaryDirectory() as log_root:
+            with self.assertRaises(AssertionError) as cm:
+                run_sweep('empty', {}, {}, iterations=1, log_root=log_root)
+            self.assertEqual('sweep without trials: 0 sources, grid: {}', str(cm.exception))
+            self.assertFalse(os.path.exists(os.path.join(log_root, 'empty')))
@@ -0,0 +1,77 @@
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from bigan_cont import ContinuousCellBiGan
+from intercepts import SinkIntercepts
+from tf_testcase import TFTestCase
+from weight_monitor import WeightMonitor
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '5'
+
+TEST_BATCH_SIZE = 6
+TEST_GENE_SIZE = 30
+TEST_ENCODING_SIZE = 3
+
+
+class WeightMonitorTestCase(TFTestCase):
+    def setUp(self):
+        self.bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE)
+        self.batch = np.random.RandomState(2).poisson(1, (TEST_BATCH_SIZE, TEST_GENE_SIZE)).astype(np.float32)
+
+    def test_statistics(self):
+        monitor = WeightMonitor(self.bigan)
+        generator_weights = [w.numpy() for w in self.bigan._generator.weights if w.trainable]
+        statistics = monitor.statistics()
+        self.assertEqual((len(monitor.layer_names), 3), statistics.shape)
+        self.assertTrue(monitor.layer_names[0].startswith('cell_generator/'))
+        self.assertTrue(any(name.endswith('/bias') for name in monitor.layer_names))
+        np.testing.assert_allclose([np.linalg.norm(w) for w in generator_weights],
+                                   statistics[:len(generator_weights), 0], rtol=1e-5)
+        self.assertTrue(np.all(statistics[:, 1:] == 0))
+        self.assertEqual([False, False, False], monitor.components_changed(statistics))
+
+        before = [w.numpy() for w in self.bigan._generator.weights if w.trainable]
+        self.bigan.trainings_step(self.batch)
+        after = [w.numpy() for w in self.bigan._generator.weights if w.trainable]
+        statistics = monitor.statistics()
+        np.testing.assert_allclose([np.linalg.norm(a - b) for a, b in zip(after, before)],
+                                   statistics[:len(before), 1], rtol=1e-4, atol=1e-7)
+        np.testing.assert_allclose(statistics[:, 1] / statistics[:, 0], statistics[:, 2], rtol=1e-5)
+        self.assertEqual([True, True, True], monitor.components_changed(statistics))
+        self.assertTrue(np.all(monitor.statistics()[:, 1] == 0))
+
+    def test_sparse_input_projection(self):
+        bigan = ContinuousCellBiGan(TEST_ENCODING_SIZE, TEST_GENE_SIZE, sparse_input=True)
+        monitor = WeightMonitor(bigan)
+        projections = [f'{bigan._encoder.name}/{layer.name}/kernel' for layer in bigan._encoder.layers
+                       if len(layer.weights) == 1 and layer.weights[0].shape[0] == TEST_GENE_SIZE]
+        self.assertEqual(1, len(projections))
+        self.assertIn(projections[0], monitor.layer_names)
+        tracked = [name for name in monitor.layer_names if name.startswith(f'{bigan._encoder.name}/')]
+        self.assertEqual(len([w for w in bigan._encoder.weights if w.trainable]), len(tracked))
+
+    def test_print_params_changes(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.bigan.trainings_step(self.batch)
+            self.bigan.print_params_changes('trained')
+            self.bigan.print_params_changes('unchanged')
+        self.assertEqual(['trained G|E|D changed: 1 | 1 | 1,', 'unchanged G|E|D changed: 0 | 0 | 0,'],
+                         output.getvalue().splitlines())
+
+    def test_sink_graph(self):
+        monitor = WeightMonitor(self.bigan)
+        with tempfile.TemporaryDirectory() as log_dir:
+            sink = SinkIntercepts(log_dir)
+            intercept = sink.save_weight_changes(monitor)
+            intercept(0, None)
+            sink.sink.drain_data()
+            with open(os.path.join(log_dir, 'weights.csv')) as f:
+                lines = f.readlines()
+        self.assertEqual('iteration,layer,weight-norm,update-norm,update-ratio\n', lines[0])
+        self.assertEqual(len(monitor.layer_names), len(lines) - 1)
+        self.assertTrue(lines[1].startswith(f'0,{monitor.layer_names[0]},'))